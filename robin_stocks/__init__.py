@@ -1 +1,5 @@
-from robin_stocks import gemini, robinhood, tda
\ No newline at end of file
+"""The gemini, robinhood, and tda packages are imported the first time they are used."""
+from robin_stocks._lazy import lazy_module
+
+__all__ = ['gemini', 'robinhood', 'tda']
+__getattr__, __dir__ = lazy_module(__name__, {}, set(__all__))
@@ -0,0 +1,34 @@
+"""Contains the module level __getattr__ and __dir__ functions that let a package import its submodules the first
+time one of their names is used."""
+import sys
+from importlib import import_module
+
+
+def lazy_module(name, submodule_attributes, submodules):
+    """ Builds the __getattr__ and __dir__ functions of a package.
+
+    :param name: The __name__ of the package.
+    :type name: str
+    :param submodule_attributes: A dictionary of each submodule to the names of the functions and classes it exports.
+    :type submodule_attributes: dict
+    :param submodules: The submodules that can be used as attributes of the package.
+    :type submodules: set
+    :returns: A tuple of the __getattr__ and __dir__ functions.
+
+    """
+    attribute_modules = {attribute: module for module, names in submodule_attributes.items() for attribute in names}
+
+    def __getattr__(attribute):
+        if attribute in attribute_modules:
+            value = getattr(import_module("." + attribute_modules[attribute], name), attribute)
+            # A package can have a submodule named globals, so the attribute is set on the module object instead.
+            setattr(sys.modules[name], attribute, value)
+            return value
+        if attribute in submodules:
+            return import_module("." + attribute, name)
+        raise AttributeError("module {0!r} has no attribute {1!r}".format(name, attribute))
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[name])) | set(attribute_modules) | set(submodules))
+
+    return __getattr__, __dir__
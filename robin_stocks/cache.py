@@ -0,0 +1,270 @@
+"""Contains an http response cache that is shared by the request_get functions of robinhood, tda, and gemini."""
+import os
+import pickle
+import time
+from collections import OrderedDict
+from copy import deepcopy
+from hashlib import sha256
+from re import compile
+from threading import Lock
+
+from robin_stocks.decoding import decode_response
+
+# Endpoints that return data which rarely changes. Each entry is a regular expression matched against
+# the url and the number of seconds a response stays fresh.
+DEFAULT_POLICIES = [
+    (r"^https://api\.robinhood\.com/markets/$", 86400),
+    (r"^https://api\.robinhood\.com/markets/[^/]+/hours/", 3600),
+    (r"^https://api\.robinhood\.com/options/chains/", 3600),
+    (r"^https://nummus\.robinhood\.com/currency_pairs/", 86400),
+    (r"^https://api\.tdameritrade\.com/v1/marketdata/(hours|[^/]+/hours)", 3600),
+    (r"^https://api(\.sandbox)?\.gemini\.com/v1/symbols", 86400),
+]
+
+RESPONSE_CACHE = None
+# Base urls that requests are sent to in place of the hosts the policies are written for, such as a mock
+# server set with robinhood.set_base_url(). Maps each base url to the default base urls it stands in for.
+URL_ALIASES = {}
+
+
+def set_response_cache(cache):
+    """ Sets the cache used by every request_get function. Set to None to turn caching off.
+
+    :param cache: The cache to use.
+    :type cache: ResponseCache or None
+    """
+    global RESPONSE_CACHE
+    RESPONSE_CACHE = cache
+
+
+def get_response_cache():
+    """ Gets the cache used by every request_get function, or None if caching is off.
+    """
+    return RESPONSE_CACHE
+
+
+def set_url_aliases(aliases):
+    """ Sets the base urls that stand in for other hosts, so that urls built on them are matched against the
+    policies as if they were sent to the default hosts.
+
+    :param aliases: A dictionary of each base url to a list of the default base urls it replaces.
+    :type aliases: dict
+    """
+    global URL_ALIASES
+    URL_ALIASES = {base_url: list(defaults) for base_url, defaults in aliases.items()}
+
+
+def policy_urls(url):
+    """ Returns the url followed by the same path on each default host that its base url stands in for.
+    """
+    urls = [url]
+    for base_url, defaults in URL_ALIASES.items():
+        if url.startswith(base_url):
+            urls.extend(default + url[len(base_url):] for default in defaults)
+    return urls
+
+
+def cache_key(url, payload):
+    """ Builds a string key from a url and its sorted query parameters.
+    """
+    if payload:
+        items = sorted((str(key), str(value)) for key, value in payload.items())
+    else:
+        items = []
+    return "{0}?{1}".format(url, "&".join("{0}={1}".format(key, value) for key, value in items))
+
+
+class MemoryCacheBackend:
+    """ Stores entries in memory and evicts the least recently used entry once max_entries is reached.
+
+    :param max_entries: The maximum number of responses to keep.
+    :type max_entries: Optional[int]
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class DiskCacheBackend:
+    """ Stores each entry as a pickle file in a directory and evicts the least recently used files
+    once the directory is larger than max_bytes.
+
+    :param directory: The directory to write cache files to. It is created if it does not exist.
+    :type directory: str
+    :param max_bytes: The maximum total size of the cache files.
+    :type max_bytes: Optional[int]
+    """
+
+    def __init__(self, directory, max_bytes=50 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, sha256(key.encode()).hexdigest() + ".pickle")
+
+    def get(self, key):
+        path = self.path(key)
+        with self.lock:
+            try:
+                with open(path, "rb") as f:
+                    entry = pickle.load(f)
+            except (OSError, pickle.PickleError, EOFError):
+                return None
+            os.utime(path)
+        return entry
+
+    def set(self, key, entry):
+        path = self.path(key)
+        with self.lock:
+            temp_path = path + ".tmp"
+            with open(temp_path, "wb") as f:
+                pickle.dump(entry, f)
+            os.replace(temp_path, path)
+            self.evict()
+
+    def evict(self):
+        files = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".pickle"):
+                continue
+            stat = os.stat(os.path.join(self.directory, name))
+            files.append((stat.st_mtime, stat.st_size, name))
+            total += stat.st_size
+        files.sort()
+        while total > self.max_bytes and files:
+            _, size, name = files.pop(0)
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+
+    def clear(self):
+        with self.lock:
+            for name in os.listdir(self.directory):
+                if name.endswith(".pickle"):
+                    os.remove(os.path.join(self.directory, name))
+
+    def __len__(self):
+        return len([name for name in os.listdir(self.directory) if name.endswith(".pickle")])
+
+
+class ResponseCache:
+    """ Caches parsed JSON responses for endpoints that have a time to live policy. Once a response is stale it is
+    revalidated with If-None-Match or If-Modified-Since when the server sent an ETag or Last-Modified header,
+    so an unchanged response costs a 304 instead of a full download.
+
+    :param backend: Where to store responses. Default is a MemoryCacheBackend.
+    :type backend: Optional[MemoryCacheBackend or DiskCacheBackend]
+    :param policies: A list of (regular expression, seconds) tuples. The first expression that matches a url \
+        sets how long its responses stay fresh. Urls that do not match are never cached. Default is DEFAULT_POLICIES.
+    :type policies: Optional[list]
+    """
+
+    def __init__(self, backend=None, policies=None):
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        self.policies = [(compile(pattern), ttl) for pattern, ttl in (policies if policies is not None else DEFAULT_POLICIES)]
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.lock = Lock()
+
+    def ttl_for(self, url):
+        """ Returns the number of seconds a response from the url stays fresh, or None if it should not be cached.
+        Urls on a base url set with set_url_aliases() are matched as if they were on the hosts it stands in for.
+        """
+        urls = policy_urls(url)
+        for pattern, ttl in self.policies:
+            if any(pattern.search(candidate) for candidate in urls):
+                return ttl
+        return None
+
+    def count(self, name):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        """ Returns the number of hits, misses, and 304 revalidations along with the hit ratio.
+        """
+        total = self.hits + self.misses + self.revalidations
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "entries": len(self.backend),
+            "hit_ratio": (self.hits + self.revalidations) / total if total else 0.0
+        }
+
+    def clear(self):
+        self.backend.clear()
+
+    def get_json(self, session, url, payload=None):
+        """ Sends a get request through the cache and returns the parsed JSON.
+
+        :param session: The session to send the request with.
+        :type session: requests.Session
+        :param url: The url to send a get request to.
+        :type url: str
+        :param payload: Dictionary of parameters to pass to the url.
+        :type payload: Optional[dict]
+        :returns: The parsed JSON data. Each call gets its own copy.
+        :raises: requests.exceptions.HTTPError if the server returns an error. The response is attached to the error.
+        """
+        ttl = self.ttl_for(url)
+        if ttl is None:
+            response = session.get(url, params=payload)
+            response.raise_for_status()
+            return decode_response(response)
+
+        key = cache_key(url, payload)
+        entry = self.backend.get(key)
+        if entry is not None and time.time() - entry["stored_at"] < ttl:
+            self.count("hits")
+            return deepcopy(entry["data"])
+
+        headers = {}
+        if entry is not None:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        response = session.get(url, params=payload, headers=headers or None)
+        if response.status_code == 304 and entry is not None:
+            self.count("revalidations")
+            entry["stored_at"] = time.time()
+            self.backend.set(key, entry)
+            return deepcopy(entry["data"])
+
+        response.raise_for_status()
+        data = decode_response(response)
+        self.count("misses")
+        self.backend.set(key, {
+            "data": deepcopy(data),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "stored_at": time.time()
+        })
+        return data
@@ -0,0 +1,131 @@
+"""Contains the JSON decoder used to parse responses from every api.
+
+The fastest installed decoder is used by default, checked in the order orjson, ujson, simdjson, and then
+the json module from the standard library. None of them are required.
+"""
+import json
+from importlib import import_module
+from re import compile
+
+DECODER_MODULES = ["orjson", "ujson", "simdjson", "json"]
+NUMBER_PATTERN = compile(r"^-?\d+\.\d+$")
+
+JSON_DECODER_NAME = None
+JSON_DECODER = None
+
+
+def load_decoder(name):
+    """ Returns the loads function of a decoder module, or None if it is not installed.
+    """
+    if name == "json":
+        return json.loads
+    try:
+        module = import_module(name)
+    except ImportError:
+        return None
+    return module.loads
+
+
+def set_json_decoder(name="auto"):
+    """ Sets the decoder used to parse responses.
+
+    :param name: Can be 'orjson', 'ujson', 'simdjson', 'json', or 'auto'. 'auto' picks the fastest installed decoder.
+    :type name: Optional[str]
+    :raises: ValueError if the decoder is not known or not installed.
+    """
+    global JSON_DECODER_NAME, JSON_DECODER
+    names = DECODER_MODULES if name == "auto" else [name]
+    if name != "auto" and name not in DECODER_MODULES:
+        raise ValueError("The decoder must be one of {0} or 'auto'.".format(", ".join(DECODER_MODULES)))
+    for decoder_name in names:
+        loads = load_decoder(decoder_name)
+        if loads is not None:
+            JSON_DECODER_NAME = decoder_name
+            JSON_DECODER = loads
+            return
+    raise ValueError("The decoder {0} is not installed.".format(name))
+
+
+def get_json_decoder():
+    """ Gets the name of the decoder used to parse responses.
+    """
+    if JSON_DECODER is None:
+        set_json_decoder()
+    return JSON_DECODER_NAME
+
+
+def has_non_finite_numbers(content):
+    """ Returns True if the document may contain NaN or Infinity, which only the json module accepts. Text inside \
+    strings can also match, which only means the slower decoder is used.
+    """
+    if isinstance(content, str):
+        return "NaN" in content or "Infinity" in content
+    return b"NaN" in content or b"Infinity" in content
+
+
+def decode_json(content):
+    """ Parses JSON text or bytes with the selected decoder. Documents with NaN or Infinity, such as TD Ameritrade \
+    option chains, are parsed with the json module because the faster decoders reject them.
+
+    :param content: The JSON document.
+    :type content: str or bytes
+    :returns: The parsed data.
+    """
+    if JSON_DECODER is None:
+        set_json_decoder()
+    if JSON_DECODER_NAME != "json" and has_non_finite_numbers(content):
+        return json.loads(content)
+    return JSON_DECODER(content)
+
+
+def decode_response(response):
+    """ Parses the body of a requests.Response with the selected decoder. This is used in place of response.json().
+
+    :param response: The response to parse.
+    :type response: requests.Response
+    :returns: The parsed data.
+    :raises: ValueError if the body is not valid JSON.
+    """
+    if get_json_decoder() == "json" or response.encoding not in (None, "utf-8", "UTF-8"):
+        return response.json()
+    return decode_json(response.content)
+
+
+def convert_numbers(data, keys=None, number_type=float):
+    """ Converts numeric strings such as "123.4500" into numbers. Apis return prices as strings and responses are
+    decoded without converting them, so this is left to the caller to run on the data it needs. The conversion is
+    done in one pass when this is called, not as values are read. Strings without a decimal point are never
+    converted so that ids and account numbers stay as strings.
+
+    :param data: The data returned by any function.
+    :type data: dict or list
+    :param keys: Only convert values of these keys. Default is every key.
+    :type keys: Optional[list]
+    :param number_type: The type to convert to, such as float or decimal.Decimal.
+    :type number_type: Optional[type]
+    :returns: The same data with the numeric strings converted. Dictionaries and lists are changed in place.
+    """
+    if keys is not None:
+        keys = set(keys)
+
+    def convert(value):
+        if isinstance(value, str) and NUMBER_PATTERN.match(value):
+            return number_type(value)
+        return value
+
+    def walk(item):
+        if isinstance(item, dict):
+            for key, value in item.items():
+                if isinstance(value, (dict, list)):
+                    walk(value)
+                elif keys is None or key in keys:
+                    item[key] = convert(value)
+        elif isinstance(item, list):
+            for i, value in enumerate(item):
+                if isinstance(value, (dict, list)):
+                    walk(value)
+                elif keys is None:
+                    item[i] = convert(value)
+        return item
+
+    return walk(data)
@@ -1,13 +1,33 @@
-from .account import (check_available_balances, check_notional_balances,
-                      check_transfers, get_account_detail,
-                      get_approved_addresses, get_deposit_addresses,
-                      withdraw_crypto_funds)
-from .authentication import heartbeat, login, logout
-from .crypto import (get_notional_volume, get_price, get_pubticker,
-                     get_symbol_details, get_symbols, get_ticker,
-                     get_trade_volume)
-from .helper import (get_login_state, request_get, set_default_json_flag,
-                     use_sand_box_urls)
-from .orders import (active_orders, cancel_all_active_orders,
-                     cancel_all_session_orders, cancel_order,
-                     get_trades_for_crypto, order, order_market, order_status)
+"""Functions for the Gemini api. Submodules are imported the first time one of their functions is used."""
+
+from robin_stocks._lazy import lazy_module
+
+# The submodule that defines each function and class exported by this package.
+SUBMODULE_ATTRIBUTES = {
+    'account': [
+        'check_available_balances', 'check_notional_balances', 'check_transfers', 'get_account_detail',
+        'get_approved_addresses', 'get_deposit_addresses', 'withdraw_crypto_funds'
+    ],
+    'authentication': [
+        'RequestSigner', 'heartbeat', 'login', 'logout'
+    ],
+    'book': [
+        'OrderBook'
+    ],
+    'crypto': [
+        'get_book', 'get_candles', 'get_notional_volume', 'get_price', 'get_prices', 'get_pubticker',
+        'get_pubtickers', 'get_symbol_details', 'get_symbols', 'get_ticker', 'get_tickers', 'get_trade_volume',
+        'get_trades', 'load_symbol_details'
+    ],
+    'helper': [
+        'get_login_state', 'request_get', 'request_get_many', 'set_default_json_flag', 'use_sand_box_urls'
+    ],
+    'orders': [
+        'active_orders', 'cancel_all_active_orders', 'cancel_all_session_orders', 'cancel_order',
+        'download_trades_for_crypto', 'get_trades_for_crypto', 'iterate_trades_for_crypto', 'order', 'order_market',
+        'order_status'
+    ]
+}
+SUBMODULES = {'account', 'authentication', 'book', 'crypto', 'globals', 'helper', 'orders', 'urls'}
+__all__ = [name for names in SUBMODULE_ATTRIBUTES.values() for name in names]
+__getattr__, __dir__ = lazy_module(__name__, SUBMODULE_ATTRIBUTES, SUBMODULES)
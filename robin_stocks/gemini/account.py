@@ -34,8 +34,8 @@ def get_account_detail(jsonify=None):
     payload = {
         "request": URLS.get_endpoint(url)
     }
-    generate_signature(payload)
-    data, err = request_post(url, payload, jsonify)
+    headers = generate_signature(payload)
+    data, err = request_post(url, payload, jsonify, headers)
     return data, err
 
 
@@ -62,8 +62,8 @@ def check_available_balances(jsonify=None):
     payload = {
         "request": URLS.get_endpoint(url)
     }
-    generate_signature(payload)
-    data, err = request_post(url, payload, jsonify)
+    headers = generate_signature(payload)
+    data, err = request_post(url, payload, jsonify, headers)
     return data, err
 
 
@@ -92,8 +92,8 @@ def check_notional_balances(jsonify=None):
     payload = {
         "request": URLS.get_endpoint(url)
     }
-    generate_signature(payload)
-    data, err = request_post(url, payload, jsonify)
+    headers = generate_signature(payload)
+    data, err = request_post(url, payload, jsonify, headers)
     return data, err
 
 
@@ -135,8 +135,8 @@ def check_transfers(timestamp=None, limit_transfers=10, show_completed_deposit_a
     }
     if timestamp:
         payload["timestamp"] = timestamp
-    generate_signature(payload)
-    data, err = request_post(url, payload, jsonify)
+    headers = generate_signature(payload)
+    data, err = request_post(url, payload, jsonify, headers)
     return data, err
 
 
@@ -167,8 +167,8 @@ def get_deposit_addresses(network, timestamp=None,  jsonify=None):
     }
     if timestamp:
         payload["timestamp"] = timestamp
-    generate_signature(payload)
-    data, err = request_post(url, payload, jsonify)
+    headers = generate_signature(payload)
+    data, err = request_post(url, payload, jsonify, headers)
     return data, err
 
 
@@ -199,8 +199,8 @@ def get_approved_addresses(network, jsonify=None):
     payload = {
         "request": URLS.get_endpoint(url)
     }
-    generate_signature(payload)
-    data, err = request_post(url, payload, jsonify)
+    headers = generate_signature(payload)
+    data, err = request_post(url, payload, jsonify, headers)
     return data, err
 
 
@@ -239,6 +239,6 @@ def withdraw_crypto_funds(currency_code, address, amount, jsonify=None):
         "address": address,
         "amount": amount
     }
-    generate_signature(payload)
-    data, err = request_post(url, payload, jsonify)
+    headers = generate_signature(payload)
+    data, err = request_post(url, payload, jsonify, headers)
     return data, err
@@ -1,24 +1,69 @@
 
 from base64 import b64encode
-from datetime import datetime
 from hashlib import sha384
 from hmac import new
 from json import dumps
 from random import random
-from time import mktime
+from threading import Lock
+from time import time_ns
 
-from robin_stocks.gemini.helper import (format_inputs, get_secret_key, get_nonce,
-                                        increment_nonce, login_required,
-                                        request_post, set_secret_key,
-                                        set_login_state, update_session)
+from robin_stocks.gemini.helper import (format_inputs, get_signer,
+                                        login_required, request_post,
+                                        set_login_state, set_secret_key,
+                                        set_signer, update_session)
 from robin_stocks.gemini.urls import URLS
 
 
+class RequestSigner:
+    """ Signs the payloads of private requests. The secret key is only decoded once, when the signer is created, \
+        and each signature starts from a copy of an HMAC that already holds the key.
+
+    :param api_key: The Gemini api key.
+    :type api_key: str
+    :param secret_key: The Gemini secret key.
+    :type secret_key: bytes
+
+    """
+
+    def __init__(self, api_key, secret_key):
+        self.api_key = api_key
+        self.hmac = new(secret_key, digestmod=sha384)
+        self.last_nonce = 0
+        self.lock = Lock()
+
+    def next_nonce(self):
+        """ Returns the time in milliseconds, or one more than the last nonce if that is larger. Gemini compares \
+            time based nonces with its own clock, so the nonce follows the wall clock but never repeats or goes backwards.
+        """
+        with self.lock:
+            self.last_nonce = max(time_ns() // 1000000, self.last_nonce + 1)
+            return self.last_nonce
+
+    def sign(self, payload):
+        """ Adds a nonce to the payload and returns the headers needed to send it.
+
+        :param payload: Dictionary of parameters to encode.
+        :type payload: dict
+        :returns: A dictionary of the X-GEMINI-APIKEY, X-GEMINI-PAYLOAD, and X-GEMINI-SIGNATURE headers.
+
+        """
+        payload["nonce"] = str(self.next_nonce())
+        b64 = b64encode(dumps(payload).encode())
+        signature = self.hmac.copy()
+        signature.update(b64)
+        return {
+            "X-GEMINI-APIKEY": self.api_key,
+            "X-GEMINI-PAYLOAD": b64,
+            "X-GEMINI-SIGNATURE": signature.hexdigest()
+        }
+
+
 def login(api_key, secret_key):
     """ Set the authorization token so the API can be used.
     """
     update_session("X-GEMINI-APIKEY", api_key)
     set_secret_key(secret_key.encode())
+    set_signer(RequestSigner(api_key, secret_key.encode()))
     set_login_state(True)
 
 
@@ -27,25 +72,19 @@ def logout():
     """
     update_session("X-GEMINI-APIKEY", "")
     set_secret_key("".encode())
+    set_signer(None)
     set_login_state(False)
 
 
 def generate_signature(payload):
-    """ Generate session header information needed to process Private API requests.
+    """ Generate the header information needed to process Private API requests.
 
     :param payload: Dictionary of parameters to pass to encode.
     :type payload: dict
+    :returns: A dictionary of headers to pass to request_post along with the payload.
 
     """
-    gemini_api_secret = get_secret_key()
-    t = datetime.now()
-    payload["nonce"] = str(int(mktime(t.timetuple())*1000) + get_nonce())
-    encoded_payload = dumps(payload).encode()
-    b64 = b64encode(encoded_payload)
-    signature = new(gemini_api_secret, b64, sha384).hexdigest()
-    update_session("X-GEMINI-PAYLOAD", b64)
-    update_session("X-GEMINI-SIGNATURE", signature)
-    increment_nonce()
+    return get_signer().sign(payload)
 
 
 def generate_order_id():
@@ -86,6 +125,6 @@ def heartbeat(jsonify=None):
     payload = {
         "request": URLS.get_endpoint(url)
     }
-    generate_signature(payload)
-    data, err = request_post(url, payload, jsonify)
+    headers = generate_signature(payload)
+    data, err = request_post(url, payload, jsonify, headers)
     return data, err
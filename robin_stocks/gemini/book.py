@@ -0,0 +1,255 @@
+"""Contains a local copy of the Gemini order book that is kept up to date from snapshots and market data messages."""
+import json
+from collections import deque
+from decimal import Decimal
+from heapq import heapify, heappop, heappush, nlargest, nsmallest
+
+from robin_stocks.gemini.crypto import get_book, get_trades
+
+
+class PriceLevels:
+    """ The price levels of one side of the book. Amounts are kept in a dictionary keyed by price and the prices
+        in a heap, so setting or removing a level takes O(log n) and finding the best price is amortized O(log n).
+        Removed prices are left in the heap and dropped when they reach the top, and the heap is rebuilt once
+        most of its entries are stale. Listing the top levels sorts only the levels asked for.
+    """
+
+    def __init__(self, reverse):
+        self.reverse = reverse
+        self.heap = []
+        self.amounts = {}
+
+    def key(self, price):
+        # heapq is a min heap, so bid prices are negated to keep the highest bid on top.
+        return -price if self.reverse else price
+
+    def set(self, price, amount):
+        """ Sets the amount at a price level. An amount of zero removes the level.
+        """
+        if amount == 0:
+            self.amounts.pop(price, None)
+            if len(self.heap) > 2 * len(self.amounts) + 64:
+                self.heap = [self.key(level) for level in self.amounts]
+                heapify(self.heap)
+        else:
+            if price not in self.amounts:
+                heappush(self.heap, self.key(price))
+            self.amounts[price] = amount
+
+    def clear(self):
+        self.heap = []
+        self.amounts = {}
+
+    def best(self):
+        """ Returns the best (price, amount) tuple, or None if the side is empty.
+        """
+        while self.heap:
+            price = self.key(self.heap[0])
+            if price in self.amounts:
+                return price, self.amounts[price]
+            heappop(self.heap)
+        return None
+
+    def top(self, depth=None):
+        """ Returns a list of (price, amount) tuples starting from the best price.
+        """
+        if depth is None:
+            prices = sorted(self.amounts, reverse=self.reverse)
+        elif self.reverse:
+            prices = nlargest(depth, self.amounts)
+        else:
+            prices = nsmallest(depth, self.amounts)
+        return [(price, self.amounts[price]) for price in prices]
+
+    def __len__(self):
+        return len(self.amounts)
+
+
+class OrderBook:
+    """ Keeps a local copy of the order book and the recent trades of a crypto. The book can be loaded from
+        the book endpoint with poll(), or kept up to date by passing every message from the market data
+        websocket at URLS.marketdata_websocket() to apply_message(). Recorded messages can be applied
+        again with replay().
+
+    :param ticker: The ticker of the crypto, such as btcusd.
+    :type ticker: str
+    :param max_trades: The number of recent trades to keep.
+    :type max_trades: Optional[int]
+
+    """
+
+    def __init__(self, ticker, max_trades=500):
+        self.ticker = ticker.upper()
+        self.bids = PriceLevels(reverse=True)
+        self.asks = PriceLevels(reverse=False)
+        self.trades = deque(maxlen=max_trades)
+        # Trades from the rest api are numbered by tid and trades from the websocket by event_id, which are
+        # different sequences, so each is checked for repeats on its own.
+        self.last_tid = None
+        self.last_event_id = None
+        # The first l2_updates message after subscribing is the whole book rather than a change to it.
+        self.snapshot_received = False
+        self.updates = 0
+
+    def side(self, name):
+        """ Returns the PriceLevels for a side called buy, bid, sell, or ask.
+        """
+        if name in ("buy", "bid", "bids"):
+            return self.bids
+        if name in ("sell", "ask", "asks"):
+            return self.asks
+        raise ValueError("The side must be buy, bid, sell, or ask.")
+
+    def update(self, side, price, amount):
+        """ Sets the amount at a price level on one side of the book.
+
+        :param side: Either buy or sell.
+        :type side: str
+        :param price: The price of the level.
+        :type price: str or Decimal
+        :param amount: The amount remaining at the level. Zero removes the level.
+        :type amount: str or Decimal
+
+        """
+        self.side(side).set(Decimal(price), Decimal(amount))
+        self.updates += 1
+
+    def load_snapshot(self, book):
+        """ Replaces the book with a snapshot from get_book.
+
+        :param book: The parsed response of get_book.
+        :type book: dict
+
+        """
+        self.bids.clear()
+        self.asks.clear()
+        for side in ("bids", "asks"):
+            for level in book.get(side, []):
+                self.update(side, level["price"], level["amount"])
+
+    def add_trade(self, trade):
+        """ Adds a trade to the recent trades. Trades with a tid or event_id that was already seen are skipped.
+        """
+        if "tid" in trade:
+            if self.last_tid is not None and trade["tid"] <= self.last_tid:
+                return
+            self.last_tid = trade["tid"]
+        elif "event_id" in trade:
+            if self.last_event_id is not None and trade["event_id"] <= self.last_event_id:
+                return
+            self.last_event_id = trade["event_id"]
+        self.trades.append(trade)
+
+    def reset_stream(self):
+        """ Marks the websocket as reconnected, so the next l2_updates message replaces the book as a snapshot.
+        """
+        self.snapshot_received = False
+
+    def apply_message(self, message):
+        """ Applies a message from the market data websocket. Both the v2 l2_updates and trade messages and the
+            v1 update messages are understood. Other messages, such as heartbeats, are ignored, as are messages
+            for a symbol other than the book's ticker. The first l2_updates message and the initial v1 update are
+            the full book, so they replace what the book held before. Call reset_stream(), or subscribe_message(),
+            after reconnecting.
+
+        :param message: The message as a JSON string or a parsed dictionary.
+        :type message: str or dict
+
+        """
+        if isinstance(message, (str, bytes)):
+            message = json.loads(message)
+        symbol = message.get("symbol")
+        if symbol is not None and symbol.upper() != self.ticker:
+            return
+        message_type = message.get("type")
+        if message_type == "l2_updates":
+            if not self.snapshot_received:
+                self.bids.clear()
+                self.asks.clear()
+                self.snapshot_received = True
+            for side, price, amount in message.get("changes", []):
+                self.update(side, price, amount)
+            for trade in message.get("trades", []):
+                self.add_trade(trade)
+        elif message_type == "trade":
+            self.add_trade(message)
+        elif message_type == "update":
+            events = message.get("events", [])
+            if message.get("socket_sequence") == 0 or any(event.get("reason") == "initial" for event in events):
+                self.bids.clear()
+                self.asks.clear()
+            for event in events:
+                if event.get("type") == "change":
+                    self.update(event["side"], event["price"], event["remaining"])
+                elif event.get("type") == "trade":
+                    self.add_trade(event)
+
+    def replay(self, messages):
+        """ Applies each message in order, such as the lines of a file of recorded websocket messages.
+
+        :param messages: An iterable of JSON strings or dictionaries.
+        :type messages: iterable
+        :returns: The order book.
+
+        """
+        for message in messages:
+            if isinstance(message, (str, bytes)) and not message.strip():
+                continue
+            self.apply_message(message)
+        return self
+
+    def poll(self, limit_bids=0, limit_asks=0):
+        """ Loads a new snapshot of the book and any trades that happened since the last poll.
+
+        :param limit_bids: The number of bid price levels to load. Default is the full book.
+        :type limit_bids: Optional[int]
+        :param limit_asks: The number of ask price levels to load. Default is the full book.
+        :type limit_asks: Optional[int]
+        :returns: The error from either request, or None if there was not an error.
+
+        """
+        book, error = get_book(self.ticker, limit_bids, limit_asks, jsonify=True)
+        if error:
+            return error
+        self.load_snapshot(book)
+        trades, error = get_trades(self.ticker, limit_trades=500, jsonify=True)
+        if error:
+            return error
+        for trade in sorted(trades, key=lambda trade: trade["tid"]):
+            self.add_trade(trade)
+        return None
+
+    def best_bid(self):
+        """ Returns the highest (price, amount) bid, or None if there are no bids.
+        """
+        return self.bids.best()
+
+    def best_ask(self):
+        """ Returns the lowest (price, amount) ask, or None if there are no asks.
+        """
+        return self.asks.best()
+
+    def spread(self):
+        """ Returns the best ask price minus the best bid price, or None if either side is empty.
+        """
+        bid, ask = self.best_bid(), self.best_ask()
+        if bid is None or ask is None:
+            return None
+        return ask[0] - bid[0]
+
+    def depth(self, levels=10):
+        """ Returns the best price levels on each side of the book.
+
+        :param levels: The number of price levels to return for each side.
+        :type levels: Optional[int]
+        :returns: A dictionary with bids and asks keys. Each is a list of (price, amount) tuples starting from the best price.
+
+        """
+        return {"bids": self.bids.top(levels), "asks": self.asks.top(levels)}
+
+    def subscribe_message(self):
+        """ Returns the message to send to URLS.marketdata_websocket() to receive l2 updates for the ticker.
+            The book expects a new snapshot after it is sent.
+        """
+        self.reset_stream()
+        return json.dumps({"type": "subscribe", "subscriptions": [{"name": "l2", "symbols": [self.ticker]}]})
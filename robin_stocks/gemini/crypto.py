@@ -1,8 +1,15 @@
+from array import array
+
 from robin_stocks.gemini.authentication import generate_signature
 from robin_stocks.gemini.helper import (format_inputs, login_required,
-                                        request_get, request_post)
+                                        request_get, request_get_many,
+                                        request_post)
 from robin_stocks.gemini.urls import URLS
 
+NAN = float("nan")
+# Parsed symbol details keyed by url. Details only change when Gemini lists a new market.
+SYMBOL_DETAILS = {}
+
 
 @format_inputs
 def get_pubticker(ticker, jsonify=None):
@@ -57,6 +64,135 @@ def get_ticker(ticker, jsonify=None):
     return data, error
 
 
+@format_inputs
+def get_pubtickers(tickers, jsonify=None, max_workers=None):
+    """ Gets the pubticker information for many cryptos at the same time.
+
+    :param tickers: The tickers of the cryptos.
+    :type tickers: list
+    :param jsonify: If set to false, will return the raw response objects. \
+        If set to True, will return dictionaries parsed using the JSON format.
+    :type jsonify: Optional[str]
+    :param max_workers: The number of requests to send at the same time.
+    :type max_workers: Optional[int]
+    :returns: Returns a tuple where the first entry is a list of the data for each ticker and the second entry is a \
+        list of the error for each ticker, or None where there was not an error. Both lists are in the same order as tickers. \
+        The keys of each dictionary are the same as for get_pubticker.
+
+    """
+    results = request_get_many([URLS.pubticker(ticker) for ticker in tickers], jsonify, max_workers)
+    return [data for data, _ in results], [error for _, error in results]
+
+
+@format_inputs
+def get_tickers(tickers, jsonify=None, max_workers=None):
+    """ Gets the recent trading information for many cryptos at the same time.
+
+    :param tickers: The tickers of the cryptos.
+    :type tickers: list
+    :param jsonify: If set to false, will return the raw response objects. \
+        If set to True, will return dictionaries parsed using the JSON format.
+    :type jsonify: Optional[str]
+    :param max_workers: The number of requests to send at the same time.
+    :type max_workers: Optional[int]
+    :returns: Returns a tuple where the first entry is a list of the data for each ticker and the second entry is a \
+        list of the error for each ticker, or None where there was not an error. Both lists are in the same order as tickers. \
+        The keys of each dictionary are the same as for get_ticker.
+
+    """
+    results = request_get_many([URLS.ticker(ticker) for ticker in tickers], jsonify, max_workers)
+    return [data for data, _ in results], [error for _, error in results]
+
+
+@format_inputs
+def get_book(ticker, limit_bids=None, limit_asks=None, jsonify=None):
+    """ Gets the current order book for a crypto.
+
+    :param ticker: The ticker of the crypto.
+    :type ticker: str
+    :param limit_bids: The number of bid price levels to return. Default is 50. Set to 0 for the full book.
+    :type limit_bids: Optional[int]
+    :param limit_asks: The number of ask price levels to return. Default is 50. Set to 0 for the full book.
+    :type limit_asks: Optional[int]
+    :param jsonify: If set to false, will return the raw response object. \
+        If set to True, will return a dictionary parsed using the JSON format.
+    :type jsonify: Optional[str]
+    :returns: Returns a tuple where the first entry in the tuple is a requests reponse object  \
+        or a dictionary parsed using the JSON format and the second entry is an error string or \
+        None if there was not an error. \
+        The keys for the dictionary are listed below.
+    :Dictionary Keys: * bids - A list of dictionaries with the price, amount, and timestamp of each bid price level
+                      * asks - A list of dictionaries with the price, amount, and timestamp of each ask price level
+
+    """
+    url = URLS.book(ticker)
+    payload = {}
+    if limit_bids is not None:
+        payload["limit_bids"] = limit_bids
+    if limit_asks is not None:
+        payload["limit_asks"] = limit_asks
+    data, error = request_get(url, payload, jsonify)
+    return data, error
+
+
+@format_inputs
+def get_trades(ticker, timestamp=None, limit_trades=None, jsonify=None):
+    """ Gets the most recent trades on the exchange for a crypto.
+
+    :param ticker: The ticker of the crypto.
+    :type ticker: str
+    :param timestamp: Only return trades after this timestamp.
+    :type timestamp: Optional[int]
+    :param limit_trades: The maximum number of trades to return. Default is 50, max is 500.
+    :type limit_trades: Optional[int]
+    :param jsonify: If set to false, will return the raw response object. \
+        If set to True, will return a dictionary parsed using the JSON format.
+    :type jsonify: Optional[str]
+    :returns: Returns a tuple where the first entry in the tuple is a requests reponse object  \
+        or a list of dictionaries parsed using the JSON format and the second entry is an error string or \
+        None if there was not an error. \
+        The keys for the dictionaries are listed below.
+    :Dictionary Keys: * timestamp
+                      * timestampms
+                      * tid
+                      * price
+                      * amount
+                      * exchange
+                      * type - Either buy or sell.
+
+    """
+    url = URLS.trades(ticker)
+    payload = {}
+    if timestamp is not None:
+        payload["timestamp"] = timestamp
+    if limit_trades is not None:
+        payload["limit_trades"] = limit_trades
+    data, error = request_get(url, payload, jsonify)
+    return data, error
+
+
+@format_inputs
+def get_candles(ticker, time_frame, jsonify=None):
+    """ Gets the recent candles for a crypto, newest first.
+
+    :param ticker: The ticker of the crypto.
+    :type ticker: str
+    :param time_frame: The time covered by each candle. Can be 1m, 5m, 15m, 30m, 1hr, 6hr, or 1day.
+    :type time_frame: str
+    :param jsonify: If set to false, will return the raw response object. \
+        If set to True, will return a list parsed using the JSON format.
+    :type jsonify: Optional[str]
+    :returns: Returns a tuple where the first entry in the tuple is a requests reponse object  \
+        or a list of candles parsed using the JSON format and the second entry is an error string or \
+        None if there was not an error. \
+        Each candle is a list of the time in milliseconds, open, high, low, close, and volume.
+
+    """
+    url = URLS.candles(ticker, time_frame)
+    data, error = request_get(url, None, jsonify)
+    return data, error
+
+
 @format_inputs
 def get_symbols(jsonify=None):
     """ Gets a list of all available crypto tickers.
@@ -102,6 +238,27 @@ def get_symbol_details(ticker, jsonify=None):
     return data, error
 
 
+def load_symbol_details(tickers, refresh=False):
+    """ Gets the parsed details for many cryptos. Details are cached after the first request, so only tickers \
+        that have not been loaded before are requested.
+
+    :param tickers: The tickers of the cryptos.
+    :type tickers: list
+    :param refresh: If set to True, requests the details of every ticker again.
+    :type refresh: Optional[bool]
+    :returns: Returns a dictionary of the details for each ticker. Tickers that could not be loaded are left out. \
+        The keys of each dictionary are the same as for get_symbol_details.
+
+    """
+    urls = {ticker: URLS.symbol_details(ticker) for ticker in tickers}
+    missing = [ticker for ticker, url in urls.items() if refresh or url not in SYMBOL_DETAILS]
+    results = request_get_many([urls[ticker] for ticker in missing], True)
+    for ticker, (data, error) in zip(missing, results):
+        if error is None:
+            SYMBOL_DETAILS[urls[ticker]] = data
+    return {ticker: SYMBOL_DETAILS[url] for ticker, url in urls.items() if url in SYMBOL_DETAILS}
+
+
 @login_required
 @format_inputs
 def get_notional_volume(jsonify=None):
@@ -134,8 +291,8 @@ def get_notional_volume(jsonify=None):
     payload = {
         "request": URLS.get_endpoint(url)
     }
-    generate_signature(payload)
-    data, err = request_post(url, payload, jsonify)
+    headers = generate_signature(payload)
+    data, err = request_post(url, payload, jsonify, headers)
     return data, err
 
 
@@ -175,8 +332,8 @@ def get_trade_volume(jsonify=None):
     payload = {
         "request": URLS.get_endpoint(url)
     }
-    generate_signature(payload)
-    data, err = request_post(url, payload, jsonify)
+    headers = generate_signature(payload)
+    data, err = request_post(url, payload, jsonify, headers)
     return data, err
 
 
@@ -195,3 +352,25 @@ def get_price(ticker, side):
         return data["ask"]
     else:
         return data["bid"]
+
+
+def get_prices(tickers, side):
+    """ Returns either the bid or the ask price for many cryptos, requested at the same time.
+
+    :param tickers: The tickers of the cryptos.
+    :type tickers: list
+    :param side: Either 'buy' or 'sell'.
+    :type side: str
+    :returns: Returns an array of 64 bit floats with the bid or ask price of each ticker, in the same order as tickers. \
+        The price is NaN for any ticker that could not be loaded.
+
+    """
+    key = "ask" if side == "buy" else "bid"
+    data, errors = get_pubtickers(tickers, jsonify=True)
+    prices = array("d")
+    for item, error in zip(data, errors):
+        try:
+            prices.append(float(item[key]) if error is None else NAN)
+        except (TypeError, KeyError, ValueError):
+            prices.append(NAN)
+    return prices
@@ -1,11 +1,13 @@
 """Holds the session header and other global variables."""
 from requests import Session
+from requests.adapters import HTTPAdapter
 
-NONCE = 1 # Counter that must always be increasing
 LOGGED_IN = False # Flag on whether or not the user is logged in.
 USE_SANDBOX_URLS = False # Flag on whether or not to use sandbox urls.
 RETURN_PARSED_JSON_RESPONSE = False # Flag on whether to automatically parse request responses.
 SECRET_API_KEY = None
+SIGNER = None # RequestSigner created by login.
+MAX_WORKERS = 16 # Number of requests the batch functions send at the same time.
 
 # The session object for making get and post requests.
 SESSION = Session()
@@ -13,4 +15,6 @@ SESSION.headers = {
     'Content-Type': "text/plain",
     'Content-Length': "0",
     'Cache-Control': "no-cache"
-}
\ No newline at end of file
+}
+# Keep enough pooled connections open for the batch functions to reuse them.
+SESSION.mount('https://', HTTPAdapter(pool_connections=2, pool_maxsize=MAX_WORKERS))
@@ -1,28 +1,19 @@
 from base64 import urlsafe_b64decode as b64d
 from base64 import urlsafe_b64encode as b64e
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
 from inspect import signature
 from zlib import compress, decompress
 
-from robin_stocks.gemini.globals import (LOGGED_IN, NONCE,
+from requests.exceptions import HTTPError
+from robin_stocks.cache import get_response_cache
+from robin_stocks.decoding import decode_response
+from robin_stocks.gemini.globals import (LOGGED_IN, MAX_WORKERS,
                                          RETURN_PARSED_JSON_RESPONSE,
-                                         SECRET_API_KEY, SESSION,
+                                         SECRET_API_KEY, SESSION, SIGNER,
                                          USE_SANDBOX_URLS)
 
 
-def increment_nonce():
-    """ Increase nonce by one.
-    """
-    global NONCE
-    NONCE += 1
-
-
-def get_nonce():
-    """ return the nonce.
-    """
-    return NONCE
-
-
 def set_secret_key(data):
     """ Encodes the secret api key before storing it as a global variable.
     """
@@ -36,18 +27,42 @@ def get_secret_key():
     return decompress(b64d(SECRET_API_KEY))
 
 
+def set_signer(signer):
+    """ Sets the RequestSigner used to sign private requests.
+    """
+    global SIGNER
+    SIGNER = signer
+
+
+def get_signer():
+    """ Gets the RequestSigner used to sign private requests.
+    """
+    return SIGNER
+
+
 def format_inputs(func):
     """ A decorator for formatting inputs. For any function decorated by this,
         the value of jsonify=None will be replaced with the global value stored at 
         RETURN_PARSED_JSON_RESPONSE.
     """
+    # The signature is only inspected once, when the function is decorated.
+    parameters = list(signature(func).parameters.values())
+    names = [parameter.name for parameter in parameters]
+    if 'jsonify' not in names:
+        return(func)
+    position = names.index('jsonify')
+    default_is_none = parameters[position].default is None
+
     @wraps(func)
     def format_wrapper(*args, **kwargs):
-        bound_args = signature(func).bind(*args, **kwargs)
-        bound_args.apply_defaults()
-        target_args = dict(bound_args.arguments)
-        if target_args['jsonify'] is None:
-            kwargs["jsonify"] = get_default_json_flag()
+        if 'jsonify' in kwargs:
+            if kwargs['jsonify'] is None:
+                kwargs['jsonify'] = get_default_json_flag()
+        elif len(args) > position:
+            if args[position] is None:
+                args = args[:position] + (get_default_json_flag(),) + args[position + 1:]
+        elif default_is_none:
+            kwargs['jsonify'] = get_default_json_flag()
         return(func(*args, **kwargs))
     return(format_wrapper)
 
@@ -137,23 +152,67 @@ def request_get(url, payload, parse_json):
     :type parse_json: bool
     :returns: Returns a tuple where the first entry is the response and the second entry will be an error message from the \
         get request. If there was no error then the second entry in the tuple will be None. The first entry will either be \
-        the raw request response or the parsed JSON response based on whether parse_json is True or not.
+        the raw request response or the parsed JSON response based on whether parse_json is True or not, or None if the \
+        request could not be sent. Parsed responses are served from the cache set with robin_stocks.cache.set_response_cache() when there is one.
     """
+    cache = get_response_cache()
+    if parse_json and cache is not None:
+        try:
+            return cache.get_json(SESSION, url, payload), None
+        except HTTPError as e:
+            try:
+                return decode_response(e.response), e
+            except ValueError:
+                # The error body is not JSON, such as an html error page.
+                return None, e
+        except Exception as e:
+            return None, e
+    response = None
     response_error = None
     try:
         response = SESSION.get(url, params=payload)
         response.raise_for_status()
     except Exception as e:
         response_error = e
+    if response is None:
+        # The request was never answered, such as after a connection error.
+        return None, response_error
     # Return either the raw request object so you can call response.text, response.status_code, response.headers, or response.json()
     # or return the JSON parsed information if you don't care to check the status codes.
     if parse_json:
-        return response.json(), response_error
+        return decode_response(response), response_error
     else:
         return response, response_error
 
 
-def request_post(url, payload, parse_json):
+def request_get_many(urls, parse_json, max_workers=None):
+    """ Sends get requests to many urls at the same time over the pooled session.
+
+    :param urls: The urls to send get requests to.
+    :type urls: list
+    :param parse_json: Set this parameter true to parse each response to a dictionary using the JSON format.
+    :type parse_json: bool
+    :param max_workers: The number of requests to send at the same time. Default is MAX_WORKERS.
+    :type max_workers: Optional[int]
+    :returns: Returns a list with a (response, error) tuple for each url, in the same order as urls. \
+        The response is None for a url whose request could not be sent, such as after a connection error.
+    """
+    if not urls:
+        return []
+
+    def get(url):
+        # A failed url only fills its own slot instead of stopping the other requests.
+        try:
+            return request_get(url, None, parse_json)
+        except Exception as e:
+            return None, e
+
+    workers = min(max_workers or MAX_WORKERS, len(urls))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(get, urls))
+
+
+def request_post(url, payload, parse_json, headers=None):
     """ Generic function for sending a post request.
 
     :param url: The url to send a post request to.
@@ -163,19 +222,21 @@ def request_post(url, payload, parse_json):
     :param parse_json: Requests serializes data in the JSON format. Set this parameter true to parse the data to a dictionary \
         using the JSON format.
     :type parse_json: bool
+    :param headers: Headers to send with this request only, such as the signature headers of a private request.
+    :type headers: Optional[dict]
     :returns: Returns a tuple where the first entry is the response and the second entry will be an error message from the \
         get request. If there was no error then the second entry in the tuple will be None. The first entry will either be \
         the raw request response or the parsed JSON response based on whether parse_json is True or not.
     """
     response_error = None
     try:
-        response = SESSION.post(url, params=payload)
+        response = SESSION.post(url, params=payload, headers=headers)
         response.raise_for_status()
     except Exception as e:
         response_error = e
     # Return either the raw request object so you can call response.text, response.status_code, response.headers, or response.json()
     # or return the JSON parsed information if you don't care to check the status codes.
     if parse_json:
-        return response.json(), response_error
+        return decode_response(response), response_error
     else:
         return response, response_error
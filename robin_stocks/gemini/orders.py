@@ -1,3 +1,6 @@
+import json
+import os
+
 from robin_stocks.gemini.authentication import (generate_order_id,
                                                 generate_signature)
 from robin_stocks.gemini.crypto import get_price
@@ -45,14 +48,102 @@ def get_trades_for_crypto(ticker, limit_trades=50, timestamp=None, jsonify=None)
         "symbol": ticker,
         "limit_trades": limit_trades
     }
-    if timestamp:
+    if timestamp is not None:
         payload["timestamp"] = timestamp
 
-    generate_signature(payload)
-    data, err = request_post(url, payload, jsonify)
+    headers = generate_signature(payload)
+    data, err = request_post(url, payload, jsonify, headers)
     return data, err
 
 
+@login_required
+def iterate_trades_for_crypto(ticker, timestamp=0, after_tid=0, limit_trades=500):
+    """ Yields every trade for a certain crypto from oldest to newest, requesting one page of trades at a time. \
+        Gemini only returns trades on or after a timestamp, so pages are walked forward in time. Each page starts \
+        at the timestamp of the last trade of the page before, and trades at that boundary are skipped by their tid.
+
+    :param ticker: The ticker of the crypto.
+    :type ticker: str
+    :param timestamp: Only return trades on or after this timestamp in milliseconds. Default is the first trade.
+    :type timestamp: Optional[int]
+    :param after_tid: Only return trades with a tid greater than this one.
+    :type after_tid: Optional[int]
+    :param limit_trades: The number of trades to request per page. Max is 500.
+    :type limit_trades: Optional[int]
+    :returns: A generator of the trade dictionaries. The keys are the same as for get_trades_for_crypto.
+    :raises: The error returned by get_trades_for_crypto if a page could not be loaded.
+
+    """
+    while True:
+        data, err = get_trades_for_crypto(ticker, limit_trades, timestamp, jsonify=True)
+        if err:
+            raise err
+        trades = sorted((trade for trade in data if trade["tid"] > after_tid), key=lambda trade: trade["tid"])
+        for trade in trades:
+            yield trade
+        if trades:
+            after_tid = trades[-1]["tid"]
+            timestamp = trades[-1]["timestampms"]
+        elif len(data) >= limit_trades:
+            # A full page of trades that were all seen before means they share one millisecond.
+            timestamp += 1
+        else:
+            return
+
+
+def download_trades_for_crypto(ticker, filename, timestamp=0, limit_trades=500):
+    """ Writes every trade for a certain crypto to a file with one JSON trade per line. Trades are appended as each \
+        page is loaded, and if the file already exists the download resumes after the last trade in it.
+
+    :param ticker: The ticker of the crypto.
+    :type ticker: str
+    :param filename: The path of the file to write to.
+    :type filename: str
+    :param timestamp: Only download trades on or after this timestamp in milliseconds. Ignored when resuming.
+    :type timestamp: Optional[int]
+    :param limit_trades: The number of trades to request per page. Max is 500.
+    :type limit_trades: Optional[int]
+    :returns: The number of trades that were added to the file.
+
+    """
+    after_tid = 0
+    last_trade = read_last_trade(filename)
+    if last_trade:
+        after_tid = last_trade["tid"]
+        timestamp = last_trade["timestampms"]
+    count = 0
+    with open(filename, "a") as f:
+        for trade in iterate_trades_for_crypto(ticker, timestamp, after_tid, limit_trades):
+            f.write(json.dumps(trade) + "\n")
+            count += 1
+            if count % limit_trades == 0:
+                f.flush()
+    return count
+
+
+def read_last_trade(filename):
+    """ Returns the last complete trade written by download_trades_for_crypto, or None if there is not one. \
+        A partly written last line is removed so that appending continues after the last complete trade.
+    """
+    if not os.path.exists(filename):
+        return None
+    last_trade = None
+    complete_size = 0
+    with open(filename, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                last_trade = json.loads(line)
+            except ValueError:
+                break
+            complete_size += len(line)
+    if complete_size < os.path.getsize(filename):
+        with open(filename, "rb+") as f:
+            f.truncate(complete_size)
+    return last_trade
+
+
 @login_required
 @format_inputs
 def cancel_all_session_orders(jsonify=None):
@@ -73,8 +164,8 @@ def cancel_all_session_orders(jsonify=None):
     payload = {
         "request": URLS.get_endpoint(url)
     }
-    generate_signature(payload)
-    data, err = request_post(url, payload, jsonify)
+    headers = generate_signature(payload)
+    data, err = request_post(url, payload, jsonify, headers)
     return data, err
 
 
@@ -98,8 +189,8 @@ def cancel_all_active_orders(jsonify=None):
     payload = {
         "request": URLS.get_endpoint(url)
     }
-    generate_signature(payload)
-    data, err = request_post(url, payload, jsonify)
+    headers = generate_signature(payload)
+    data, err = request_post(url, payload, jsonify, headers)
     return data, err
 
 
@@ -143,8 +234,8 @@ def cancel_order(order_id, jsonify=None):
         "request": URLS.get_endpoint(url),
         "order_id": order_id
     }
-    generate_signature(payload)
-    data, err = request_post(url, payload, jsonify)
+    headers = generate_signature(payload)
+    data, err = request_post(url, payload, jsonify, headers)
     return data, err
 
 
@@ -188,8 +279,8 @@ def order_status(order_id, jsonify=None):
         "request": URLS.get_endpoint(url),
         "order_id": order_id
     }
-    generate_signature(payload)
-    data, err = request_post(url, payload, jsonify)
+    headers = generate_signature(payload)
+    data, err = request_post(url, payload, jsonify, headers)
     return data, err
 
 
@@ -229,8 +320,8 @@ def active_orders(jsonify=None):
     payload = {
         "request": URLS.get_endpoint(url)
     }
-    generate_signature(payload)
-    data, err = request_post(url, payload, jsonify)
+    headers = generate_signature(payload)
+    data, err = request_post(url, payload, jsonify, headers)
     return data, err
 
 
@@ -353,6 +444,6 @@ def order(ticker, quantity, side, price=None, stop_limit_price=None, min_amount=
     if options:
         payload["options"] = options
 
-    generate_signature(payload)
-    data, err = request_post(url, payload, jsonify)
+    headers = generate_signature(payload)
+    data, err = request_post(url, payload, jsonify, headers)
     return data, err
@@ -22,6 +22,8 @@ class URLS:
     """ Static class for holding all urls."""
     __base_url = "https://api.gemini.com"
     __base_sandbox_url = "https://api.sandbox.gemini.com"
+    __websocket_url = "wss://api.gemini.com"
+    __websocket_sandbox_url = "wss://api.sandbox.gemini.com"
 
     def __init__(self):
         raise NotImplementedError(
@@ -98,6 +100,24 @@ class URLS:
     def symbol_details(cls, ticker):
         return cls.get_base_url(Version.v1) + "symbols/details/{0}".format(ticker)
 
+    @classmethod
+    def book(cls, ticker):
+        return cls.get_base_url(Version.v1) + "book/{0}".format(ticker)
+
+    @classmethod
+    def trades(cls, ticker):
+        return cls.get_base_url(Version.v1) + "trades/{0}".format(ticker)
+
+    @classmethod
+    def candles(cls, ticker, time_frame):
+        return cls.get_base_url(Version.v2) + "candles/{0}/{1}".format(ticker, time_frame)
+
+    @classmethod
+    def marketdata_websocket(cls):
+        if get_sandbox_flag():
+            return cls.__websocket_sandbox_url + "/v2/marketdata"
+        return cls.__websocket_url + "/v2/marketdata"
+
     @classmethod
     def notional_volume(cls):
         return cls.get_base_url(Version.v1) + "notionalvolume"
@@ -0,0 +1,283 @@
+"""Contains functions that load quotes and price history from robinhood, tda, and gemini at the same time and
+return them in one schema.
+
+Every quote is a :class:`Quote` and every candle is a :class:`Bar` no matter which broker it came from.
+Prices are floats, with NaN where a broker does not send a value, and times are milliseconds since epoch.
+:func:`to_columns` turns a list of either into one array per field so prices can be compared across venues
+with ``numpy.frombuffer`` or a single loop.
+"""
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import NamedTuple
+
+from robin_stocks.gemini import crypto as gemini_crypto
+from robin_stocks.robinhood import stocks as robinhood_stocks
+from robin_stocks.tda import stocks as tda_stocks
+from robin_stocks.tda.history import PERIOD_TYPES
+
+VENUES = ("robinhood", "tda", "gemini")
+NAN = float("nan")
+# The name of each interval for every venue. TD Ameritrade candles are (frequency_type, frequency) and
+# None means the venue does not have candles of that length.
+INTERVALS = {
+    "5minute": {"robinhood": "5minute", "tda": ("minute", 5), "gemini": "5m"},
+    "10minute": {"robinhood": "10minute", "tda": ("minute", 10), "gemini": None},
+    "hour": {"robinhood": "hour", "tda": None, "gemini": "1hr"},
+    "day": {"robinhood": "day", "tda": ("daily", 1), "gemini": "1day"},
+    "week": {"robinhood": "week", "tda": ("weekly", 1), "gemini": None},
+}
+SPAN_DAYS = {"day": 1, "week": 7, "month": 31, "3month": 92, "year": 366, "5year": 1827}
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+class Quote(NamedTuple):
+    """ The latest prices of a symbol at one venue.
+    """
+    venue: str
+    symbol: str
+    bid: float
+    ask: float
+    last: float
+    bid_size: float
+    ask_size: float
+    volume: float
+    timestamp: int
+
+
+class Bar(NamedTuple):
+    """ One candle of the price history of a symbol at one venue. The timestamp is the start of the candle.
+    """
+    venue: str
+    symbol: str
+    timestamp: int
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return NAN
+
+
+def to_milliseconds(value):
+    """ Converts an ISO 8601 string or a number of milliseconds to milliseconds since epoch. Returns 0 if the \
+        value is missing.
+    """
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return int(datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() * 1000)
+    return int(value)
+
+
+def normalize_robinhood_quote(item):
+    return Quote("robinhood", item["symbol"], to_float(item.get("bid_price")), to_float(item.get("ask_price")),
+                 to_float(item.get("last_trade_price")), to_float(item.get("bid_size")),
+                 to_float(item.get("ask_size")), NAN, to_milliseconds(item.get("updated_at")))
+
+
+def normalize_tda_quote(symbol, item):
+    return Quote("tda", symbol, to_float(item.get("bidPrice")), to_float(item.get("askPrice")),
+                 to_float(item.get("lastPrice")), to_float(item.get("bidSize")), to_float(item.get("askSize")),
+                 to_float(item.get("totalVolume")), to_milliseconds(item.get("quoteTimeInLong")))
+
+
+def normalize_gemini_quote(symbol, item):
+    symbol = symbol.upper()
+    volume = item.get("volume") or {}
+    # The volume is keyed by both currencies of the pair. The one the symbol starts with is the amount traded.
+    base = [value for key, value in volume.items() if key != "timestamp" and symbol.startswith(key.upper())]
+    return Quote("gemini", symbol, to_float(item.get("bid")), to_float(item.get("ask")), to_float(item.get("last")),
+                 NAN, NAN, to_float(base[0]) if base else NAN, to_milliseconds(volume.get("timestamp")))
+
+
+def normalize_robinhood_bar(item):
+    return Bar("robinhood", item["symbol"], to_milliseconds(item.get("begins_at")), to_float(item.get("open_price")),
+               to_float(item.get("high_price")), to_float(item.get("low_price")), to_float(item.get("close_price")),
+               to_float(item.get("volume")))
+
+
+def normalize_tda_bar(symbol, candle):
+    return Bar("tda", symbol, to_milliseconds(candle.get("datetime")), to_float(candle.get("open")),
+               to_float(candle.get("high")), to_float(candle.get("low")), to_float(candle.get("close")),
+               to_float(candle.get("volume")))
+
+
+def normalize_gemini_bar(symbol, candle):
+    timestamp, open_price, high, low, close, volume = candle[:6]
+    return Bar("gemini", symbol.upper(), int(timestamp), to_float(open_price), to_float(high), to_float(low),
+               to_float(close), to_float(volume))
+
+
+def load_robinhood_quotes(symbols):
+    data = robinhood_stocks.get_quotes(symbols)
+    if data is None or data == [None]:
+        return [], [ValueError("Robinhood did not return quotes.")]
+    return [normalize_robinhood_quote(item) for item in data if item is not None], []
+
+
+def load_tda_quotes(symbols):
+    data, error = tda_stocks.get_quotes(",".join(symbols), jsonify=True)
+    if error:
+        return [], [error]
+    return [normalize_tda_quote(symbol, data[symbol]) for symbol in symbols if symbol in data], []
+
+
+def load_gemini_quotes(symbols):
+    data, errors = gemini_crypto.get_pubtickers(symbols, jsonify=True)
+    quotes = [normalize_gemini_quote(symbol, item) for symbol, item, error in zip(symbols, data, errors)
+              if error is None and item]
+    return quotes, [error for error in errors if error]
+
+
+def load_robinhood_bars(symbols, interval, span):
+    data = robinhood_stocks.get_stock_historicals(symbols, INTERVALS[interval]["robinhood"], span)
+    if data is None or data == [None]:
+        return [], [ValueError("Robinhood did not return historicals.")]
+    return [normalize_robinhood_bar(item) for item in data if item is not None], []
+
+
+def load_tda_bars(symbol, interval, span):
+    frequency_type, frequency = INTERVALS[interval]["tda"]
+    end_date = int(time.time() * 1000)
+    start_date = end_date - SPAN_DAYS[span] * DAY_MS
+    data, error = tda_stocks.get_price_history(symbol, PERIOD_TYPES[frequency_type], frequency_type, frequency,
+                                               start_date=start_date, end_date=end_date, jsonify=True)
+    if error:
+        return [], [error]
+    # TD Ameritrade returns minute candles for whole days, so they are cut to the span like the Gemini candles.
+    bars = [normalize_tda_bar(symbol, candle) for candle in data.get("candles", [])]
+    return [bar for bar in bars if start_date <= bar.timestamp <= end_date], []
+
+
+def load_gemini_bars(symbol, interval, span):
+    data, error = gemini_crypto.get_candles(symbol, INTERVALS[interval]["gemini"], jsonify=True)
+    if error:
+        return [], [error]
+    # Gemini returns its most recent candles newest first, so they are cut to the span and reversed.
+    start = int(time.time() * 1000) - SPAN_DAYS[span] * DAY_MS
+    return [normalize_gemini_bar(symbol, candle) for candle in reversed(data) if candle[0] >= start], []
+
+
+def run_jobs(jobs, max_workers):
+    """ Calls every (venue, function, arguments) job at the same time.
+
+    :returns: A tuple of the records from every job in order and a dictionary of the errors for each venue.
+    """
+    def run(job):
+        venue, function, arguments = job
+        try:
+            return function(*arguments)
+        except Exception as e:
+            return [], [e]
+
+    records = []
+    errors = {}
+    if not jobs:
+        return records, errors
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs))) as executor:
+        results = list(executor.map(run, jobs))
+    for (venue, _, _), (job_records, job_errors) in zip(jobs, results):
+        records.extend(job_records)
+        if job_errors:
+            errors.setdefault(venue, []).extend(job_errors)
+    return records, errors
+
+
+def get_quotes(robinhood=None, tda=None, gemini=None, max_workers=8):
+    """ Gets quotes from each venue at the same time. The robinhood and tda modules must be logged in \
+        to load their quotes, and gemini quotes are public.
+
+    :param robinhood: The stock tickers to load from Robinhood.
+    :type robinhood: Optional[list]
+    :param tda: The stock tickers to load from TD Ameritrade.
+    :type tda: Optional[list]
+    :param gemini: The crypto tickers to load from Gemini, such as btcusd.
+    :type gemini: Optional[list]
+    :param max_workers: The number of requests to send at the same time.
+    :type max_workers: Optional[int]
+    :returns: A tuple where the first entry is a list of Quote and the second entry is a dictionary of \
+        the list of errors for each venue that had an error. Quotes are in the order of the venues and tickers given.
+
+    """
+    jobs = []
+    if robinhood:
+        jobs.append(("robinhood", load_robinhood_quotes, ([symbol.upper() for symbol in robinhood],)))
+    if tda:
+        jobs.append(("tda", load_tda_quotes, ([symbol.upper() for symbol in tda],)))
+    if gemini:
+        jobs.append(("gemini", load_gemini_quotes, ([symbol.lower() for symbol in gemini],)))
+    return run_jobs(jobs, max_workers)
+
+
+def get_history(robinhood=None, tda=None, gemini=None, interval="day", span="year", max_workers=8):
+    """ Gets the price history of each symbol from each venue at the same time.
+
+    :param robinhood: The stock tickers to load from Robinhood.
+    :type robinhood: Optional[list]
+    :param tda: The stock tickers to load from TD Ameritrade.
+    :type tda: Optional[list]
+    :param gemini: The crypto tickers to load from Gemini. Gemini only returns its most recent candles, \
+        so long spans are cut short.
+    :type gemini: Optional[list]
+    :param interval: The length of each candle. Can be 5minute, 10minute, hour, day, or week. \
+        TD Ameritrade does not have hour candles and Gemini does not have 10minute or week candles.
+    :type interval: Optional[str]
+    :param span: How far back to load. Can be day, week, month, 3month, year, or 5year. TD Ameritrade and \
+        Gemini candles that start outside the span are left out.
+    :type span: Optional[str]
+    :param max_workers: The number of requests to send at the same time.
+    :type max_workers: Optional[int]
+    :returns: A tuple where the first entry is a list of Bar, oldest first for each symbol, and the second entry \
+        is a dictionary of the list of errors for each venue that had an error.
+    :raises: ValueError if the interval or span is not valid, or a venue with tickers does not have the interval.
+
+    """
+    if interval not in INTERVALS:
+        raise ValueError("The interval must be one of {0}.".format(", ".join(INTERVALS)))
+    if span not in SPAN_DAYS:
+        raise ValueError("The span must be one of {0}.".format(", ".join(SPAN_DAYS)))
+    for venue, symbols in zip(VENUES, (robinhood, tda, gemini)):
+        if symbols and INTERVALS[interval][venue] is None:
+            raise ValueError("{0} does not have {1} candles.".format(venue, interval))
+
+    jobs = []
+    if robinhood:
+        jobs.append(("robinhood", load_robinhood_bars, ([symbol.upper() for symbol in robinhood], interval, span)))
+    for symbol in tda or []:
+        jobs.append(("tda", load_tda_bars, (symbol.upper(), interval, span)))
+    for symbol in gemini or []:
+        jobs.append(("gemini", load_gemini_bars, (symbol.lower(), interval, span)))
+    return run_jobs(jobs, max_workers)
+
+
+def to_columns(records, record_type=Quote):
+    """ Turns a list of Quote or Bar into one column per field. Number fields are stored in arrays of 64 bit \
+        floats or integers, so a whole column can be compared at once or passed to ``numpy.frombuffer``.
+
+    :param records: The records returned by get_quotes or get_history.
+    :type records: list
+    :param record_type: The type of the records. Only used to name the columns when records is empty.
+    :type record_type: Optional[type]
+    :returns: A dictionary with a list for the venue and symbol fields and an array for every other field.
+
+    """
+    if records:
+        record_type = type(records[0])
+    columns = {}
+    for index, (name, field_type) in enumerate(record_type.__annotations__.items()):
+        values = (record[index] for record in records)
+        if field_type is float:
+            columns[name] = array("d", values)
+        elif field_type is int:
+            columns[name] = array("q", values)
+        else:
+            columns[name] = list(values)
+    return columns
@@ -0,0 +1,241 @@
+"""Contains a requests transport adapter that records http responses to a file and replays them later.
+
+The adapter is mounted on the SESSION of robinhood, tda, and gemini, so a function works without a network
+connection or a login once its responses have been recorded. This is used to run regression tests and benchmarks
+in environments that cannot reach the brokers. Requests are matched on their method, url, and body. Query
+parameters that change on every call, such as the nonce that gemini sends with each private request, are left out
+of the match. Anything else that changes between calls, such as a timestamp in a body, has to be recorded again.
+"""
+import base64
+import json
+from contextlib import contextmanager
+from http.client import responses
+from io import BytesIO
+from threading import Lock
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+# Query parameters that are different on every call. Gemini sends the nonce of a signed request as a parameter.
+VOLATILE_PARAMETERS = {"nonce"}
+# Headers that describe how the recorded body was sent over the wire. The body is stored decoded, so these
+# would be wrong when it is replayed.
+TRANSPORT_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+def interaction_key(method, url, body=None):
+    """ Builds the key that a request is recorded under. Query parameters are sorted so that the order they
+        were passed in does not matter, and the ones in VOLATILE_PARAMETERS are left out.
+    """
+    parts = urlsplit(url)
+    query = urlencode(sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                             if name not in VOLATILE_PARAMETERS))
+    url = urlunsplit((parts.scheme, parts.netloc.lower(), parts.path, query, ""))
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", "replace")
+    return "{0} {1} {2}".format(method.upper(), url, body or "")
+
+
+class Cassette:
+    """ A set of recorded responses. A request that was recorded several times is answered with each
+        recording in turn, and the last one is repeated after that.
+
+    :param path: The JSON file the responses are saved to.
+    :type path: Optional[str]
+
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.interactions = {}
+        self.positions = {}
+        self.lock = Lock()
+
+    @classmethod
+    def load(cls, path):
+        """ Reads a cassette that was written by save().
+        """
+        cassette = cls(path)
+        with open(path, "r", encoding="utf-8") as f:
+            for item in json.load(f)["interactions"]:
+                if item.get("encoding") == "base64":
+                    content = base64.b64decode(item["content"])
+                else:
+                    content = item["content"].encode("utf-8")
+                cassette.add(item["method"], item["url"], item.get("body"), item["status_code"], item["headers"],
+                             content)
+        return cassette
+
+    def save(self, path=None):
+        """ Writes every recorded response to a JSON file.
+        """
+        path = path or self.path
+        interactions = []
+        with self.lock:
+            for entries in self.interactions.values():
+                for entry in entries:
+                    item = dict(entry)
+                    try:
+                        item["content"] = entry["content"].decode("utf-8")
+                    except UnicodeDecodeError:
+                        item["content"] = base64.b64encode(entry["content"]).decode("ascii")
+                        item["encoding"] = "base64"
+                    interactions.append(item)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"interactions": interactions}, f)
+
+    def add(self, method, url, body, status_code, headers, content):
+        """ Records one response.
+
+        :param method: The http method of the request.
+        :type method: str
+        :param url: The full url of the request, including the query string.
+        :type url: str
+        :param body: The body of the request, or None.
+        :type body: Optional[str]
+        :param status_code: The status code of the response.
+        :type status_code: int
+        :param headers: The headers of the response.
+        :type headers: dict
+        :param content: The body of the response.
+        :type content: bytes
+
+        """
+        if isinstance(body, bytes):
+            body = body.decode("utf-8", "replace")
+        headers = {key: value for key, value in headers.items() if key.lower() not in TRANSPORT_HEADERS}
+        entry = {"method": method.upper(), "url": url, "body": body, "status_code": status_code,
+                 "headers": headers, "content": content}
+        with self.lock:
+            self.interactions.setdefault(interaction_key(method, url, body), []).append(entry)
+
+    def add_json(self, method, url, data, params=None, body=None, status_code=200):
+        """ Records a JSON response. The url and params are combined the same way requests combines them.
+        """
+        url = requests.Request(method, url, params=params).prepare().url
+        self.add(method, url, body, status_code, {"Content-Type": "application/json"}, json.dumps(data).encode())
+
+    def next_response(self, method, url, body=None):
+        """ Returns the next recorded response for a request, or None if the request was not recorded.
+        """
+        key = interaction_key(method, url, body)
+        with self.lock:
+            entries = self.interactions.get(key)
+            if not entries:
+                return None
+            position = self.positions.get(key, 0)
+            self.positions[key] = position + 1
+            return entries[min(position, len(entries) - 1)]
+
+    def rewind(self):
+        """ Starts answering every request from its first recording again.
+        """
+        with self.lock:
+            self.positions = {}
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.interactions.values())
+
+
+class ReplayAdapter(BaseAdapter):
+    """ A transport adapter that answers requests from a cassette, or sends them and records the responses.
+
+    :param cassette: The cassette to read from or record to.
+    :type cassette: Cassette
+    :param mode: Either replay or record. In replay mode a request that was not recorded raises a ConnectionError.
+    :type mode: Optional[str]
+    :param adapter: The adapter that sends requests in record mode. Default is a new HTTPAdapter.
+    :type adapter: Optional[requests.adapters.BaseAdapter]
+
+    """
+
+    def __init__(self, cassette, mode="replay", adapter=None):
+        super().__init__()
+        if mode not in ("replay", "record"):
+            raise ValueError("The mode must be replay or record.")
+        self.cassette = cassette
+        self.mode = mode
+        self.adapter = adapter
+        if mode == "record" and adapter is None:
+            self.adapter = HTTPAdapter()
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        if self.mode == "record":
+            response = self.adapter.send(request, stream=False, timeout=timeout, verify=verify, cert=cert,
+                                         proxies=proxies)
+            self.cassette.add(request.method, request.url, request.body, response.status_code,
+                              dict(response.headers), response.content)
+            return response
+        entry = self.cassette.next_response(request.method, request.url, request.body)
+        if entry is None:
+            raise requests.exceptions.ConnectionError(
+                "No recorded response for {0} {1}".format(request.method, request.url), request=request)
+        return self.build_response(request, entry)
+
+    def build_response(self, request, entry):
+        response = requests.Response()
+        response.status_code = entry["status_code"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.reason = responses.get(entry["status_code"], "")
+        response.raw = BytesIO(entry["content"])
+        response._content = entry["content"]
+        response._content_consumed = True
+        return response
+
+    def close(self):
+        if self.adapter is not None:
+            self.adapter.close()
+
+
+def get_sessions():
+    """ Returns the SESSION of robinhood, tda, and gemini.
+    """
+    from robin_stocks.gemini.globals import SESSION as gemini_session
+    from robin_stocks.robinhood.globals import SESSION as robinhood_session
+    from robin_stocks.tda.globals import SESSION as tda_session
+    return [robinhood_session, tda_session, gemini_session]
+
+
+@contextmanager
+def use_cassette(cassette, mode="replay", sessions=None, adapter=None):
+    """ Mounts a ReplayAdapter on each session for the length of a with block. In record mode the cassette
+        is saved when the block ends. requests uses the adapter with the longest matching prefix, so the ReplayAdapter
+        also replaces adapters already mounted on longer prefixes. Adapters with a true forwards_to_session attribute
+        are kept, because they only move a request onto another url and send it through the session's adapters,
+        like the one mounted by robinhood.set_base_url().
+
+    :param cassette: A cassette, or the path of a cassette file. In replay mode the file is loaded.
+    :type cassette: Cassette or str
+    :param mode: Either replay or record.
+    :type mode: Optional[str]
+    :param sessions: The sessions to mount the adapter on. Default is the robinhood, tda, and gemini sessions.
+    :type sessions: Optional[list]
+    :param adapter: The adapter that sends requests in record mode.
+    :type adapter: Optional[requests.adapters.BaseAdapter]
+    :returns: The cassette.
+
+    """
+    if isinstance(cassette, str):
+        cassette = Cassette.load(cassette) if mode == "replay" else Cassette(cassette)
+    replay_adapter = ReplayAdapter(cassette, mode, adapter)
+    sessions = sessions if sessions is not None else get_sessions()
+    saved = [dict(session.adapters) for session in sessions]
+    try:
+        for session in sessions:
+            prefixes = ["https://", "http://"] + [prefix for prefix, mounted in session.adapters.items()
+                                                  if not getattr(mounted, "forwards_to_session", False)]
+            for prefix in prefixes:
+                session.mount(prefix, replay_adapter)
+        yield cassette
+    finally:
+        for session, adapters in zip(sessions, saved):
+            session.adapters.clear()
+            for prefix, original in adapters.items():
+                session.mount(prefix, original)
+        if mode == "record" and cassette.path:
+            cassette.save()
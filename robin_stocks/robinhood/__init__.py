@@ -1,77 +1,96 @@
-from .account import (build_holdings, build_user_profile,
-                      delete_symbols_from_watchlist,
-                      deposit_funds_to_robinhood_account,
-                      download_all_documents, download_document,
-                      get_all_positions, get_all_watchlists,
-                      get_bank_account_info, get_bank_transfers,
-                      get_card_transactions, get_day_trades, get_dividends,
-                      get_dividends_by_instrument, get_documents,
-                      get_historical_portfolio, get_latest_notification,
-                      get_linked_bank_accounts, get_margin_calls,
-                      get_margin_interest, get_notifications,
-                      get_open_stock_positions, get_referrals,
-                      get_stock_loan_payments, get_interest_payments,
-                      get_subscription_fees, get_total_dividends, get_watchlist_by_name,
-                      get_wire_transfers, load_phoenix_account,
-                      post_symbols_to_watchlist, unlink_bank_account,
-                      withdrawl_funds_to_bank_account)
-from .authentication import login, logout
-from .crypto import (get_crypto_currency_pairs, get_crypto_historicals,
-                     get_crypto_info, get_crypto_positions, get_crypto_quote,
-                     get_crypto_quote_from_id, load_crypto_profile)
-from .export import (export_completed_crypto_orders,
-                     export_completed_option_orders,
-                     export_completed_stock_orders)
-from .helper import (filter_data, get_output, request_delete, request_document,
-                     request_get, request_post, set_output, update_session)
-from .markets import (get_all_stocks_from_market_tag, get_currency_pairs,
-                      get_market_hours, get_market_next_open_hours,
-                      get_market_next_open_hours_after_date,
-                      get_market_today_hours, get_markets, get_top_100,
-                      get_top_movers, get_top_movers_sp500)
-from .options import (find_options_by_expiration,
-                      find_options_by_expiration_and_strike,
-                      find_options_by_specific_profitability,
-                      find_options_by_strike, find_tradable_options,
-                      get_aggregate_open_positions,
-                      get_aggregate_positions, get_all_option_positions,
-                      get_chains, get_market_options,
-                      get_open_option_positions, get_option_historicals,
-                      get_option_instrument_data,
-                      get_option_instrument_data_by_id, get_option_market_data,
-                      get_option_market_data_by_id)
-from .orders import (cancel_all_crypto_orders, cancel_all_option_orders,
-                     cancel_all_stock_orders, cancel_crypto_order,
-                     cancel_option_order, cancel_stock_order,
-                     find_stock_orders, get_all_crypto_orders,
-                     get_all_open_crypto_orders, get_all_open_option_orders,
-                     get_all_open_stock_orders, get_all_option_orders,
-                     get_all_stock_orders, get_crypto_order_info,
-                     get_option_order_info, get_stock_order_info, order,
-                     order_buy_crypto_by_price, order_buy_crypto_by_quantity,
-                     order_buy_crypto_limit, order_buy_crypto_limit_by_price,
-                     order_buy_fractional_by_price,
-                     order_buy_fractional_by_quantity, order_buy_limit,
-                     order_buy_market, order_buy_option_limit,
-                     order_buy_option_stop_limit, order_buy_stop_limit,
-                     order_buy_stop_loss, order_buy_trailing_stop,
-                     order_crypto, order_option_credit_spread,
-                     order_option_debit_spread, order_option_spread,
-                     order_sell_crypto_by_price, order_sell_crypto_by_quantity,
-                     order_sell_crypto_limit, order_sell_crypto_limit_by_price,
-                     order_sell_fractional_by_price,
-                     order_sell_fractional_by_quantity, order_sell_limit,
-                     order_sell_market, order_sell_option_limit,
-                     order_sell_option_stop_limit, order_sell_stop_limit,
-                     order_sell_stop_loss, order_sell_trailing_stop)
-from .profiles import (load_account_profile, load_basic_profile,
-                       load_investment_profile, load_portfolio_profile,
-                       load_security_profile, load_user_profile)
-from .stocks import (find_instrument_data, get_earnings, get_events,
-                     get_fundamentals, get_instrument_by_url,
-                     get_instruments_by_symbols, get_latest_price,
-                     get_name_by_symbol, get_name_by_url, get_news,
-                     get_pricebook_by_id, get_pricebook_by_symbol, get_quotes,
-                     get_ratings, get_splits, get_stock_historicals,
-                     get_stock_quote_by_id, get_stock_quote_by_symbol,
-                     get_symbol_by_url)
+"""Functions for the Robinhood api. Submodules are imported the first time one of their functions is used,
+so ``import robin_stocks.robinhood`` does not load requests or any of the submodules."""
+
+from robin_stocks._lazy import lazy_module
+
+# The submodule that defines each function and class exported by this package.
+SUBMODULE_ATTRIBUTES = {
+    'account': [
+        'build_dividend_index', 'build_holdings', 'build_user_profile', 'delete_symbols_from_watchlist',
+        'deposit_funds_to_robinhood_account', 'download_all_documents', 'download_document',
+        'get_all_positions', 'get_all_watchlists', 'get_bank_account_info', 'get_bank_transfers',
+        'get_card_transactions', 'get_day_trades', 'get_dividends', 'get_dividend_index',
+        'get_dividends_by_instrument', 'get_documents', 'get_historical_portfolio', 'get_latest_notification',
+        'get_linked_bank_accounts', 'get_margin_calls', 'get_margin_interest', 'get_notifications',
+        'get_open_stock_positions', 'get_referrals', 'get_stock_loan_payments', 'get_interest_payments',
+        'get_subscription_fees', 'get_total_dividends', 'get_watchlist_by_name', 'get_wire_transfers',
+        'load_phoenix_account', 'post_symbols_to_watchlist', 'stream_document_to_file', 'unlink_bank_account',
+        'update_dividend_index', 'withdrawl_funds_to_bank_account'
+    ],
+    'analytics': [
+        'build_equity_curve', 'calculate_money_weighted_return', 'calculate_net_deposits',
+        'calculate_portfolio_pnl', 'calculate_position_pnl', 'calculate_sector_exposure',
+        'calculate_time_weighted_return', 'get_portfolio_analytics', 'parse_timestamp'
+    ],
+    'authentication': [
+        'login', 'logout'
+    ],
+    'crypto': [
+        'get_crypto_currency_pairs', 'get_crypto_historicals', 'get_crypto_id', 'get_crypto_ids', 'get_crypto_info',
+        'get_crypto_positions', 'get_crypto_quote', 'get_crypto_quote_from_id', 'get_crypto_quotes',
+        'load_crypto_profile', 'load_currency_pair_index'
+    ],
+    'export': [
+        'export_completed_crypto_orders', 'export_completed_option_orders', 'export_completed_stock_orders'
+    ],
+    'helper': [
+        'clear_instrument_cache', 'filter_data', 'get_coalescing_stats', 'get_output', 'instrument_for_symbol',
+        'request_delete', 'request_document', 'request_get', 'request_post', 'set_base_url', 'set_output',
+        'set_request_coalescing', 'update_session'
+    ],
+    'markets': [
+        'get_all_stocks_from_market_tag', 'get_currency_pairs', 'get_market_hours',
+        'get_market_next_open_hours', 'get_market_next_open_hours_after_date', 'get_market_today_hours',
+        'get_markets', 'get_top_100', 'get_top_movers', 'get_top_movers_sp500'
+    ],
+    'mockserver': [
+        'MockRobinhoodServer'
+    ],
+    'options': [
+        'find_options_by_expiration', 'find_options_by_expiration_and_strike',
+        'find_options_by_specific_profitability', 'find_options_by_strike', 'find_tradable_options',
+        'get_aggregate_open_positions', 'get_aggregate_positions', 'get_all_option_positions', 'get_chains',
+        'get_market_options', 'get_open_option_positions', 'get_option_historicals',
+        'get_option_instrument_data', 'get_option_instrument_data_by_id', 'get_option_market_data',
+        'get_option_market_data_by_id'
+    ],
+    'orders': [
+        'cancel_all_crypto_orders', 'cancel_all_option_orders', 'cancel_all_stock_orders',
+        'cancel_crypto_order', 'cancel_option_order', 'cancel_stock_order', 'find_stock_orders',
+        'get_all_crypto_orders', 'get_all_open_crypto_orders', 'get_all_open_option_orders',
+        'get_all_open_stock_orders', 'get_all_option_orders', 'get_all_stock_orders', 'get_crypto_order_info',
+        'get_option_order_info', 'get_stock_order_info', 'order', 'order_buy_crypto_by_price',
+        'order_buy_crypto_by_quantity', 'order_buy_crypto_limit', 'order_buy_crypto_limit_by_price',
+        'order_buy_fractional_by_price', 'order_buy_fractional_by_quantity', 'order_buy_limit',
+        'order_buy_market', 'order_buy_option_limit', 'order_buy_option_stop_limit', 'order_buy_stop_limit',
+        'order_buy_stop_loss', 'order_buy_trailing_stop', 'order_crypto', 'order_option_credit_spread',
+        'order_option_debit_spread', 'order_option_spread', 'order_sell_crypto_by_price',
+        'order_sell_crypto_by_quantity', 'order_sell_crypto_limit', 'order_sell_crypto_limit_by_price',
+        'order_sell_fractional_by_price', 'order_sell_fractional_by_quantity', 'order_sell_limit',
+        'order_sell_market', 'order_sell_option_limit', 'order_sell_option_stop_limit', 'order_sell_stop_limit',
+        'order_sell_stop_loss', 'order_sell_trailing_stop'
+    ],
+    'profiles': [
+        'load_account_profile', 'load_basic_profile', 'load_investment_profile', 'load_portfolio_profile',
+        'load_security_profile', 'load_user_profile'
+    ],
+    'records': [
+        'ExecutionRecord', 'OrderRecord', 'PositionRecord', 'QuoteRecord', 'Record', 'record_type', 'to_records'
+    ],
+    'stocks': [
+        'find_instrument_data', 'get_earnings', 'get_events', 'get_fundamentals', 'get_instrument_by_url',
+        'get_instruments_by_symbols', 'get_latest_price', 'get_name_by_symbol', 'get_name_by_url', 'get_news',
+        'get_pricebook_by_id', 'get_pricebook_by_symbol', 'get_quotes', 'get_ratings', 'get_splits',
+        'get_stock_historicals', 'get_stock_quote_by_id', 'get_stock_quote_by_symbol', 'get_symbol_by_url',
+        'get_symbols_by_urls'
+    ],
+    'streaming': [
+        'QuoteService', 'QuoteSubscription'
+    ],
+    'urls': [
+        'ROUTER', 'EndpointRouter'
+    ]
+}
+SUBMODULES = {'account', 'analytics', 'authentication', 'crypto', 'export', 'globals', 'helper', 'markets', 'mockserver', 'options', 'orders', 'profiles', 'records', 'stocks', 'streaming', 'urls'}
+__all__ = [name for names in SUBMODULE_ATTRIBUTES.values() for name in names]
+__getattr__, __dir__ = lazy_module(__name__, SUBMODULE_ATTRIBUTES, SUBMODULES)
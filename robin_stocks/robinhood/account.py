@@ -1,5 +1,8 @@
 """Contains functions for getting information related to the user account."""
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 from uuid import uuid4
 
 from robin_stocks.robinhood.helper import *
@@ -184,12 +187,18 @@ def get_dividends(info=None):
 
 
 @login_required
-def get_total_dividends():
+def get_total_dividends(dividend_index=None):
     """Returns a float number representing the total amount of dividends paid to the account.
 
+    :param dividend_index: The index returned by get_dividend_index(). If provided, the total is read \
+    from the index instead of downloading the dividend history again.
+    :type dividend_index: Optional[dict]
     :returns: Total dollar amount of dividends paid to the account as a 2 precision float.
 
     """
+    if dividend_index is not None:
+        return(dividend_index['total_paid'])
+
     url = dividends_url()
     data = request_get(url, 'pagination')
 
@@ -205,12 +214,23 @@ def get_dividends_by_instrument(instrument, dividend_data):
 
     :param instrument: The instrument to get the dividend data.
     :type instrument: str
-    :param dividend_data: The information returned by get_dividends().
-    :type dividend_data: list
+    :param dividend_data: The information returned by get_dividends() or the index returned by get_dividend_index(). \
+    Passing the index makes the lookup constant time, which matters when this is called for every position.
+    :type dividend_data: list or dict
     :returns: dividend_rate       -- the rate paid for a single share of a specified stock \
               total_dividend      -- the total dividend paid based on total shares for a specified stock \
               amount_paid_to_date -- total amount earned by account for this particular stock
     """
+    if type(dividend_data) == dict:
+        entry = dividend_data['instruments'].get(instrument)
+        if entry is None:
+            return None
+        return {
+            'dividend_rate': "{0:.2f}".format(entry['dividend_rate']),
+            'total_dividend': "{0:.2f}".format(entry['total_dividend']),
+            'amount_paid_to_date': "{0:.2f}".format(entry['amount_paid_to_date'])
+        }
+
     #global dividend_data
     try:
         data = list(
@@ -229,6 +249,123 @@ def get_dividends_by_instrument(instrument, dividend_data):
         pass
 
 
+def build_dividend_index(dividend_data):
+    """Groups a list of dividend payments by instrument and by time in a single pass over the data.
+
+    :param dividend_data: The information returned by get_dividends().
+    :type dividend_data: list
+    :returns: A dictionary with the keys listed below. Per instrument values are floats. The monthly, yearly, \
+    and total_paid values only count dividends that were paid or reinvested, the same as get_total_dividends().
+    :Dictionary Keys: * instruments - dictionary keyed by instrument url. Each value contains dividend_rate and \
+                        total_dividend of the most recent payment, its payable_date, amount_paid_to_date, and count.
+                      * monthly - dictionary of YYYY-MM to the amount paid that month.
+                      * yearly - dictionary of YYYY to the amount paid that year.
+                      * total_paid - the total amount paid to the account.
+                      * payments - dictionary of each dividend id in the index to the (state, amount, payable_date) \
+                        that it was counted with.
+
+    """
+    dividend_index = {
+        'instruments': {},
+        'monthly': {},
+        'yearly': {},
+        'total_paid': 0.0,
+        'payments': {}
+    }
+    return(update_dividend_index(dividend_index, dividend_data))
+
+
+def update_dividend_index(dividend_index, dividend_data):
+    """Adds dividend payments to an index created by build_dividend_index(). Payments that are already in \
+    the index with the same state and amount are ignored, so the full dividend history can be passed in again \
+    and only the new payments are counted. A payment whose state changed, such as from pending to paid, has \
+    its old amount taken out of the totals before the new one is added.
+
+    :param dividend_index: The index to update.
+    :type dividend_index: dict
+    :param dividend_data: The information returned by get_dividends().
+    :type dividend_data: list
+    :returns: The updated index.
+
+    """
+    instruments = dividend_index['instruments']
+    payments = dividend_index['payments']
+    for item in dividend_data:
+        if not item:
+            continue
+        amount = float(item['amount'])
+        date = item['payable_date'] or ''
+        payment = (item['state'], amount, date)
+        previous = payments.get(item['id'])
+        if previous == payment:
+            continue
+        payments[item['id']] = payment
+
+        entry = instruments.get(item['instrument'])
+        if entry is None:
+            instruments[item['instrument']] = {
+                'dividend_rate': float(item['rate']),
+                'total_dividend': amount,
+                'amount_paid_to_date': amount,
+                'count': 1,
+                'payable_date': date
+            }
+        elif previous is not None:
+            entry['amount_paid_to_date'] += amount - previous[1]
+            if date >= entry['payable_date']:
+                entry['dividend_rate'] = float(item['rate'])
+                entry['total_dividend'] = amount
+                entry['payable_date'] = date
+            add_paid_dividend(dividend_index, previous[0], -previous[1], previous[2])
+        else:
+            entry['amount_paid_to_date'] += amount
+            entry['count'] += 1
+            # The api lists the newest payment first, so only replace on a strictly later date.
+            if date > entry['payable_date']:
+                entry['dividend_rate'] = float(item['rate'])
+                entry['total_dividend'] = amount
+                entry['payable_date'] = date
+
+        add_paid_dividend(dividend_index, item['state'], amount, date)
+
+    return(dividend_index)
+
+
+def add_paid_dividend(dividend_index, state, amount, date):
+    """Adds an amount to the monthly, yearly, and total_paid values of the index if the state is paid or \
+    reinvested. A negative amount takes a payment back out."""
+    if state != 'paid' and state != 'reinvested':
+        return
+    dividend_index['total_paid'] += amount
+    if date:
+        monthly = dividend_index['monthly']
+        yearly = dividend_index['yearly']
+        monthly[date[0:7]] = monthly.get(date[0:7], 0.0) + amount
+        yearly[date[0:4]] = yearly.get(date[0:4], 0.0) + amount
+
+
+# The index returned by get_dividend_index(). It is cleared by logout().
+DIVIDEND_INDEX = None
+
+
+@login_required
+def get_dividend_index(refresh=False):
+    """Returns an index of the account's dividends grouped by instrument, month, and year. The index is built \
+    the first time this is called and kept in memory for later calls.
+
+    :param refresh: If true, downloads the dividend history again and adds any new payments to the index.
+    :type refresh: Optional[bool]
+    :returns: The dictionary described in build_dividend_index().
+
+    """
+    global DIVIDEND_INDEX
+    if DIVIDEND_INDEX is None:
+        DIVIDEND_INDEX = build_dividend_index(get_dividends())
+    elif refresh:
+        update_dividend_index(DIVIDEND_INDEX, get_dividends())
+    return(DIVIDEND_INDEX)
+
+
 @login_required
 def get_notifications(info=None):
     """Returns a list of notifications.
@@ -579,62 +716,126 @@ def download_document(url, name=None, dirpath=None):
     return(data)
 
 
+def stream_document_to_file(url, filename, chunk_size=65536):
+    """Streams a document to disk in chunks. The body is written to a temporary .part file which
+    is renamed once the download completes. If a file with the same size as the server's Content-Length
+    already exists it is skipped, and if a .part file was left behind by a failed download the
+    transfer is resumed from where it stopped.
+
+    :param url: The url of the document.
+    :type url: str
+    :param filename: The path of the file to write.
+    :type filename: str
+    :param chunk_size: The number of bytes to read from the response at a time.
+    :type chunk_size: Optional[int]
+    :returns: A tuple of the status ('downloaded', 'skipped', or 'failed') and the number of bytes \
+    transferred over the network. When a download fails partway, the bytes already written to the .part file are counted.
+
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    partname = filename + '.part'
+    headers = None
+    resume_from = 0
+    if os.path.exists(partname):
+        resume_from = os.path.getsize(partname)
+        headers = {'Range': 'bytes={0}-'.format(resume_from)}
+
+    res = request_document(url, stream=True, headers=headers)
+    if res is None and headers:
+        # The server may refuse the range, so start over from the beginning.
+        resume_from = 0
+        res = request_document(url, stream=True)
+    if res is None:
+        return('failed', 0)
+
+    written = 0
+    try:
+        length = res.headers.get('Content-Length')
+        if res.status_code != 206 and length is not None and os.path.exists(filename) \
+                and os.path.getsize(filename) == int(length):
+            return('skipped', 0)
+
+        mode = 'ab' if res.status_code == 206 else 'wb'
+        with open(partname, mode) as f:
+            for chunk in res.iter_content(chunk_size=chunk_size):
+                if chunk:
+                    f.write(chunk)
+                    written += len(chunk)
+    except Exception as message:
+        print('Error downloading {0}: {1}'.format(url, message), file=get_output())
+        return('failed', written)
+    finally:
+        res.close()
+
+    os.replace(partname, filename)
+    return('downloaded', written)
+
+
 @login_required
-def download_all_documents(doctype=None, dirpath=None):
+def download_all_documents(doctype=None, dirpath=None, max_workers=4):
     """Downloads all the documents associated with an account and saves them as a PDF.
     If no name is given, document is saved as a combination of the data of creation, type, and id.
     If no directory is given, document is saved in the root directory of code.
+    Documents are downloaded concurrently and streamed to disk. Files that already exist with the
+    same size are skipped and interrupted downloads are resumed, so calling this function again after
+    a failure only transfers what is missing.
 
     :param doctype: The type of document to download, such as account_statement.
     :type doctype: Optional[str]
     :param dirpath: The directory of where to save the documents.
     :type dirpath: Optional[str]
+    :param max_workers: The number of documents to download at the same time.
+    :type max_workers: Optional[int]
     :returns: Returns the list of documents from get_documents(info=None)
 
     """
     documents = get_documents()
 
-    downloaded_files = False
     if dirpath:
         directory = dirpath
     else:
         directory = 'robin_documents/'
 
+    items = [item for item in documents if doctype == None or item['type'] == doctype]
+    if len(items) == 0:
+        print('WARNING: Could not find files of that doctype to download', file=get_output())
+        return(documents)
+
     counter = 0
-    for item in documents:
-        if doctype == None:
-            data = request_document(item['download_url'])
-            if data:
-                name = item['created_at'][0:10] + '-' + \
-                    item['type'] + '-' + item['id']
-                filename = directory + name + '.pdf'
-                os.makedirs(os.path.dirname(filename), exist_ok=True)
-                open(filename, 'wb').write(data.content)
-                downloaded_files = True
+    lock = Lock()
+
+    def download(item):
+        nonlocal counter
+        name = item['created_at'][0:10] + '-' + item['type'] + '-' + item['id']
+        filename = os.path.join(directory, name + '.pdf')
+        status, size = stream_document_to_file(item['download_url'], filename)
+        if status == 'downloaded':
+            with lock:
                 counter += 1
                 print('Writing PDF {}...'.format(counter), file=get_output())
-        else:
-            if item['type'] == doctype:
-                data = request_document(item['download_url'])
-                if data:
-                    name = item['created_at'][0:10] + '-' + \
-                        item['type'] + '-' + item['id']
-                    filename = directory + name + '.pdf'
-                    os.makedirs(os.path.dirname(filename), exist_ok=True)
-                    open(filename, 'wb').write(data.content)
-                    downloaded_files = True
-                    counter += 1
-                    print('Writing PDF {}...'.format(counter), file=get_output())
-
-    if downloaded_files == False:
-        print('WARNING: Could not find files of that doctype to download', file=get_output())
+        return(status, size)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(download, items))
+    elapsed = time.perf_counter() - start
+
+    total_bytes = sum(size for _, size in results)
+    skipped = sum(1 for status, _ in results if status == 'skipped')
+    failed = sum(1 for status, _ in results if status == 'failed')
+    if counter == 1:
+        print('Done - wrote {} file to {}'.format(counter,
+                                                  os.path.abspath(directory)), file=get_output())
     else:
-        if counter == 1:
-            print('Done - wrote {} file to {}'.format(counter,
-                                                      os.path.abspath(directory)), file=get_output())
-        else:
-            print('Done - wrote {} files to {}'.format(counter,
-                                                       os.path.abspath(directory)), file=get_output())
+        print('Done - wrote {} files to {}'.format(counter,
+                                                   os.path.abspath(directory)), file=get_output())
+    if elapsed > 0:
+        print('Downloaded {0:.2f} MB in {1:.2f} seconds ({2:.2f} MB/s)'.format(
+            total_bytes / 1e6, elapsed, total_bytes / 1e6 / elapsed), file=get_output())
+    if skipped:
+        print('Skipped {} files that were already downloaded'.format(skipped), file=get_output())
+    if failed:
+        print('WARNING: {} files failed to download. Call the function again to resume.'.format(failed), file=get_output())
 
     return(documents)
 
@@ -765,7 +966,7 @@ def build_holdings(with_dividends=False):
 
     # user wants dividend information in their holdings
     if with_dividends is True:
-        dividend_data = get_dividends()
+        dividend_data = build_dividend_index(get_dividends())
 
     if not positions_data or not portfolios_data or not accounts_data:
         return({})
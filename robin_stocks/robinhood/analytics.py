@@ -0,0 +1,393 @@
+"""Contains functions for calculating profit and loss, returns, and exposure for a portfolio."""
+import re
+from datetime import datetime, timedelta, timezone
+
+from robin_stocks.robinhood.account import *
+from robin_stocks.robinhood.helper import *
+from robin_stocks.robinhood.profiles import *
+from robin_stocks.robinhood.stocks import *
+
+
+# The parts of an ISO 8601 timestamp. datetime.fromisoformat before Python 3.11 only reads 3 or 6 fractional
+# digits and no Z suffix, so timestamps are rebuilt in that form first.
+TIMESTAMP_PATTERN = re.compile(r'^(\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2})(?:\.(\d+))?(Z|[+-]\d{2}:?\d{2})?$')
+
+
+def calculate_position_pnl(positions, quotes):
+    """Calculates the profit and loss of every position in a single pass over the data.
+
+    :param positions: The information returned by get_open_stock_positions(). Every item must also have a 'symbol' key.
+    :type positions: list
+    :param quotes: The information returned by get_quotes() for the symbols of the positions.
+    :type quotes: list
+    :returns: [list] Returns a list of dictionaries with float values. Positions without a quote are left out.
+    :Dictionary Keys: * symbol
+                      * quantity
+                      * average_buy_price
+                      * price
+                      * previous_close
+                      * market_value
+                      * cost_basis
+                      * unrealized_pnl
+                      * unrealized_pnl_percent
+                      * daily_pnl
+                      * daily_pnl_percent
+
+    """
+    quotes_by_symbol = {item['symbol']: item for item in quotes if item}
+    pnl = []
+    for item in positions:
+        if not item:
+            continue
+        quote = quotes_by_symbol.get(item['symbol'])
+        if quote is None:
+            continue
+        if quote['last_extended_hours_trade_price'] is not None:
+            price = float(quote['last_extended_hours_trade_price'])
+        else:
+            price = float(quote['last_trade_price'])
+        previous_close = float(quote['adjusted_previous_close'] or quote['previous_close'])
+        quantity = float(item['quantity'])
+        average_buy_price = float(item['average_buy_price'])
+        market_value = quantity * price
+        cost_basis = quantity * average_buy_price
+        daily_pnl = quantity * (price - previous_close)
+        pnl.append({
+            'symbol': item['symbol'],
+            'quantity': quantity,
+            'average_buy_price': average_buy_price,
+            'price': price,
+            'previous_close': previous_close,
+            'market_value': market_value,
+            'cost_basis': cost_basis,
+            'unrealized_pnl': market_value - cost_basis,
+            'unrealized_pnl_percent': (market_value - cost_basis) * 100 / cost_basis if cost_basis else 0.0,
+            'daily_pnl': daily_pnl,
+            'daily_pnl_percent': (price - previous_close) * 100 / previous_close if previous_close else 0.0
+        })
+    return(pnl)
+
+
+def calculate_portfolio_pnl(position_pnl):
+    """Adds up the values returned by calculate_position_pnl() into totals for the whole portfolio.
+
+    :param position_pnl: The information returned by calculate_position_pnl().
+    :type position_pnl: list
+    :returns: [dict] A dictionary of floats with the keys market_value, cost_basis, unrealized_pnl, \
+    unrealized_pnl_percent, daily_pnl, and daily_pnl_percent.
+
+    """
+    market_value = sum(item['market_value'] for item in position_pnl)
+    cost_basis = sum(item['cost_basis'] for item in position_pnl)
+    daily_pnl = sum(item['daily_pnl'] for item in position_pnl)
+    previous_value = market_value - daily_pnl
+    return({
+        'market_value': market_value,
+        'cost_basis': cost_basis,
+        'unrealized_pnl': market_value - cost_basis,
+        'unrealized_pnl_percent': (market_value - cost_basis) * 100 / cost_basis if cost_basis else 0.0,
+        'daily_pnl': daily_pnl,
+        'daily_pnl_percent': daily_pnl * 100 / previous_value if previous_value else 0.0
+    })
+
+
+def calculate_net_deposits(bank_transfers, card_transactions=None):
+    """Calculates how much money has been put into the account, the same way as the get_accurate_gains example.
+
+    :param bank_transfers: The information returned by get_bank_transfers().
+    :type bank_transfers: list
+    :param card_transactions: The information returned by get_card_transactions().
+    :type card_transactions: Optional[list]
+    :returns: [float] Deposits plus reversal fees, minus withdrawals that were not spent with the debit card.
+
+    """
+    deposits = 0.0
+    withdrawals = 0.0
+    reversal_fees = 0.0
+    for item in bank_transfers:
+        if not item:
+            continue
+        if item['direction'] == 'deposit' and item['state'] == 'completed':
+            deposits += float(item['amount'])
+        elif item['direction'] == 'withdraw' and item['state'] == 'completed':
+            withdrawals += float(item['amount'])
+        elif item['direction'] == 'deposit' and item['state'] == 'reversed':
+            reversal_fees += float(item['fees'])
+
+    debits = 0.0
+    for item in card_transactions or []:
+        if item and item['direction'] == 'debit' and item['transaction_type'] == 'settled':
+            debits += float(item['amount']['amount'])
+
+    return(deposits + reversal_fees - (withdrawals - debits))
+
+
+def calculate_sector_exposure(position_pnl, fundamentals):
+    """Calculates the percentage of the portfolio's market value held in each sector.
+
+    :param position_pnl: The information returned by calculate_position_pnl().
+    :type position_pnl: list
+    :param fundamentals: The information returned by get_fundamentals() for the same symbols.
+    :type fundamentals: list
+    :returns: [dict] A dictionary where the keys are sector names and the values are percentages. \
+    Stocks without a sector are grouped under 'Unknown'.
+
+    """
+    sectors = {item['symbol']: item['sector'] for item in fundamentals if item}
+    exposure = {}
+    total = 0.0
+    for item in position_pnl:
+        sector = sectors.get(item['symbol']) or 'Unknown'
+        exposure[sector] = exposure.get(sector, 0.0) + item['market_value']
+        total += item['market_value']
+    if total == 0:
+        return({})
+    return({sector: value * 100 / total for sector, value in exposure.items()})
+
+
+def calculate_time_weighted_return(values, cash_flows):
+    """Calculates the time-weighted return of a series of portfolio values. Cash flows are assumed to happen \
+    at the start of each period, so that period's return is values[i] / (values[i-1] + cash_flows[i]) - 1.
+
+    :param values: The portfolio value at the end of each period. The first value is the starting value.
+    :type values: list
+    :param cash_flows: The net amount deposited during each period. Must be the same length as values, \
+    and the first entry is ignored.
+    :type cash_flows: list
+    :returns: [float] The compounded return as a fraction, so 0.05 means 5%.
+
+    """
+    if len(values) != len(cash_flows):
+        raise ValueError('values and cash_flows must be the same length.')
+    growth = 1.0
+    for i in range(1, len(values)):
+        start = float(values[i-1]) + float(cash_flows[i])
+        if start == 0:
+            continue
+        growth *= float(values[i]) / start
+    return(growth - 1.0)
+
+
+def calculate_money_weighted_return(cash_flows, dates, final_value, final_date=None):
+    """Calculates the annualized money-weighted return, which is the internal rate of return of the deposits \
+    and withdrawals made to the account.
+
+    :param cash_flows: The amount deposited at each date. Withdrawals are negative.
+    :type cash_flows: list
+    :param dates: The date of each cash flow as a datetime or a string starting with YYYY-MM-DD.
+    :type dates: list
+    :param final_value: The value of the portfolio at final_date.
+    :type final_value: float
+    :param final_date: The date of final_value. Default is today.
+    :type final_date: Optional[datetime or str]
+    :returns: [float] The annual rate as a fraction, or None if there is no rate that solves the cash flows.
+
+    """
+    def to_datetime(value):
+        if isinstance(value, str):
+            return datetime.strptime(value[0:10], '%Y-%m-%d')
+        return value
+
+    end = to_datetime(final_date) if final_date else datetime.now()
+    flows = [-float(amount) for amount in cash_flows] + [float(final_value)]
+    years = [(to_datetime(date) - end).days / 365.0 for date in dates] + [0.0]
+
+    def net_value(rate):
+        return sum(flow * (1 + rate) ** -year for flow, year in zip(flows, years))
+
+    low, high = -0.9999, 100.0
+    low_value, high_value = net_value(low), net_value(high)
+    if low_value * high_value > 0:
+        return None
+    for _ in range(200):
+        mid = (low + high) / 2
+        mid_value = net_value(mid)
+        if abs(mid_value) < 1e-9:
+            break
+        if low_value * mid_value < 0:
+            high, high_value = mid, mid_value
+        else:
+            low, low_value = mid, mid_value
+    return(mid)
+
+
+def parse_timestamp(value):
+    """Converts a timestamp string returned by the api, such as 2021-02-05T14:30:00Z, into an aware datetime. \
+    Any number of fractional digits is accepted.
+
+    :param value: The timestamp. Datetime objects are returned with a UTC timezone if they do not have one.
+    :type value: str or datetime
+    :returns: [datetime] The timestamp in UTC.
+
+    """
+    if isinstance(value, str):
+        match = TIMESTAMP_PATTERN.match(value)
+        if match:
+            seconds, fraction, offset = match.groups()
+            if offset is None or offset == 'Z':
+                offset = '+00:00'
+            elif ':' not in offset:
+                offset = offset[:3] + ':' + offset[3:]
+            value = seconds + ('.' + fraction[:6].ljust(6, '0') if fraction else '') + offset
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return(value)
+
+
+def build_equity_curve(orders, historicals, starting_cash=0.0, starting_positions=None, start=None, end=None, interval=None):
+    """Rebuilds the value of an account over time by replaying order executions against price bars. Everything is \
+    computed from the data passed in, so a curve can be built for any range or resolution without calling the api again.
+
+    :param orders: The information returned by get_all_stock_orders(). Every order with executions is replayed. \
+    Orders without a 'symbol' key have their instruments loaded with get_symbols_by_urls(), which sends one request \
+    for every 50 instruments. Add the symbols first to build the curve without calling the api. Orders whose symbol \
+    cannot be found are left out, with a warning, since they could not be valued.
+    :type orders: list
+    :param historicals: The information returned by get_stock_historicals() for every symbol that was traded.
+    :type historicals: list
+    :param starting_cash: The cash in the account before the first order.
+    :type starting_cash: Optional[float]
+    :param starting_positions: A dictionary of symbol to quantity held before the first order.
+    :type starting_positions: Optional[dict]
+    :param start: Only return points at or after this time.
+    :type start: Optional[str or datetime]
+    :param end: Only return points at or before this time.
+    :type end: Optional[str or datetime]
+    :param interval: The time between points, either as a timedelta or in seconds. If left as None, there is one point \
+    for every bar time in historicals. Prices are carried forward from the most recent bar.
+    :type interval: Optional[timedelta or int]
+    :returns: [list] Returns a list of dictionaries, one for each point in time.
+    :Dictionary Keys: * begins_at - the time of the point as a datetime
+                      * cash
+                      * market_value
+                      * equity
+
+    """
+    prices = {}
+    for bar in historicals:
+        if bar:
+            prices.setdefault(bar['symbol'], []).append((parse_timestamp(bar['begins_at']), float(bar['close_price'])))
+    for bars in prices.values():
+        bars.sort(key=lambda x: x[0])
+
+    orders = [order for order in orders if order and order.get('executions')]
+    symbols = get_symbols_by_urls([order['instrument'] for order in orders if not order.get('symbol')])
+    fills = []
+    for order in orders:
+        symbol = order.get('symbol') or symbols.get(order['instrument'])
+        if not symbol:
+            print('Warning: the symbol of instrument {0} could not be found. Its orders are left out of the equity '
+                  'curve.'.format(order.get('instrument')), file=get_output())
+            continue
+        sign = 1.0 if order['side'] == 'buy' else -1.0
+        fees = float(order.get('fees') or 0.0)
+        for execution in order['executions']:
+            fills.append((parse_timestamp(execution['timestamp']), symbol,
+                          sign * float(execution['quantity']), float(execution['price']), fees))
+            fees = 0.0
+    fills.sort(key=lambda x: x[0])
+
+    if interval is None:
+        times = sorted(set(time for bars in prices.values() for time, _ in bars))
+        if start is not None:
+            times = [time for time in times if time >= parse_timestamp(start)]
+        if end is not None:
+            times = [time for time in times if time <= parse_timestamp(end)]
+    else:
+        if not isinstance(interval, timedelta):
+            interval = timedelta(seconds=interval)
+        all_times = [bars[0][0] for bars in prices.values() if bars] + [fill[0] for fill in fills]
+        if not all_times and (start is None or end is None):
+            return([])
+        first = parse_timestamp(start) if start is not None else min(all_times)
+        last = parse_timestamp(end) if end is not None else max(
+            [bars[-1][0] for bars in prices.values() if bars] + [fill[0] for fill in fills])
+        times = []
+        while first <= last:
+            times.append(first)
+            first += interval
+
+    cash = float(starting_cash)
+    quantities = dict(starting_positions or {})
+    last_price = {}
+    price_index = {symbol: 0 for symbol in prices}
+    fill_index = 0
+    curve = []
+    for time in times:
+        while fill_index < len(fills) and fills[fill_index][0] <= time:
+            _, symbol, quantity, price, fees = fills[fill_index]
+            quantities[symbol] = quantities.get(symbol, 0.0) + quantity
+            cash -= quantity * price + fees
+            last_price.setdefault(symbol, price)
+            fill_index += 1
+        market_value = 0.0
+        for symbol, quantity in quantities.items():
+            if quantity == 0:
+                continue
+            bars = prices.get(symbol, [])
+            i = price_index.get(symbol, 0)
+            while i < len(bars) and bars[i][0] <= time:
+                last_price[symbol] = bars[i][1]
+                i += 1
+            price_index[symbol] = i
+            market_value += quantity * last_price.get(symbol, 0.0)
+        curve.append({
+            'begins_at': time,
+            'cash': cash,
+            'market_value': market_value,
+            'equity': cash + market_value
+        })
+    return(curve)
+
+
+@login_required
+def get_portfolio_analytics(account_number=None):
+    """Downloads positions, instruments, quotes, fundamentals, transfers, and dividends with batched requests, \
+    and returns profit and loss, exposure, and returns for the portfolio.
+
+    :param account_number: the robinhood account number.
+    :type account_number: Optional[str]
+    :returns: [dict] A dictionary with the keys listed below.
+    :Dictionary Keys: * positions - the list returned by calculate_position_pnl()
+                      * portfolio - the dictionary returned by calculate_portfolio_pnl()
+                      * sector_exposure - the dictionary returned by calculate_sector_exposure()
+                      * net_deposits - the amount returned by calculate_net_deposits()
+                      * dividends - the total amount of dividends paid
+                      * equity - the total equity of the account
+                      * total_gain - equity minus net deposits
+                      * total_gain_minus_dividends - total gain that did not come from dividends
+
+    """
+    positions = get_open_stock_positions(account_number=account_number)
+    positions = [item for item in positions if item]
+    symbols = get_symbols_by_urls([item['instrument'] for item in positions if 'symbol' not in item])
+    for item in positions:
+        if 'symbol' not in item:
+            item['symbol'] = symbols.get(item['instrument'])
+    positions = [item for item in positions if item['symbol']]
+    symbols = [item['symbol'] for item in positions]
+
+    quotes = get_quotes(symbols) if symbols else []
+    fundamentals = get_fundamentals(symbols) if symbols else []
+    position_pnl = calculate_position_pnl(positions, quotes or [])
+
+    net_deposits = calculate_net_deposits(get_bank_transfers(), get_card_transactions())
+    dividends = get_total_dividends(dividend_index=get_dividend_index(refresh=True))
+
+    portfolios_data = load_portfolio_profile(account_number=account_number)
+    if portfolios_data['extended_hours_equity'] is not None:
+        equity = float(portfolios_data['extended_hours_equity'])
+    else:
+        equity = float(portfolios_data['equity'])
+
+    return({
+        'positions': position_pnl,
+        'portfolio': calculate_portfolio_pnl(position_pnl),
+        'sector_exposure': calculate_sector_exposure(position_pnl, fundamentals or []),
+        'net_deposits': net_deposits,
+        'dividends': dividends,
+        'equity': equity,
+        'total_gain': equity - net_deposits,
+        'total_gain_minus_dividends': equity - net_deposits - dividends
+    })
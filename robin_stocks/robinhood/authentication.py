@@ -3,6 +3,7 @@ import os
 import pickle
 import secrets
 import time
+from robin_stocks.robinhood import account
 from robin_stocks.robinhood.helper import *
 from robin_stocks.robinhood.urls import *
 
@@ -28,12 +29,12 @@ def _get_sherrif_id(data):
 def _validate_sherrif_id(device_token: str, workflow_id: str):
     """Handles Robinhood's verification workflow, including email, SMS, and app-based approvals."""
     print("Starting verification process...")
-    pathfinder_url = "https://api.robinhood.com/pathfinder/user_machine/"
+    pathfinder_url = pathfinder_user_machine_url()
     machine_payload = {'device_id': device_token, 'flow': 'suv', 'input': {'workflow_id': workflow_id}}
     machine_data = request_post(url=pathfinder_url, payload=machine_payload, json=True)
 
     machine_id = _get_sherrif_id(machine_data)
-    inquiries_url = f"https://api.robinhood.com/pathfinder/inquiries/{machine_id}/user_view/"
+    inquiries_url = pathfinder_inquiries_url(machine_id)
 
     start_time = time.time()
     
@@ -52,7 +53,7 @@ def _validate_sherrif_id(device_token: str, workflow_id: str):
             challenge_id = challenge["id"]
             if challenge_type == "prompt":
                 print("Check robinhood app for device approvals method...")
-                prompt_url = f"https://api.robinhood.com/push/{challenge_id}/get_prompts_status/"
+                prompt_url = prompt_status_url(challenge_id)
                 while True:
                     time.sleep(5)
                     prompt_challenge_status = request_get(url=prompt_url)
@@ -66,15 +67,15 @@ def _validate_sherrif_id(device_token: str, workflow_id: str):
 
             if challenge_type in ["sms", "email"] and challenge_status == "issued":
                 user_code = input(f"Enter the {challenge_type} verification code sent to your device: ")
-                challenge_url = f"https://api.robinhood.com/challenge/{challenge_id}/respond/"
+                respond_url = challenge_url(challenge_id)
                 challenge_payload = {"response": user_code}
-                challenge_response = request_post(url=challenge_url, payload=challenge_payload)
+                challenge_response = request_post(url=respond_url, payload=challenge_payload)
 
                 if challenge_response.get("status") == "validated":
                     break
 
     # **Now poll the workflow status to confirm final approval**
-    inquiries_url = f"https://api.robinhood.com/pathfinder/inquiries/{machine_id}/user_view/"
+    inquiries_url = pathfinder_inquiries_url(machine_id)
     
     retry_attempts = 5  # Allow up to 5 retries in case of 500 errors
     while time.time() - start_time < 120:  # 2-minute timeout 
@@ -229,4 +230,8 @@ def logout():
     """Logs out from Robinhood by clearing session data."""
     set_login_state(False)
     update_session('Authorization', None)
+    # The dividend index belongs to the account that was logged in.
+    account.DIVIDEND_INDEX = None
+    # So are the instruments looked up through it.
+    clear_instrument_cache()
     print("Logged out successfully.")
@@ -1,4 +1,7 @@
 """Contains functions to get information about crypto-currencies."""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from robin_stocks.robinhood.helper import *
 from robin_stocks.robinhood.urls import *
 
@@ -98,17 +101,45 @@ def get_crypto_info(symbol, info=None):
                       * tradability
 
     """
-    url = crypto_currency_pairs_url()
-    data = request_get(url, 'results')
-    data = [x for x in data if x['asset_currency']['code'] == symbol]
-    if len(data) > 0:
-        data = data[0]
-    else:
-        data = None
+    data = load_currency_pair_index().get(symbol)
     return(filter_data(data, info))
 
 
+CURRENCY_PAIR_INDEX = {}
 SYMBOL_TO_ID_CACHE = {}
+# The number of seconds the currency pair index is used before it is requested again, so that changes
+# such as a pair becoming untradable are picked up by long running programs.
+CURRENCY_PAIR_INDEX_MAX_AGE = 3600
+CURRENCY_PAIR_INDEX_LOADED_AT = None
+def load_currency_pair_index(refresh=False, max_age=None):
+    """Loads the list of currency pairs and indexes it by the code of the asset currency, such as BTC.
+    Later calls return the same index without a network request until it is older than max_age.
+
+    :param refresh: If true, the currency pairs are requested again.
+    :type refresh: Optional[bool]
+    :param max_age: The number of seconds an index is kept. Default is CURRENCY_PAIR_INDEX_MAX_AGE.
+    :type max_age: Optional[float]
+    :returns: [dict] A dictionary of the currency pair for each crypto ticker.
+
+    """
+    global CURRENCY_PAIR_INDEX, CURRENCY_PAIR_INDEX_LOADED_AT, SYMBOL_TO_ID_CACHE
+    if max_age is None:
+        max_age = CURRENCY_PAIR_INDEX_MAX_AGE
+    if CURRENCY_PAIR_INDEX and not refresh and time.monotonic() - CURRENCY_PAIR_INDEX_LOADED_AT < max_age:
+        return CURRENCY_PAIR_INDEX
+    url = crypto_currency_pairs_url()
+    data = request_get(url, 'results')
+    if not data or data == [None]:
+        return CURRENCY_PAIR_INDEX
+    index = {}
+    for pair in data:
+        index.setdefault(pair['asset_currency']['code'], pair)
+    ids = {symbol: pair['id'] for symbol, pair in index.items()}
+    # Replace the dictionaries instead of changing them, so that other threads reading them never see them half filled.
+    CURRENCY_PAIR_INDEX_LOADED_AT, SYMBOL_TO_ID_CACHE, CURRENCY_PAIR_INDEX = time.monotonic(), ids, index
+    return index
+
+
 def get_crypto_id(symbol):
     """Gets the Robinhood ID of the given cryptocurrency used to make trades.
     This function uses an in-memory cache of the IDs to save a network round-trip when possible.
@@ -126,6 +157,20 @@ def get_crypto_id(symbol):
     return id
 
 
+def get_crypto_ids(symbols):
+    """Gets the Robinhood IDs of many cryptocurrencies from the cached currency pair index.
+
+    :param symbols: The crypto tickers.
+    :type symbols: str or list
+    :returns: [list] The ID of each ticker, or None for tickers that are not crypto currencies.
+
+    """
+    symbols = inputs_to_set(symbols)
+    if any(symbol not in SYMBOL_TO_ID_CACHE for symbol in symbols):
+        load_currency_pair_index()
+    return [SYMBOL_TO_ID_CACHE.get(symbol) for symbol in symbols]
+
+
 @login_required
 def get_crypto_quote(symbol, info=None):
     """Gets information about a crypto including low price, high price, and open price
@@ -147,12 +192,55 @@ def get_crypto_quote(symbol, info=None):
                       * volume
  
     """
-    id = get_crypto_info(symbol, info='id')
+    id = get_crypto_id(symbol)
+    if id is None:
+        return(None)
     url = crypto_quote_url(id)
     data = request_get(url)
     return(filter_data(data, info))
 
 
+@login_required
+def get_crypto_quotes(symbols, info=None, max_workers=16):
+    """Gets the quotes of many cryptos at the same time. The IDs come from the cached currency pair index,
+    so each call costs one request per crypto and the requests are sent concurrently.
+
+    :param symbols: The crypto tickers.
+    :type symbols: str or list
+    :param info: Will filter the results to have a list of the values that correspond to key that matches info.
+    :type info: Optional[str]
+    :param max_workers: The number of quotes to request at the same time.
+    :type max_workers: Optional[int]
+    :returns: [list] If info parameter is left as None then the list will contain a dictionary of key/value pairs for each ticker. \
+    Otherwise, it will be a list of strings where the strings are the values of the key that corresponds to info. \
+    Tickers that are not crypto currencies are left out.
+    :Dictionary Keys: * ask_price
+                      * bid_price
+                      * high_price
+                      * id
+                      * low_price
+                      * mark_price
+                      * open_price
+                      * symbol
+                      * volume
+
+    """
+    symbols = inputs_to_set(symbols)
+    ids = []
+    for symbol, id in zip(symbols, get_crypto_ids(symbols)):
+        if id is None:
+            print(error_ticker_does_not_exist(symbol), file=get_output())
+        else:
+            ids.append(id)
+    if not ids:
+        return([])
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(ids))) as executor:
+        data = list(executor.map(lambda id: request_get(crypto_quote_url(id)), ids))
+    data = [item for item in data if item is not None]
+    return(filter_data(data, info))
+
+
 @login_required
 def get_crypto_quote_from_id(id, info=None):
     """Gets information about a crypto including low price, high price, and open price. Uses the id instead of crypto ticker.
@@ -180,11 +268,12 @@ def get_crypto_quote_from_id(id, info=None):
 
 
 @login_required
-def get_crypto_historicals(symbol, interval='hour', span='week', bounds='24_7', info=None):
+def get_crypto_historicals(symbol, interval='hour', span='week', bounds='24_7', info=None, max_workers=16):
     """Gets historical information about a crypto including open price, close price, high price, and low price.
+    When several tickers are given, the historicals of each are requested at the same time and returned in one list.
 
-    :param symbol: The crypto ticker.
-    :type symbol: str
+    :param symbol: The crypto ticker or a list of crypto tickers.
+    :type symbol: str or list
     :param interval: The time between data points. Can be '15second', '5minute', '10minute', 'hour', 'day', or 'week'. Default is 'hour'.
     :type interval: str
     :param span: The entire time frame to collect data points. Can be 'hour', 'day', 'week', 'month', '3month', 'year', or '5year'. Default is 'week'
@@ -194,6 +283,8 @@ def get_crypto_historicals(symbol, interval='hour', span='week', bounds='24_7',
     :type bound: str
     :param info: Will filter the results to have a list of the values that correspond to key that matches info.
     :type info: Optional[str]
+    :param max_workers: The number of tickers to request at the same time.
+    :type max_workers: Optional[int]
     :returns: [list] If info parameter is left as None then the list will contain a dictionary of key/value pairs for each ticker. \
     Otherwise, it will be a list of strings where the strings are the values of the key that corresponds to info.
     :Dictionary Keys: * begins_at
@@ -226,18 +317,33 @@ def get_crypto_historicals(symbol, interval='hour', span='week', bounds='24_7',
         return([None])
 
 
-    symbol = inputs_to_set(symbol)
-    id = get_crypto_info(symbol[0], info='id')
-    url = crypto_historical_url(id)
+    symbols = inputs_to_set(symbol)
+    ids = []
+    for symbol, id in zip(symbols, get_crypto_ids(symbols)):
+        if id is None:
+            print(error_ticker_does_not_exist(symbol), file=get_output())
+        else:
+            ids.append(id)
+    if not ids:
+        return([None])
+
     payload = {'interval': interval,
                'span': span,
                'bounds': bounds}
-    data = request_get(url, 'regular', payload)
+    if len(ids) == 1:
+        results = [request_get(crypto_historical_url(ids[0]), 'regular', payload)]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(ids))) as executor:
+            results = list(executor.map(
+                lambda id: request_get(crypto_historical_url(id), 'regular', payload), ids))
 
     histData = []
-    cryptoSymbol = data['symbol']
-    for subitem in data['data_points']:
-        subitem['symbol'] = cryptoSymbol
-        histData.append(subitem)
+    for data in results:
+        if not data:
+            continue
+        cryptoSymbol = data['symbol']
+        for subitem in data['data_points']:
+            subitem['symbol'] = cryptoSymbol
+            histData.append(subitem)
 
     return(filter_data(histData, info))
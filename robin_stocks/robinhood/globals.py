@@ -6,6 +6,8 @@ from requests import Session
 
 # Keeps track on if the user is logged in or not.
 LOGGED_IN = False
+# Identical get requests made at the same time share one http request when this is True.
+COALESCE_REQUESTS = True
 # The session object for making get and post requests.
 SESSION = Session()
 SESSION.headers = {
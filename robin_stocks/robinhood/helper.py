@@ -1,9 +1,28 @@
 """Contains decorator functions and functions for interacting with global data.
 """
+from copy import deepcopy
 from functools import wraps
+from threading import Event, Lock
 
 import requests
-from robin_stocks.robinhood.globals import LOGGED_IN, OUTPUT, SESSION
+from requests.adapters import HTTPAdapter
+from robin_stocks.cache import get_response_cache, set_url_aliases
+from robin_stocks.decoding import decode_response
+from robin_stocks.robinhood.globals import (COALESCE_REQUESTS, LOGGED_IN,
+                                            OUTPUT, SESSION)
+from robin_stocks.robinhood.records import Record
+from robin_stocks.robinhood.urls import (DEFAULT_BASE_URLS, ROUTER,
+                                         chains_url, instruments_url,
+                                         option_instruments_url)
+
+# Requests that are currently being sent, keyed by request_key(). Used by request_get to share one
+# response between identical concurrent calls.
+INFLIGHT_REQUESTS = {}
+INFLIGHT_LOCK = Lock()
+COALESCING_STATS = {'requests': 0, 'coalesced': 0}
+# The instrument of each symbol that id_for_stock or id_for_chain looked up. Instrument and chain ids do not
+# change, so each symbol is only requested once.
+INSTRUMENT_CACHE = {}
 
 
 def set_login_state(logged_in):
@@ -21,6 +40,36 @@ def get_output():
     global OUTPUT
     return OUTPUT
 
+def set_request_coalescing(coalesce):
+    """Sets whether identical concurrent get requests should share a single http request.
+
+    :param coalesce: Set to change value of global variable.
+    :type coalesce: bool
+    """
+    global COALESCE_REQUESTS
+    COALESCE_REQUESTS = coalesce
+
+
+def get_coalescing_stats():
+    """Returns how many get requests were made and how many of them were served by a request that was already in flight.
+
+    :returns: A dictionary with the keys requests, coalesced, and dedup_ratio.
+    """
+    with INFLIGHT_LOCK:
+        stats = dict(COALESCING_STATS)
+    stats['dedup_ratio'] = stats['coalesced'] / stats['requests'] if stats['requests'] else 0.0
+    return(stats)
+
+
+def request_key(url, dataType, payload):
+    """Builds a hashable key for a get request from the url, data type, and sorted payload."""
+    if payload:
+        items = tuple(sorted((str(key), str(value)) for key, value in payload.items()))
+    else:
+        items = ()
+    return((url, dataType, items))
+
+
 def login_required(func):
     """A decorator for indicating which methods require the user to be logged
        in."""
@@ -46,6 +95,29 @@ def convert_none_to_string(func):
     return(string_wrapper)
 
 
+def instrument_for_symbol(symbol):
+    """Returns the instrument of a stock ticker. The instrument is requested the first time a ticker is used \
+    and read from INSTRUMENT_CACHE after that.
+
+    :param symbol: The stock ticker.
+    :type symbol: str
+    :returns: A dictionary of the instrument data, or None if the ticker was not found.
+
+    """
+    symbol = symbol.upper().strip()
+    if symbol in INSTRUMENT_CACHE:
+        return(INSTRUMENT_CACHE[symbol])
+    data = request_get(instruments_url(), 'indexzero', {'symbol': symbol})
+    if data:
+        INSTRUMENT_CACHE[symbol] = data
+    return(data)
+
+
+def clear_instrument_cache():
+    """Removes every instrument that instrument_for_symbol has stored."""
+    INSTRUMENT_CACHE.clear()
+
+
 def id_for_stock(symbol):
     """Takes a stock ticker and returns the instrument id associated with the stock.
 
@@ -55,15 +127,11 @@ def id_for_stock(symbol):
 
     """
     try:
-        symbol = symbol.upper().strip()
+        data = instrument_for_symbol(symbol)
     except AttributeError as message:
         print(message, file=get_output())
         return(None)
 
-    url = 'https://api.robinhood.com/instruments/'
-    payload = {'symbol': symbol}
-    data = request_get(url, 'indexzero', payload)
-
     return(filter_data(data, 'id'))
 
 
@@ -76,16 +144,11 @@ def id_for_chain(symbol):
 
     """
     try:
-        symbol = symbol.upper().strip()
+        data = instrument_for_symbol(symbol)
     except AttributeError as message:
         print(message, file=get_output())
         return(None)
 
-    url = 'https://api.robinhood.com/instruments/'
-
-    payload = {'symbol': symbol}
-    data = request_get(url, 'indexzero', payload)
-
     if data:
         return(data['tradable_chain_id'])
     else:
@@ -106,8 +169,7 @@ def id_for_group(symbol):
         print(message, file=get_output())
         return(None)
 
-    url = 'https://api.robinhood.com/options/chains/{0}/'.format(
-        id_for_chain(symbol))
+    url = chains_url(chain_id=id_for_chain(symbol))
     data = request_get(url)
     return(data['underlying_instruments'][0]['id'])
 
@@ -135,7 +197,7 @@ def id_for_option(symbol, expirationDate, strike, optionType):
         'type': optionType,
         'state': 'active'
     }
-    url = 'https://api.robinhood.com/options/instruments/'
+    url = option_instruments_url()
     data = request_get(url, 'pagination', payload)
 
     listOfOptions = [item for item in data if item["expiration_date"] == expirationDate]
@@ -168,8 +230,8 @@ def round_price(price):
 def filter_data(data, info):
     """Takes the data and extracts the value for the keyword that matches info.
 
-    :param data: The data returned by request_get.
-    :type data: dict or list
+    :param data: The data returned by request_get, or records created by to_records.
+    :type data: dict or list or Record
     :param info: The keyword to filter from the data.
     :type info: str
     :returns:  A list or string with the values that correspond to the info keyword.
@@ -184,14 +246,14 @@ def filter_data(data, info):
             return([])
         compareDict = data[0]
         noneType = []
-    elif (type(data) == dict):
+    elif (type(data) == dict or isinstance(data, Record)):
         compareDict = data
         noneType = None
 
     if info is not None:
         if info in compareDict and type(data) == list:
             return([x[info] for x in data])
-        elif info in compareDict and type(data) == dict:
+        elif info in compareDict:
             return(data[info])
         else:
             print(error_argument_not_key_in_dictionary(info), file=get_output())
@@ -230,16 +292,22 @@ def inputs_to_set(inputSymbols):
     return(symbols_list)
 
 
-def request_document(url, payload=None):
+def request_document(url, payload=None, stream=False, headers=None):
     """Using a document url, makes a get request and returnes the session data.
 
     :param url: The url to send a get request to.
     :type url: str
+    :param payload: Dictionary of parameters to pass to the url.
+    :type payload: Optional[dict]
+    :param stream: If true, only the response headers are downloaded and the body is read lazily with iter_content().
+    :type stream: Optional[bool]
+    :param headers: Extra headers to send with this request only, such as a Range header.
+    :type headers: Optional[dict]
     :returns: Returns the session.get() data as opppose to session.get().json() data.
 
-    """ 
+    """
     try:
-        res = SESSION.get(url, params=payload)
+        res = SESSION.get(url, params=payload, stream=stream, headers=headers)
         res.raise_for_status()
     except requests.exceptions.HTTPError as message:
         print(message, file=get_output())
@@ -262,9 +330,55 @@ def request_get(url, dataType='regular', payload=None, jsonify_data=True):
     :param jsonify_data: If this is true, will return requests.post().json(), otherwise will return response from requests.post().
     :type jsonify_data: bool
     :returns: Returns the data from the get request. If jsonify_data=True and requests returns an http code other than <200> \
-    then either '[None]' or 'None' will be returned based on what the dataType parameter was set as.
+    then either '[None]' or 'None' will be returned based on what the dataType parameter was set as. \
+    When jsonify_data=True, identical requests made at the same time from different threads share one http request \
+    and each caller gets its own copy of the data, or the exception raised while sending it. This also applies to coroutines that call request_get through \
+    asyncio.to_thread(). See set_request_coalescing() and get_coalescing_stats().
 
     """
+    if not jsonify_data or not COALESCE_REQUESTS:
+        return(send_request_get(url, dataType, payload, jsonify_data))
+
+    key = request_key(url, dataType, payload)
+    with INFLIGHT_LOCK:
+        COALESCING_STATS['requests'] += 1
+        inflight = INFLIGHT_REQUESTS.get(key)
+        if inflight is None:
+            inflight = {'event': Event(), 'data': None, 'error': None, 'waiters': 0}
+            INFLIGHT_REQUESTS[key] = inflight
+            leader = True
+        else:
+            COALESCING_STATS['coalesced'] += 1
+            inflight['waiters'] += 1
+            leader = False
+
+    if not leader:
+        inflight['event'].wait()
+        # The callers that shared the request see the same exception as the one that sent it.
+        if inflight['error'] is not None:
+            raise inflight['error']
+        return(deepcopy(inflight['data']))
+
+    data = None
+    try:
+        data = send_request_get(url, dataType, payload, jsonify_data)
+    except Exception as e:
+        inflight['error'] = e
+        raise
+    finally:
+        with INFLIGHT_LOCK:
+            del INFLIGHT_REQUESTS[key]
+            waiters = inflight['waiters']
+        inflight['data'] = data
+        inflight['event'].set()
+    # Other callers copy the shared data, so only copy it here if one of them might still be reading it.
+    if waiters:
+        return(deepcopy(data))
+    return(data)
+
+
+def send_request_get(url, dataType='regular', payload=None, jsonify_data=True):
+    """Sends the get request for request_get() without sharing it with other callers. Takes the same parameters."""
     if (dataType == 'results' or dataType == 'pagination'):
         data = [None]
     else:
@@ -272,9 +386,13 @@ def request_get(url, dataType='regular', payload=None, jsonify_data=True):
     res = None
     if jsonify_data:
         try:
-            res = SESSION.get(url, params=payload)
-            res.raise_for_status()
-            data = res.json()
+            cache = get_response_cache()
+            if cache is not None:
+                data = cache.get_json(SESSION, url, payload)
+            else:
+                res = SESSION.get(url, params=payload)
+                res.raise_for_status()
+                data = decode_response(res)
         except (requests.exceptions.HTTPError, AttributeError) as message:
             print(message, file=get_output())
             return(data)
@@ -303,7 +421,7 @@ def request_get(url, dataType='regular', payload=None, jsonify_data=True):
             try:
                 res = SESSION.get(nextData['next'])
                 res.raise_for_status()
-                nextData = res.json()
+                nextData = decode_response(res)
             except:
                 print('Additional pages exist but could not be loaded.', file=get_output())
                 return(data)
@@ -351,7 +469,7 @@ def request_post(url, payload=None, timeout=16, json=False, jsonify_data=True):
             res = SESSION.post(url, data=payload, timeout=timeout)
         if res.status_code not in [200, 201, 202, 204, 301, 302, 303, 304, 307, 400, 401, 402, 403]:
             raise Exception("Received "+ str(res.status_code))
-        data = res.json()
+        data = decode_response(res)
     except Exception as message:
         print("Error in request_post: {0}".format(message), file=get_output())
     if jsonify_data:
@@ -392,6 +510,45 @@ def update_session(key, value):
     SESSION.headers[key] = value
 
 
+class BaseUrlAdapter(HTTPAdapter):
+    """A transport adapter that moves requests for absolute Robinhood urls, such as the next page or instrument \
+    links inside responses, onto the base urls in ROUTER. The moved request is sent with the adapter that SESSION \
+    has mounted for the new url, so adapters mounted on http:// or https://, such as robin_stocks.replay, still apply."""
+    forwards_to_session = True
+
+    def send(self, request, **kwargs):
+        request.url = ROUTER.rewrite(request.url)
+        adapter = SESSION.get_adapter(request.url)
+        if isinstance(adapter, BaseUrlAdapter):
+            return(super().send(request, **kwargs))
+        return(adapter.send(request, **kwargs))
+
+
+def set_base_url(base_url=None, hosts=None):
+    """Sends requests for the Robinhood hosts to another server instead, such as a proxy or \
+    robin_stocks.robinhood.mockserver. Every url in robin_stocks.robinhood.urls is built from the new base url, \
+    and absolute urls returned by the server are moved onto it as well. The path and query of each request are kept.
+
+    :param base_url: The url to send requests to, such as http://127.0.0.1:8000. Set to None to send requests to Robinhood.
+    :type base_url: Optional[str]
+    :param hosts: The hosts to send to base_url, such as ['api', 'nummus']. Default is every host.
+    :type hosts: Optional[list]
+
+    """
+    ROUTER.set_base_url(base_url, hosts)
+    # Instruments from one server are not valid on another.
+    clear_instrument_cache()
+    aliases = {}
+    for host, default in DEFAULT_BASE_URLS.items():
+        if ROUTER.base_urls[host] != default:
+            SESSION.mount(default, BaseUrlAdapter())
+            aliases.setdefault(ROUTER.base_urls[host], []).append(default)
+        elif default in SESSION.adapters:
+            del SESSION.adapters[default]
+    # Keep the response cache policies, which are written for the Robinhood hosts, working on the new base url.
+    set_url_aliases(aliases)
+
+
 def error_argument_not_key_in_dictionary(keyword):
     return('Error: The keyword "{0}" is not a key in the dictionary.'.format(keyword))
 
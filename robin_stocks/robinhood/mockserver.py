@@ -0,0 +1,589 @@
+"""Contains a local server that imitates the main Robinhood api endpoints for load testing.
+
+The server generates instruments, quotes, fundamentals, historicals, positions, option chains, and orders for a
+list of symbols, and answers with the same keys and pagination cursors as Robinhood. Latency and errors can be added
+to each response, and a seed makes the injected errors repeat from one run to the next. Point the library at it
+with set_base_url(), or run it on its own with ``python -m robin_stocks.robinhood.mockserver --port 8000``.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+DEFAULT_SYMBOLS = ['AAPL', 'AMZN', 'GOOG', 'META', 'MSFT', 'NFLX', 'NVDA', 'SPY', 'QQQ', 'TSLA']
+INTERVAL_SECONDS = {'5minute': 300, '10minute': 600, 'hour': 3600, 'day': 86400, 'week': 604800}
+SPAN_SECONDS = {'day': 86400, 'week': 604800, 'month': 2592000, '3month': 7776000, 'year': 31536000,
+                '5year': 157680000}
+MAX_HISTORICALS = 5000
+ACCOUNT_NUMBER = '5RY00000'
+NAMESPACE = uuid.UUID('6ba7b811-9dad-11d1-80b4-00c04fd430c8')
+
+
+def mock_id(*parts):
+    """Returns the same uuid for the same parts every time the server starts."""
+    return(str(uuid.uuid5(NAMESPACE, '/'.join(str(part) for part in parts))))
+
+
+def timestamp(value=None):
+    value = value or datetime.now(timezone.utc)
+    return(value.strftime('%Y-%m-%dT%H:%M:%S.%fZ'))
+
+
+class MockData:
+    """The generated data that the server answers with. Orders placed through the server are kept in memory.
+
+    :param symbols: The stock tickers to generate data for.
+    :type symbols: Optional[list]
+    :param orders: The number of orders to generate.
+    :type orders: Optional[int]
+    :param expirations: The number of weekly option expirations in each chain.
+    :type expirations: Optional[int]
+    :param strikes: The number of strikes above and below the price for each expiration.
+    :type strikes: Optional[int]
+    :param seed: The seed used to generate prices.
+    :type seed: Optional[int]
+
+    """
+
+    def __init__(self, symbols=None, orders=500, expirations=8, strikes=20, seed=0):
+        generator = random.Random(seed)
+        self.symbols = [symbol.upper() for symbol in (symbols or DEFAULT_SYMBOLS)]
+        self.prices = {symbol: round(generator.uniform(20, 500), 2) for symbol in self.symbols}
+        self.instruments = {}
+        self.chains = {}
+        self.options = {}
+        for symbol in self.symbols:
+            chain_id = mock_id('chain', symbol)
+            self.instruments[symbol] = {
+                'id': mock_id('instrument', symbol), 'symbol': symbol, 'simple_name': symbol,
+                'name': '{0} Common Stock'.format(symbol), 'type': 'stock', 'tradeable': True,
+                'tradability': 'tradable', 'state': 'active', 'country': 'US', 'tradable_chain_id': chain_id,
+                'market': '/markets/XNAS/', 'list_date': '2000-01-03', 'min_tick_size': None
+            }
+            self.chains[chain_id] = self.build_chain(symbol, chain_id, expirations, strikes)
+        self.instruments_by_id = {item['id']: item for item in self.instruments.values()}
+        self.orders = []
+        self.orders_by_id = {}
+        self.lock = threading.Lock()
+        start = datetime(2021, 1, 4, 14, 30, tzinfo=timezone.utc)
+        for i in range(orders):
+            symbol = self.symbols[i % len(self.symbols)]
+            created = start + timedelta(hours=i)
+            self.add_order(symbol, 'buy' if i % 3 else 'sell', '1.00000000', 'market', None,
+                           'filled' if i % 10 else 'cancelled', created)
+
+    def build_chain(self, symbol, chain_id, expirations, strikes):
+        price = self.prices[symbol]
+        step = 1.0 if price < 100 else 5.0
+        center = round(price / step) * step
+        strike_prices = [center + step * i for i in range(-strikes, strikes + 1) if center + step * i > 0]
+        today = date.today()
+        friday = today + timedelta(days=(4 - today.weekday()) % 7)
+        dates = [(friday + timedelta(weeks=week)).isoformat() for week in range(expirations)]
+        for expiration in dates:
+            for strike in strike_prices:
+                for option_type in ('call', 'put'):
+                    id = mock_id('option', symbol, expiration, strike, option_type)
+                    self.options[id] = {
+                        'id': id, 'chain_id': chain_id, 'chain_symbol': symbol, 'expiration_date': expiration,
+                        'strike_price': '{0:.4f}'.format(strike), 'type': option_type, 'state': 'active',
+                        'tradability': 'tradable', 'url': None
+                    }
+        return({
+            'id': chain_id, 'symbol': symbol, 'can_open_position': True, 'cash_component': None,
+            'expiration_dates': dates, 'trade_value_multiplier': '100.0000',
+            'underlying_instruments': [{'id': mock_id('underlying', symbol), 'instrument': None, 'quantity': 100}],
+            'min_ticks': {'above_tick': '0.05', 'below_tick': '0.01', 'cutoff_price': '3.00'}
+        })
+
+    def add_order(self, symbol, side, quantity, order_type, price, state, created=None):
+        created = timestamp(created)
+        id = mock_id('order', len(self.orders), symbol, created)
+        fill_price = '{0:.8f}'.format(self.prices[symbol])
+        executions = []
+        if state == 'filled':
+            executions.append({'id': mock_id('execution', id), 'price': fill_price, 'quantity': quantity,
+                               'settlement_date': created[:10], 'timestamp': created})
+        order = {
+            'id': id, 'ref_id': mock_id('ref', id), 'instrument_id': self.instruments[symbol]['id'],
+            'symbol': symbol, 'cumulative_quantity': quantity if state == 'filled' else '0.00000000',
+            'average_price': fill_price if state == 'filled' else None, 'fees': '0.00', 'state': state,
+            'type': order_type, 'side': side, 'time_in_force': 'gfd', 'trigger': 'immediate', 'price': price,
+            'stop_price': None, 'quantity': quantity, 'reject_reason': None, 'created_at': created,
+            'updated_at': created, 'last_transaction_at': created, 'executions': executions,
+            'extended_hours': False, 'cancel': None
+        }
+        with self.lock:
+            self.orders.insert(0, order)
+            self.orders_by_id[id] = order
+        return(order)
+
+
+def paginate(items, query, page_size, next_url):
+    """Returns one page of items and the url of the next page, using the cursor query parameter."""
+    start = int(query.get('cursor', 0) or 0)
+    page = items[start:start + page_size]
+    following = None
+    if start + page_size < len(items):
+        following = next_url(dict(query, cursor=start + page_size))
+    previous = next_url(dict(query, cursor=max(start - page_size, 0))) if start else None
+    return({'previous': previous, 'results': page, 'next': following})
+
+
+class MockRobinhoodHandler(BaseHTTPRequestHandler):
+    """Answers one request. The routes are matched against the path in order."""
+    protocol_version = 'HTTP/1.1'
+    # Responses are written in two parts, so without this each one waits for the client's delayed ack.
+    disable_nagle_algorithm = True
+
+    ROUTES = [
+        ('POST', r'^/oauth2/token/$', 'token'),
+        ('GET', r'^/accounts/$', 'accounts'),
+        ('GET', r'^/accounts/(?P<number>[^/]+)/$', 'account'),
+        ('GET', r'^/portfolios/$', 'portfolios'),
+        ('GET', r'^/positions/$', 'positions'),
+        ('GET', r'^/instruments/$', 'instruments'),
+        ('GET', r'^/instruments/(?P<id>[^/]+)/$', 'instrument'),
+        ('GET', r'^/instruments/(?P<id>[^/]+)/splits/$', 'splits'),
+        ('GET', r'^/quotes/$', 'quotes'),
+        ('GET', r'^/quotes/historicals/$', 'historicals'),
+        ('GET', r'^/quotes/(?P<symbol>[^/]+)/$', 'quote'),
+        ('GET', r'^/fundamentals/$', 'fundamentals'),
+        ('GET', r'^/fundamentals/(?P<symbol>[^/]+)/$', 'fundamental'),
+        ('GET', r'^/orders/$', 'orders'),
+        ('POST', r'^/orders/$', 'place_order'),
+        ('GET', r'^/orders/(?P<id>[^/]+)/$', 'order'),
+        ('POST', r'^/orders/(?P<id>[^/]+)/cancel/$', 'cancel_order'),
+        ('GET', r'^/options/chains/$', 'chains'),
+        ('GET', r'^/options/chains/(?P<id>[^/]+)/$', 'chain'),
+        ('GET', r'^/options/instruments/$', 'option_instruments'),
+        ('GET', r'^/options/instruments/(?P<id>[^/]+)/$', 'option_instrument'),
+        ('GET', r'^/marketdata/options/$', 'option_market_data'),
+        ('GET', r'^/marketdata/options/(?P<id>[^/]+)/$', 'option_market_data_by_id'),
+    ]
+    COMPILED_ROUTES = [(method, re.compile(pattern), name) for method, pattern, name in ROUTES]
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle_request(self, method):
+        server = self.server
+        parts = urlsplit(self.path)
+        query = dict(parse_qsl(parts.query, keep_blank_values=True))
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        server.count_request()
+        delay = server.latency + (server.random.uniform(0, server.jitter) if server.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        if server.error_rate and server.random.random() < server.error_rate:
+            server.count_error()
+            return(self.send_json(server.error_status, {'detail': 'Injected error.'}))
+        for route_method, pattern, name in self.COMPILED_ROUTES:
+            match = pattern.match(parts.path)
+            if match and route_method == method:
+                status, data = getattr(self, 'route_' + name)(query, self.parse_body(body), **match.groupdict())
+                return(self.send_json(status, data))
+        return(self.send_json(404, {'detail': 'Not found.'}))
+
+    def parse_body(self, body):
+        if not body:
+            return({})
+        if 'json' in (self.headers.get('Content-Type') or ''):
+            return(json.loads(body))
+        return(dict(parse_qsl(body.decode())))
+
+    def send_json(self, status, data):
+        content = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def url(self, path, query=None):
+        base = 'http://{0}'.format(self.headers.get('Host') or '{0}:{1}'.format(*self.server.server_address))
+        return(base + path + ('?' + urlencode(query) if query else ''))
+
+    def page(self, items, query, path):
+        return(paginate(items, query, self.server.page_size, lambda next_query: self.url(path, next_query)))
+
+    def instrument_data(self, item):
+        return(dict(item, url=self.url('/instruments/{0}/'.format(item['id'])),
+                    quote=self.url('/quotes/{0}/'.format(item['symbol'])),
+                    fundamentals=self.url('/fundamentals/{0}/'.format(item['symbol'])),
+                    splits=self.url('/instruments/{0}/splits/'.format(item['id']))))
+
+    def option_data(self, item):
+        return(dict(item, url=self.url('/options/instruments/{0}/'.format(item['id']))))
+
+    def order_data(self, item):
+        data = dict(item, url=self.url('/orders/{0}/'.format(item['id'])),
+                    instrument=self.url('/instruments/{0}/'.format(item['instrument_id'])),
+                    account=self.url('/accounts/{0}/'.format(ACCOUNT_NUMBER)), position=None)
+        if item['state'] in ('queued', 'confirmed'):
+            data['cancel'] = self.url('/orders/{0}/cancel/'.format(item['id']))
+        del data['symbol']
+        return(data)
+
+    def quote_data(self, symbol):
+        data = self.server.data
+        if symbol not in data.prices:
+            return(None)
+        generator = self.server.random
+        price = data.prices[symbol] * (1 + generator.uniform(-0.001, 0.001))
+        return({
+            'symbol': symbol, 'ask_price': '{0:.4f}'.format(price + 0.01), 'ask_size': generator.randint(1, 500),
+            'bid_price': '{0:.4f}'.format(price - 0.01), 'bid_size': generator.randint(1, 500),
+            'last_trade_price': '{0:.4f}'.format(price), 'last_extended_hours_trade_price': None,
+            'previous_close': '{0:.4f}'.format(data.prices[symbol]),
+            'adjusted_previous_close': '{0:.4f}'.format(data.prices[symbol]),
+            'previous_close_date': (date.today() - timedelta(days=1)).isoformat(), 'trading_halted': False,
+            'has_traded': True, 'last_trade_price_source': 'consolidated', 'updated_at': timestamp(),
+            'instrument': self.url('/instruments/{0}/'.format(data.instruments[symbol]['id'])),
+            'instrument_id': data.instruments[symbol]['id']
+        })
+
+    def route_token(self, query, body):
+        return(200, {'access_token': 'mock-access-token', 'refresh_token': 'mock-refresh-token',
+                     'token_type': 'Bearer', 'expires_in': 86400, 'scope': 'internal'})
+
+    def account_data(self):
+        return({
+            'url': self.url('/accounts/{0}/'.format(ACCOUNT_NUMBER)), 'account_number': ACCOUNT_NUMBER,
+            'type': 'margin', 'cash': '10000.00', 'buying_power': '20000.00', 'uncleared_deposits': '0.00',
+            'unsettled_funds': '0.00', 'created_at': '2020-01-02T00:00:00Z'})
+
+    def route_accounts(self, query, body):
+        return(200, {'previous': None, 'next': None, 'results': [self.account_data()]})
+
+    def route_account(self, query, body, number):
+        return((200, self.account_data()) if number == ACCOUNT_NUMBER else (404, {'detail': 'Not found.'}))
+
+    def route_portfolios(self, query, body):
+        return(200, {'previous': None, 'next': None, 'results': [{
+            'url': self.url('/portfolios/{0}/'.format(ACCOUNT_NUMBER)),
+            'account': self.url('/accounts/{0}/'.format(ACCOUNT_NUMBER)),
+            'equity': '50000.0000', 'extended_hours_equity': '50100.0000', 'market_value': '40000.0000',
+            'withdrawable_amount': '10000.0000'}]})
+
+    def route_positions(self, query, body):
+        # One position of ten shares, bought at 95% of the generated price, for each symbol.
+        data = self.server.data
+        positions = [{
+            'url': self.url('/positions/{0}/{1}/'.format(ACCOUNT_NUMBER, item['id'])),
+            'instrument': self.url('/instruments/{0}/'.format(item['id'])), 'instrument_id': item['id'],
+            'account': self.url('/accounts/{0}/'.format(ACCOUNT_NUMBER)), 'account_number': ACCOUNT_NUMBER,
+            'quantity': '10.00000000', 'average_buy_price': '{0:.4f}'.format(data.prices[symbol] * 0.95),
+            'intraday_average_buy_price': '0.0000', 'intraday_quantity': '0.00000000',
+            'shares_held_for_sells': '0.00000000', 'created_at': '2021-01-04T14:30:00.000000Z',
+            'updated_at': '2021-01-04T14:30:00.000000Z'
+        } for symbol, item in data.instruments.items()]
+        return(200, self.page(positions, query, '/positions/'))
+
+    def route_instruments(self, query, body):
+        data = self.server.data
+        if 'symbol' in query:
+            item = data.instruments.get(query['symbol'].upper())
+            items = [item] if item else []
+        elif 'ids' in query:
+            items = [data.instruments_by_id[id] for id in query['ids'].split(',') if id in data.instruments_by_id]
+        else:
+            items = list(data.instruments.values())
+        return(200, self.page([self.instrument_data(item) for item in items], query, '/instruments/'))
+
+    def route_instrument(self, query, body, id):
+        item = self.server.data.instruments_by_id.get(id)
+        if item is None:
+            return(404, {'detail': 'Not found.'})
+        return(200, self.instrument_data(item))
+
+    def route_splits(self, query, body, id):
+        if id not in self.server.data.instruments_by_id:
+            return(404, {'detail': 'Not found.'})
+        # The generated instruments never split.
+        return(200, self.page([], query, '/instruments/{0}/splits/'.format(id)))
+
+    def route_quotes(self, query, body):
+        symbols = [symbol.upper() for symbol in query.get('symbols', '').split(',') if symbol]
+        return(200, {'results': [self.quote_data(symbol) for symbol in symbols]})
+
+    def route_quote(self, query, body, symbol):
+        data = self.quote_data(symbol.upper())
+        return((200, data) if data else (404, {'detail': 'Not found.'}))
+
+    def fundamentals_data(self, symbol):
+        data = self.server.data
+        if symbol not in data.prices:
+            return(None)
+        price = data.prices[symbol]
+        return({
+            'open': '{0:.4f}'.format(price), 'high': '{0:.4f}'.format(price * 1.01),
+            'low': '{0:.4f}'.format(price * 0.99), 'volume': '25000000.0000',
+            'average_volume': '30000000.0000', 'high_52_weeks': '{0:.4f}'.format(price * 1.3),
+            'low_52_weeks': '{0:.4f}'.format(price * 0.7), 'market_cap': '{0:.2f}'.format(price * 1e9),
+            'pe_ratio': '25.000000', 'dividend_yield': '0.600000', 'shares_outstanding': '1000000000.000000',
+            'description': '{0} is a mock company.'.format(symbol), 'sector': 'Technology',
+            'industry': 'Software',
+            'instrument': self.url('/instruments/{0}/'.format(data.instruments[symbol]['id']))
+        })
+
+    def route_fundamentals(self, query, body):
+        return(200, {'results': [self.fundamentals_data(symbol.upper())
+                                 for symbol in query.get('symbols', '').split(',')]})
+
+    def route_fundamental(self, query, body, symbol):
+        data = self.fundamentals_data(symbol.upper())
+        return((200, data) if data else (404, {'detail': 'Not found.'}))
+
+    def route_historicals(self, query, body):
+        data = self.server.data
+        interval = INTERVAL_SECONDS.get(query.get('interval', 'hour'))
+        span = SPAN_SECONDS.get(query.get('span', 'week'))
+        if interval is None or span is None:
+            return(400, {'detail': 'Invalid interval or span.'})
+        count = min(span // interval, MAX_HISTORICALS)
+        end = int(time.time()) // interval * interval
+        results = []
+        for symbol in query.get('symbols', '').split(','):
+            symbol = symbol.upper()
+            if symbol not in data.prices:
+                results.append({'symbol': symbol, 'historicals': []})
+                continue
+            generator = random.Random(symbol)
+            price = data.prices[symbol]
+            points = []
+            for i in range(count):
+                open_price = price
+                price = max(0.01, price * (1 + generator.gauss(0, 0.01)))
+                points.append({
+                    'begins_at': datetime.fromtimestamp(end - (count - i) * interval, timezone.utc).strftime(
+                        '%Y-%m-%dT%H:%M:%SZ'),
+                    'open_price': '{0:.6f}'.format(open_price), 'close_price': '{0:.6f}'.format(price),
+                    'high_price': '{0:.6f}'.format(max(open_price, price) * 1.002),
+                    'low_price': '{0:.6f}'.format(min(open_price, price) * 0.998),
+                    'volume': generator.randint(10000, 1000000), 'session': 'reg', 'interpolated': False
+                })
+            results.append({'quote': self.url('/quotes/{0}/'.format(symbol)), 'symbol': symbol,
+                            'interval': query.get('interval'), 'span': query.get('span'),
+                            'bounds': query.get('bounds', 'regular'), 'instrument_id': data.instruments[symbol]['id'],
+                            'historicals': points})
+        return(200, {'results': results})
+
+    def route_orders(self, query, body):
+        data = self.server.data
+        with data.lock:
+            orders = list(data.orders)
+        if 'updated_at[gte]' in query:
+            orders = [item for item in orders if item['updated_at'] >= query['updated_at[gte]']]
+        return(200, self.page([self.order_data(item) for item in orders], query, '/orders/'))
+
+    def route_place_order(self, query, body):
+        data = self.server.data
+        instrument_id = (body.get('instrument') or '').rstrip('/').split('/')[-1]
+        instrument = data.instruments_by_id.get(instrument_id)
+        if instrument is None:
+            instrument = data.instruments.get((body.get('symbol') or '').upper())
+        if instrument is None or not body.get('quantity') or body.get('side') not in ('buy', 'sell'):
+            return(400, {'detail': 'Invalid order.'})
+        state = 'filled' if body.get('type', 'market') == 'market' else 'confirmed'
+        item = data.add_order(instrument['symbol'], body['side'], '{0:.8f}'.format(float(body['quantity'])),
+                              body.get('type', 'market'), body.get('price'), state)
+        return(201, self.order_data(item))
+
+    def route_order(self, query, body, id):
+        item = self.server.data.orders_by_id.get(id)
+        return((200, self.order_data(item)) if item else (404, {'detail': 'Not found.'}))
+
+    def route_cancel_order(self, query, body, id):
+        data = self.server.data
+        item = data.orders_by_id.get(id)
+        if item is None:
+            return(404, {'detail': 'Not found.'})
+        with data.lock:
+            if item['state'] not in ('queued', 'confirmed'):
+                return(400, {'detail': 'Order cannot be cancelled.'})
+            item['state'] = 'cancelled'
+            item['updated_at'] = timestamp()
+        return(200, {})
+
+    def route_chains(self, query, body):
+        chains = self.server.data.chains
+        ids = query.get('ids', '').split(',') if query.get('ids') else list(chains)
+        return(200, self.page([chains[id] for id in ids if id in chains], query, '/options/chains/'))
+
+    def route_chain(self, query, body, id):
+        chain = self.server.data.chains.get(id)
+        return((200, chain) if chain else (404, {'detail': 'Not found.'}))
+
+    def route_option_instruments(self, query, body):
+        items = self.server.data.options.values()
+        if 'ids' in query:
+            ids = set(query['ids'].split(','))
+            items = [item for item in items if item['id'] in ids]
+        for key in ('chain_id', 'chain_symbol', 'type', 'state'):
+            if key in query:
+                items = [item for item in items if item[key] == query[key]]
+        if 'expiration_dates' in query:
+            dates = set(query['expiration_dates'].split(','))
+            items = [item for item in items if item['expiration_date'] in dates]
+        if 'strike_price' in query:
+            strike = float(query['strike_price'])
+            items = [item for item in items if float(item['strike_price']) == strike]
+        return(200, self.page([self.option_data(item) for item in items], query, '/options/instruments/'))
+
+    def route_option_instrument(self, query, body, id):
+        item = self.server.data.options.get(id)
+        return((200, self.option_data(item)) if item else (404, {'detail': 'Not found.'}))
+
+    def option_market_data(self, item):
+        data = self.server.data
+        underlying = data.prices[item['chain_symbol']]
+        strike = float(item['strike_price'])
+        intrinsic = max(underlying - strike, 0) if item['type'] == 'call' else max(strike - underlying, 0)
+        mark = intrinsic + underlying * 0.02
+        return({
+            'instrument': self.url('/options/instruments/{0}/'.format(item['id'])), 'instrument_id': item['id'],
+            'symbol': item['chain_symbol'], 'expiration_date': item['expiration_date'],
+            'strike_price': item['strike_price'], 'type': item['type'],
+            'adjusted_mark_price': '{0:.4f}'.format(mark), 'mark_price': '{0:.4f}'.format(mark),
+            'ask_price': '{0:.4f}'.format(mark + 0.05), 'bid_price': '{0:.4f}'.format(max(mark - 0.05, 0)),
+            'ask_size': 10, 'bid_size': 10, 'last_trade_price': '{0:.4f}'.format(mark), 'last_trade_size': 1,
+            'open_interest': 1000, 'volume': 250, 'implied_volatility': '0.300000', 'delta': '0.500000',
+            'gamma': '0.020000', 'theta': '-0.050000', 'vega': '0.100000', 'rho': '0.010000',
+            'chance_of_profit_long': '0.400000', 'chance_of_profit_short': '0.600000',
+            'previous_close_price': '{0:.4f}'.format(mark), 'updated_at': timestamp()
+        })
+
+    def route_option_market_data(self, query, body):
+        options = self.server.data.options
+        ids = []
+        if 'ids' in query:
+            ids = query['ids'].split(',')
+        elif 'instruments' in query:
+            ids = [url.rstrip('/').split('/')[-1] for url in query['instruments'].split(',')]
+        return(200, {'results': [self.option_market_data(options[id]) if id in options else None for id in ids]})
+
+    def route_option_market_data_by_id(self, query, body, id):
+        item = self.server.data.options.get(id)
+        return((200, self.option_market_data(item)) if item else (404, {'detail': 'Not found.'}))
+
+
+class MockRobinhoodServer(ThreadingHTTPServer):
+    """A local http server that imitates the Robinhood api.
+
+    :param host: The address to listen on.
+    :type host: Optional[str]
+    :param port: The port to listen on. Default is any free port.
+    :type port: Optional[int]
+    :param data: The data to answer with. Default is MockData() for the default symbols.
+    :type data: Optional[MockData]
+    :param latency: The number of seconds to wait before each response.
+    :type latency: Optional[float]
+    :param jitter: Up to this many more seconds are added to the latency at random.
+    :type jitter: Optional[float]
+    :param error_rate: The fraction of requests that are answered with error_status instead.
+    :type error_rate: Optional[float]
+    :param error_status: The status code of injected errors.
+    :type error_status: Optional[int]
+    :param page_size: The number of results on each page of a paginated endpoint.
+    :type page_size: Optional[int]
+    :param seed: The seed used for latency, errors, and quotes. With a seed, the same requests sent one at a time \
+        fail in the same places on every run. Default is a different seed each time.
+    :type seed: Optional[int]
+
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, host='127.0.0.1', port=0, data=None, latency=0.0, jitter=0.0, error_rate=0.0,
+                 error_status=503, page_size=100, seed=None):
+        super().__init__((host, port), MockRobinhoodHandler)
+        self.data = data or MockData()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.page_size = page_size
+        self.random = random.Random(seed)
+        self.stats = {'requests': 0, 'errors': 0}
+        self.stats_lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def url(self):
+        """The base url of the server, such as http://127.0.0.1:8000."""
+        host, port = self.server_address[:2]
+        return('http://{0}:{1}'.format(host, port))
+
+    def count_request(self):
+        with self.stats_lock:
+            self.stats['requests'] += 1
+
+    def count_error(self):
+        with self.stats_lock:
+            self.stats['errors'] += 1
+
+    def start(self):
+        """Starts answering requests in a background thread.
+
+        :returns: The server.
+        """
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return(self)
+
+    def stop(self):
+        """Stops the background thread and closes the socket."""
+        self.shutdown()
+        self.server_close()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def __enter__(self):
+        return(self.start())
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Runs a mock Robinhood api server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--symbols', default=','.join(DEFAULT_SYMBOLS), help='Comma separated stock tickers.')
+    parser.add_argument('--orders', type=int, default=500, help='The number of orders to generate.')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before each response.')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Up to this many more seconds of latency.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests that fail.')
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=None, help='Seed for latency, errors, and quotes.')
+    args = parser.parse_args(argv)
+    data = MockData(args.symbols.split(','), orders=args.orders)
+    server = MockRobinhoodServer(args.host, args.port, data, args.latency, args.jitter, args.error_rate,
+                                 args.error_status, args.page_size, args.seed)
+    print('Serving the mock Robinhood api at {0}'.format(server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -117,7 +117,7 @@ def get_chains(symbol, info=None):
         print(message, file=get_output())
         return None
 
-    url = chains_url(symbol)
+    url = chains_url(chain_id=id_for_chain(symbol))
     data = request_get(url)
 
     return(filter_data(data, info))
@@ -0,0 +1,161 @@
+"""Contains compact record types that can be used in place of the dictionaries returned by the api.
+
+Each record stores its values in __slots__ instead of a dictionary, and numeric fields keep the string sent
+by the api until they are first read, at which point they are converted to a float and stored.
+Records support ``record['key']`` and ``'key' in record`` so they can still be passed to filter_data.
+"""
+
+
+class NumericField:
+    """ A descriptor that converts the string stored in a slot to a float the first time it is read.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.slot = '_' + name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        value = getattr(instance, self.slot)
+        if isinstance(value, str):
+            value = float(value) if value else None
+            setattr(instance, self.slot, value)
+        return value
+
+    def __set__(self, instance, value):
+        setattr(instance, self.slot, value)
+
+
+class Record:
+    """ The base class of every record type. Keys that are not one of the FIELDS of the record
+    are kept in a dictionary so that no data is lost.
+    """
+    __slots__ = ('_extra',)
+    FIELDS = ()
+    NUMERIC_FIELDS = frozenset()
+    NESTED_FIELDS = {}
+
+    def __init__(self, data):
+        for field in self.FIELDS:
+            value = data.get(field)
+            if field in self.NESTED_FIELDS and value is not None:
+                value = [self.NESTED_FIELDS[field](item) for item in value]
+            setattr(self, field, value)
+        extra = {key: value for key, value in data.items() if key not in self.FIELDS}
+        self._extra = extra or None
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            return getattr(self, key)
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.FIELDS or (self._extra is not None and key in self._extra)
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return '{0}({1})'.format(type(self).__name__, self.to_dict())
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(self.FIELDS) + (list(self._extra) if self._extra else [])
+
+    def to_dict(self):
+        """ Returns the record as a dictionary. Numeric fields are returned as floats.
+        """
+        data = {}
+        for key in self.keys():
+            value = self[key]
+            if key in self.NESTED_FIELDS and value is not None:
+                value = [item.to_dict() for item in value]
+            data[key] = value
+        return data
+
+
+def record_type(name, fields, numeric_fields=(), nested_fields=None):
+    """ Creates a record class with a slot for each field.
+
+    :param name: The name of the class.
+    :type name: str
+    :param fields: The keys of the api dictionary to store.
+    :type fields: list
+    :param numeric_fields: The fields that hold numbers sent as strings.
+    :type numeric_fields: Optional[list]
+    :param nested_fields: Maps a field that holds a list of dictionaries to the record type of its items.
+    :type nested_fields: Optional[dict]
+    :returns: A subclass of Record.
+
+    """
+    numeric_fields = frozenset(numeric_fields)
+    namespace = {
+        '__slots__': tuple('_' + field if field in numeric_fields else field for field in fields),
+        'FIELDS': tuple(fields),
+        'NUMERIC_FIELDS': numeric_fields,
+        'NESTED_FIELDS': nested_fields or {}
+    }
+    for field in numeric_fields:
+        namespace[field] = NumericField(field)
+    return type(name, (Record,), namespace)
+
+
+QuoteRecord = record_type('QuoteRecord', [
+    'symbol', 'ask_price', 'ask_size', 'bid_price', 'bid_size', 'last_trade_price',
+    'last_extended_hours_trade_price', 'previous_close', 'adjusted_previous_close', 'previous_close_date',
+    'trading_halted', 'has_traded', 'last_trade_price_source', 'updated_at', 'instrument', 'instrument_id'
+], numeric_fields=[
+    'ask_price', 'bid_price', 'last_trade_price', 'last_extended_hours_trade_price', 'previous_close',
+    'adjusted_previous_close'
+])
+
+PositionRecord = record_type('PositionRecord', [
+    'url', 'instrument', 'instrument_id', 'account', 'account_number', 'average_buy_price',
+    'pending_average_buy_price', 'quantity', 'intraday_average_buy_price', 'intraday_quantity',
+    'shares_available_for_exercise', 'shares_held_for_buys', 'shares_held_for_sells', 'shares_held_for_stock_grants',
+    'shares_held_for_options_collateral', 'shares_held_for_options_events', 'shares_pending_from_options_events',
+    'updated_at', 'created_at'
+], numeric_fields=[
+    'average_buy_price', 'pending_average_buy_price', 'quantity', 'intraday_average_buy_price', 'intraday_quantity',
+    'shares_available_for_exercise', 'shares_held_for_buys', 'shares_held_for_sells', 'shares_held_for_stock_grants',
+    'shares_held_for_options_collateral', 'shares_held_for_options_events', 'shares_pending_from_options_events'
+])
+
+ExecutionRecord = record_type('ExecutionRecord', [
+    'id', 'price', 'quantity', 'settlement_date', 'timestamp'
+], numeric_fields=['price', 'quantity'])
+
+OrderRecord = record_type('OrderRecord', [
+    'id', 'ref_id', 'url', 'account', 'position', 'cancel', 'instrument', 'instrument_id', 'cumulative_quantity',
+    'average_price', 'fees', 'state', 'type', 'side', 'time_in_force', 'trigger', 'price', 'stop_price', 'quantity',
+    'reject_reason', 'created_at', 'updated_at', 'last_transaction_at', 'executions', 'extended_hours'
+], numeric_fields=[
+    'cumulative_quantity', 'average_price', 'fees', 'price', 'stop_price', 'quantity'
+], nested_fields={'executions': ExecutionRecord})
+
+
+def to_records(data, record_class):
+    """ Converts the data returned by a function into records.
+
+    :param data: A dictionary or a list of dictionaries returned by a function such as get_quotes.
+    :type data: dict or list
+    :param record_class: The record type to convert to, such as QuoteRecord, PositionRecord, or OrderRecord.
+    :type record_class: type
+    :returns: A record, or a list of records. None entries are kept as None.
+
+    """
+    if data is None:
+        return None
+    if isinstance(data, dict):
+        return record_class(data)
+    return [record_class(item) if item is not None else None for item in data]
@@ -292,6 +292,34 @@ def get_symbol_by_url(url):
     data = request_get(url)
     return filter_data(data, info='symbol')
 
+
+def get_symbols_by_urls(urls, batch_size=50):
+    """Returns the symbols of any number of instrument urls. The instruments are loaded with one request for \
+    every batch_size ids instead of one request per url, and are added to INSTRUMENT_CACHE.
+
+    :param urls: The instrument urls, such as the instrument values of positions or orders. Repeated urls are only \
+    requested once.
+    :type urls: list
+    :param batch_size: The number of instruments to request at once.
+    :type batch_size: Optional[int]
+    :returns: [dict] Returns a dictionary of each url to its symbol. Urls that were not found are left out.
+
+    """
+    ids = {}
+    for url in urls:
+        if url:
+            ids.setdefault(url.rstrip('/').rsplit('/', 1)[-1], []).append(url)
+    id_list = list(ids)
+    symbols = {}
+    for i in range(0, len(id_list), batch_size):
+        data = request_get(instruments_url(), 'pagination', {'ids': ','.join(id_list[i:i+batch_size])})
+        for item in data or []:
+            if item and item.get('id') in ids:
+                INSTRUMENT_CACHE.setdefault(item['symbol'], item)
+                for url in ids[item['id']]:
+                    symbols[url] = item['symbol']
+    return(symbols)
+
 @convert_none_to_string
 def get_ratings(symbol, info=None):
     """Returns the ratings for a stock, including the number of buy, hold, and sell ratings.
@@ -315,7 +343,7 @@ def get_ratings(symbol, info=None):
         print(message, file=get_output())
         return None
 
-    url = ratings_url(symbol)
+    url = ratings_url(instrument_id=id_for_stock(symbol))
     data = request_get(url)
     if not data:
         return(data)
@@ -467,7 +495,7 @@ def get_splits(symbol, info=None):
         print(message, file=get_output())
         return None
 
-    url = splits_url(symbol)
+    url = splits_url(instrument_id=id_for_stock(symbol))
     data = request_get(url, 'results')
     return(filter_data(data, info))
 
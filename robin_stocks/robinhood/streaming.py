@@ -0,0 +1,234 @@
+"""Contains a quote service that shares one polling loop between many subscribers."""
+import asyncio
+import queue
+import threading
+import time
+
+from robin_stocks.robinhood.helper import *
+from robin_stocks.robinhood.stocks import *
+
+# Put on the queue of a subscription when it ends so that readers stop waiting.
+END_OF_UPDATES = object()
+
+
+class QuoteSubscription:
+    """ Holds the symbols a subscriber is interested in and how updates are delivered to it.
+    If no callback is given, updates are put on a queue which can be read with get(),
+    iterated over, or iterated over with ``async for``. Iteration ends when the subscription
+    is unsubscribed or the service is stopped.
+    """
+
+    def __init__(self, service, symbols, callback=None, max_age=None):
+        self.service = service
+        self.symbols = set(symbols)
+        self.callback = callback
+        self.max_age = max_age
+        self.queue = None if callback else queue.Queue()
+        self.closed = False
+
+    def deliver(self, quote):
+        if self.closed:
+            return
+        if self.callback:
+            self.callback(quote)
+        else:
+            self.queue.put(quote)
+
+    def close(self):
+        """ Ends the subscription. Readers waiting on the queue are woken up.
+        """
+        self.closed = True
+        if self.queue is not None:
+            self.queue.put(END_OF_UPDATES)
+
+    def get(self, timeout=None):
+        """ Returns the next quote update, waiting up to timeout seconds. Raises queue.Empty on timeout.
+        Returns None once the subscription has ended.
+        """
+        quote = self.queue.get(timeout=timeout)
+        if quote is END_OF_UPDATES:
+            # Leave the marker for any other reader of the queue.
+            self.queue.put(END_OF_UPDATES)
+            return None
+        return quote
+
+    def unsubscribe(self):
+        """ Stops sending updates to this subscription.
+        """
+        self.service.unsubscribe(self)
+
+    def __iter__(self):
+        while True:
+            quote = self.get()
+            if quote is None:
+                return
+            yield quote
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        # The executor thread returns as soon as an update or the end marker is put on the queue.
+        quote = await asyncio.get_running_loop().run_in_executor(None, self.get)
+        if quote is None:
+            raise StopAsyncIteration
+        return quote
+
+
+class QuoteService:
+    """ Polls /quotes/ for the union of all subscribed symbols from a single background thread.
+    Each tick only requests symbols whose quotes are older than the freshness that their subscribers asked
+    for, and sends them in batched requests. Callers of get_quote() within the same tick share one request.
+
+    :param interval: The number of seconds between ticks. This is also the default freshness of a symbol.
+    :type interval: Optional[float]
+    :param batch_size: The maximum number of symbols to send in one request.
+    :type batch_size: Optional[int]
+
+    """
+
+    def __init__(self, interval=1.0, batch_size=100):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.subscriptions = []
+        self.quotes = {}
+        self.updated_at = {}
+        self.requested = set()
+        self.request_count = 0
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = False
+
+    def subscribe(self, inputSymbols, callback=None, max_age=None):
+        """ Starts sending quote updates for the symbols to a subscriber.
+
+        :param inputSymbols: May be a single stock ticker or a list of stock tickers.
+        :type inputSymbols: str or list
+        :param callback: Called with each quote dictionary from the polling thread. If left as None, \
+        updates are put on the queue of the returned subscription instead.
+        :type callback: Optional[function]
+        :param max_age: The maximum age in seconds of the quotes this subscriber wants. Default is the service interval.
+        :type max_age: Optional[float]
+        :returns: A QuoteSubscription object.
+
+        """
+        subscription = QuoteSubscription(self, inputs_to_set(inputSymbols), callback, max_age)
+        with self.condition:
+            self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.condition:
+            if subscription in self.subscriptions:
+                self.subscriptions.remove(subscription)
+        subscription.close()
+
+    def get_quote(self, symbol, max_age=None, timeout=None):
+        """ Returns the latest quote for a symbol. If the stored quote is older than max_age, waits for the next
+        tick so that all callers asking for the same symbol share one request.
+
+        :param symbol: The stock ticker.
+        :type symbol: str
+        :param max_age: How old in seconds the quote may be. Default is the service interval.
+        :type max_age: Optional[float]
+        :param timeout: How long to wait for the next tick. Default is three intervals.
+        :type timeout: Optional[float]
+        :returns: The quote dictionary, or None if it could not be loaded in time.
+
+        """
+        symbol = symbol.upper().strip()
+        if max_age is None:
+            max_age = self.interval
+        if timeout is None:
+            timeout = self.interval * 3
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while time.monotonic() - self.updated_at.get(symbol, float('-inf')) > max_age:
+                self.requested.add(symbol)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.running:
+                    return None
+                self.condition.wait(remaining)
+            return self.quotes.get(symbol)
+
+    def start(self):
+        """ Starts the polling thread.
+        """
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """ Stops the polling thread, waits for it to finish, and ends every subscription.
+        """
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        with self.condition:
+            subscriptions = self.subscriptions
+            self.subscriptions = []
+        for subscription in subscriptions:
+            subscription.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def symbols_due(self, now):
+        """ Returns the symbols whose quotes are older than the freshness requested for them.
+        """
+        freshness = {symbol: self.interval for symbol in self.requested}
+        for subscription in self.subscriptions:
+            max_age = subscription.max_age if subscription.max_age is not None else self.interval
+            for symbol in subscription.symbols:
+                freshness[symbol] = min(max_age, freshness.get(symbol, max_age))
+        # Allow a little slack so a symbol polled on the last tick is not skipped because of timer jitter.
+        return [symbol for symbol, max_age in freshness.items()
+                if now - self.updated_at.get(symbol, float('-inf')) >= max_age - self.interval / 10]
+
+    def poll(self):
+        """ Runs a single tick. Requests the quotes that are due and sends them to subscribers.
+        """
+        with self.condition:
+            symbols = self.symbols_due(time.monotonic())
+            self.requested.clear()
+        updates = []
+        for i in range(0, len(symbols), self.batch_size):
+            data = get_quotes(symbols[i:i+self.batch_size])
+            self.request_count += 1
+            if data and data != [None]:
+                updates.extend(item for item in data if item)
+        now = time.monotonic()
+        with self.condition:
+            for quote in updates:
+                self.quotes[quote['symbol']] = quote
+                self.updated_at[quote['symbol']] = now
+            subscriptions = list(self.subscriptions)
+            self.condition.notify_all()
+        for quote in updates:
+            for subscription in subscriptions:
+                if quote['symbol'] in subscription.symbols:
+                    try:
+                        subscription.deliver(quote)
+                    except Exception as message:
+                        # One failing callback should not keep the update from the other subscribers.
+                        print('Error in QuoteService callback: {0}'.format(message), file=get_output())
+
+    def run(self):
+        while self.running:
+            started = time.monotonic()
+            try:
+                self.poll()
+            except Exception as message:
+                print('Error in QuoteService: {0}'.format(message), file=get_output())
+            with self.condition:
+                if self.running:
+                    self.condition.wait(max(0, self.interval - (time.monotonic() - started)))
@@ -1,229 +1,313 @@
-"""Contains all the url endpoints for interacting with Robinhood API."""
-from robin_stocks.robinhood.helper import id_for_chain, id_for_stock
+"""Contains all the url endpoints for interacting with Robinhood API.
+
+Every url is built from the base url of its host in ROUTER. Functions that need an instrument or chain id
+take the symbol, as they always have, or the id itself. Passing the id means no request is sent; a symbol is
+looked up once with the id_for functions in helper and kept in INSTRUMENT_CACHE.
+"""
+# The base url of each Robinhood host.
+DEFAULT_BASE_URLS = {
+    'api': 'https://api.robinhood.com/',
+    'nummus': 'https://nummus.robinhood.com/',
+    'phoenix': 'https://phoenix.robinhood.com/',
+    'minerva': 'https://minerva.robinhood.com/',
+    'bonfire': 'https://bonfire.robinhood.com/',
+}
+
+
+class EndpointRouter:
+    """Builds endpoint urls from a base url for each Robinhood host.
+
+    :param base_urls: The base url to use for some of the hosts. The others use DEFAULT_BASE_URLS.
+    :type base_urls: Optional[dict]
+
+    """
+
+    def __init__(self, base_urls=None):
+        self.base_urls = dict(DEFAULT_BASE_URLS)
+        for host, base_url in (base_urls or {}).items():
+            self.set_base_url(base_url, [host])
+
+    def set_base_url(self, base_url=None, hosts=None):
+        """Changes the base url of some or all of the hosts.
+
+        :param base_url: The url to send requests to, such as http://127.0.0.1:8000. Set to None to use the Robinhood url.
+        :type base_url: Optional[str]
+        :param hosts: The hosts to change, such as ['api', 'nummus']. Default is every host.
+        :type hosts: Optional[list]
+        :raises: ValueError if a host is not in DEFAULT_BASE_URLS.
+
+        """
+        for host in hosts or DEFAULT_BASE_URLS:
+            if host not in DEFAULT_BASE_URLS:
+                raise ValueError('The host must be one of {0}.'.format(', '.join(DEFAULT_BASE_URLS)))
+            self.base_urls[host] = base_url.rstrip('/') + '/' if base_url else DEFAULT_BASE_URLS[host]
+
+    def url(self, host, path):
+        """Returns the url of a path on one of the hosts, such as url('api', 'quotes/')."""
+        return(self.base_urls[host] + path)
+
+    def rewrite(self, url):
+        """Moves an absolute Robinhood url, such as the next page link in a response, onto the base url of its host. \
+        Other urls are returned unchanged."""
+        for host, default in DEFAULT_BASE_URLS.items():
+            if url.startswith(default):
+                return(self.base_urls[host] + url[len(default):])
+        return(url)
+
+    def is_default(self):
+        """Returns True if every host uses its Robinhood url."""
+        return(self.base_urls == DEFAULT_BASE_URLS)
+
+
+ROUTER = EndpointRouter()
 
 # Login
 
 
 def login_url():
-    return('https://api.robinhood.com/oauth2/token/')
+    return(ROUTER.url('api', 'oauth2/token/'))
 
 
 def challenge_url(challenge_id):
-    return('https://api.robinhood.com/challenge/{0}/respond/'.format(challenge_id))
+    return(ROUTER.url('api', 'challenge/{0}/respond/'.format(challenge_id)))
+
+
+def pathfinder_user_machine_url():
+    return(ROUTER.url('api', 'pathfinder/user_machine/'))
+
+
+def pathfinder_inquiries_url(machine_id):
+    return(ROUTER.url('api', 'pathfinder/inquiries/{0}/user_view/'.format(machine_id)))
+
+
+def prompt_status_url(challenge_id):
+    return(ROUTER.url('api', 'push/{0}/get_prompts_status/'.format(challenge_id)))
 
 # Profiles
 
 
 def account_profile_url(account_number=None):
     if account_number:
-        return('https://api.robinhood.com/accounts/'+account_number)
+        return(ROUTER.url('api', 'accounts/'+account_number))
     else:
-        return('https://api.robinhood.com/accounts/?default_to_all_accounts=true')
+        return(ROUTER.url('api', 'accounts/?default_to_all_accounts=true'))
 
 
 def basic_profile_url():
-    return('https://api.robinhood.com/user/basic_info/')
+    return(ROUTER.url('api', 'user/basic_info/'))
 
 
 def investment_profile_url():
-    return('https://api.robinhood.com/user/investment_profile/')
+    return(ROUTER.url('api', 'user/investment_profile/'))
 
 
 def portfolio_profile_url(account_number=None):
     if account_number:
-        return('https://api.robinhood.com/portfolios/'+account_number)
+        return(ROUTER.url('api', 'portfolios/'+account_number))
     else:
-        return('https://api.robinhood.com/portfolios/')
+        return(ROUTER.url('api', 'portfolios/'))
 
 
 def security_profile_url():
-    return('https://api.robinhood.com/user/additional_info/')
+    return(ROUTER.url('api', 'user/additional_info/'))
 
 
 def user_profile_url():
-    return('https://api.robinhood.com/user/')
+    return(ROUTER.url('api', 'user/'))
 
 def portfolis_historicals_url(account_number):
-    return('https://api.robinhood.com/portfolios/historicals/{0}/'.format(account_number))
+    return(ROUTER.url('api', 'portfolios/historicals/{0}/'.format(account_number)))
 
 # Stocks
 
 
 def earnings_url():
-    return('https://api.robinhood.com/marketdata/earnings/')
+    return(ROUTER.url('api', 'marketdata/earnings/'))
 
 
 def events_url():
-    return('https://api.robinhood.com/options/events/')
+    return(ROUTER.url('api', 'options/events/'))
 
 
 def fundamentals_url():
-    return('https://api.robinhood.com/fundamentals/')
+    return(ROUTER.url('api', 'fundamentals/'))
 
 
 def historicals_url():
-    return('https://api.robinhood.com/quotes/historicals/')
+    return(ROUTER.url('api', 'quotes/historicals/'))
 
 
 def instruments_url():
-    return('https://api.robinhood.com/instruments/')
+    return(ROUTER.url('api', 'instruments/'))
 
 
 def news_url(symbol):
-    return('https://api.robinhood.com/midlands/news/{0}/?'.format(symbol))
+    return(ROUTER.url('api', 'midlands/news/{0}/?'.format(symbol)))
 
 
-def popularity_url(symbol):
-    return('https://api.robinhood.com/instruments/{0}/popularity/'.format(id_for_stock(symbol)))
+def popularity_url(symbol=None, instrument_id=None):
+    if instrument_id is None:
+        from robin_stocks.robinhood.helper import id_for_stock
+        instrument_id = id_for_stock(symbol)
+    return(ROUTER.url('api', 'instruments/{0}/popularity/'.format(instrument_id)))
 
 def quotes_url():
-    return('https://api.robinhood.com/quotes/')
+    return(ROUTER.url('api', 'quotes/'))
 
 
-def ratings_url(symbol):
-    return('https://api.robinhood.com/midlands/ratings/{0}/'.format(id_for_stock(symbol)))
+def ratings_url(symbol=None, instrument_id=None):
+    if instrument_id is None:
+        from robin_stocks.robinhood.helper import id_for_stock
+        instrument_id = id_for_stock(symbol)
+    return(ROUTER.url('api', 'midlands/ratings/{0}/'.format(instrument_id)))
 
 
-def splits_url(symbol):
-    return('https://api.robinhood.com/instruments/{0}/splits/'.format(id_for_stock(symbol)))
+def splits_url(symbol=None, instrument_id=None):
+    if instrument_id is None:
+        from robin_stocks.robinhood.helper import id_for_stock
+        instrument_id = id_for_stock(symbol)
+    return(ROUTER.url('api', 'instruments/{0}/splits/'.format(instrument_id)))
 
 # account
 
 def phoenix_url():
-    return('https://phoenix.robinhood.com/accounts/unified')
+    return(ROUTER.url('phoenix', 'accounts/unified'))
 
 def positions_url(account_number=None):
     if account_number:
-        return('https://api.robinhood.com/positions/?account_number='+account_number)
+        return(ROUTER.url('api', 'positions/?account_number='+account_number))
     else:
-        return('https://api.robinhood.com/positions/')
+        return(ROUTER.url('api', 'positions/'))
 
 def banktransfers_url(direction=None):
     if direction == 'received':
-        return('https://api.robinhood.com/ach/received/transfers/')
+        return(ROUTER.url('api', 'ach/received/transfers/'))
     else:
-        return('https://api.robinhood.com/ach/transfers/')
+        return(ROUTER.url('api', 'ach/transfers/'))
 
 def cardtransactions_url():
-   return('https://minerva.robinhood.com/history/transactions/')
+   return(ROUTER.url('minerva', 'history/transactions/'))
 
 def unifiedtransfers_url():
-   return('https://bonfire.robinhood.com/paymenthub/unified_transfers/')
+   return(ROUTER.url('bonfire', 'paymenthub/unified_transfers/'))
 
 def daytrades_url(account):
-    return('https://api.robinhood.com/accounts/{0}/recent_day_trades/'.format(account))
+    return(ROUTER.url('api', 'accounts/{0}/recent_day_trades/'.format(account)))
 
 
 def dividends_url():
-    return('https://api.robinhood.com/dividends/')
+    return(ROUTER.url('api', 'dividends/'))
 
 
 def documents_url():
-    return('https://api.robinhood.com/documents/')
+    return(ROUTER.url('api', 'documents/'))
 
 def withdrawl_url(bank_id):
-    return("https://api.robinhood.com/ach/relationships/{}/".format(bank_id))
+    return(ROUTER.url('api', 'ach/relationships/{}/'.format(bank_id)))
 
 def linked_url(id=None, unlink=False):
     if unlink:
-        return('https://api.robinhood.com/ach/relationships/{0}/unlink/'.format(id))
+        return(ROUTER.url('api', 'ach/relationships/{0}/unlink/'.format(id)))
     if id:
-        return('https://api.robinhood.com/ach/relationships/{0}/'.format(id))
+        return(ROUTER.url('api', 'ach/relationships/{0}/'.format(id)))
     else:
-        return('https://api.robinhood.com/ach/relationships/')
+        return(ROUTER.url('api', 'ach/relationships/'))
 
 
 def margin_url():
-    return('https://api.robinhood.com/margin/calls/')
+    return(ROUTER.url('api', 'margin/calls/'))
 
 
 def margininterest_url():
-    return('https://api.robinhood.com/cash_journal/margin_interest_charges/')
+    return(ROUTER.url('api', 'cash_journal/margin_interest_charges/'))
 
 
 def notifications_url(tracker=False):
     if tracker:
-        return('https://api.robinhood.com/midlands/notifications/notification_tracker/')
+        return(ROUTER.url('api', 'midlands/notifications/notification_tracker/'))
     else:
-        return('https://api.robinhood.com/notifications/devices/')
+        return(ROUTER.url('api', 'notifications/devices/'))
 
 
 def referral_url():
-    return('https://api.robinhood.com/midlands/referral/')
+    return(ROUTER.url('api', 'midlands/referral/'))
 
 
 def stockloan_url():
-    return('https://api.robinhood.com/accounts/stock_loan_payments/')
+    return(ROUTER.url('api', 'accounts/stock_loan_payments/'))
 
 def interest_url():
-    return('https://api.robinhood.com/accounts/sweeps/')
+    return(ROUTER.url('api', 'accounts/sweeps/'))
 
 def subscription_url():
-    return('https://api.robinhood.com/subscription/subscription_fees/')
+    return(ROUTER.url('api', 'subscription/subscription_fees/'))
 
 
 def wiretransfers_url():
-    return('https://api.robinhood.com/wire/transfers')
+    return(ROUTER.url('api', 'wire/transfers'))
 
 
 def watchlists_url(name=None, add=False):
     if name:
-        return('https://api.robinhood.com/midlands/lists/items/')
+        return(ROUTER.url('api', 'midlands/lists/items/'))
     else:
-        return('https://api.robinhood.com/midlands/lists/default/')
+        return(ROUTER.url('api', 'midlands/lists/default/'))
 
 
 # markets
 
 
 def currency_url():
-    return('https://nummus.robinhood.com/currency_pairs/')
+    return(ROUTER.url('nummus', 'currency_pairs/'))
 
 def markets_url():
-    return('https://api.robinhood.com/markets/')
+    return(ROUTER.url('api', 'markets/'))
 
 def market_hours_url(market, date):
-    return('https://api.robinhood.com/markets/{}/hours/{}/'.format(market, date))
+    return(ROUTER.url('api', 'markets/{}/hours/{}/'.format(market, date)))
 
 def movers_sp500_url():
-    return('https://api.robinhood.com/midlands/movers/sp500/')
+    return(ROUTER.url('api', 'midlands/movers/sp500/'))
 
 def get_100_most_popular_url():
-    return('https://api.robinhood.com/midlands/tags/tag/100-most-popular/')
+    return(ROUTER.url('api', 'midlands/tags/tag/100-most-popular/'))
 
 def movers_top_url():
-    return('https://api.robinhood.com/midlands/tags/tag/top-movers/')
+    return(ROUTER.url('api', 'midlands/tags/tag/top-movers/'))
 
 def market_category_url(category):
-    return('https://api.robinhood.com/midlands/tags/tag/{}/'.format(category))
+    return(ROUTER.url('api', 'midlands/tags/tag/{}/'.format(category)))
 
 # options
 
 
 def aggregate_url(account_number):
     if account_number:
-        return('https://api.robinhood.com/options/aggregate_positions/?account_numbers='+account_number)
+        return(ROUTER.url('api', 'options/aggregate_positions/?account_numbers='+account_number))
     else:
-        return('https://api.robinhood.com/options/aggregate_positions/')
+        return(ROUTER.url('api', 'options/aggregate_positions/'))
 
 
-def chains_url(symbol):
-    return('https://api.robinhood.com/options/chains/{0}/'.format(id_for_chain(symbol)))
+def chains_url(symbol=None, chain_id=None):
+    if chain_id is None:
+        from robin_stocks.robinhood.helper import id_for_chain
+        chain_id = id_for_chain(symbol)
+    return(ROUTER.url('api', 'options/chains/{0}/'.format(chain_id)))
 
 
 def option_historicals_url(id):
-    return('https://api.robinhood.com/marketdata/options/historicals/{0}/'.format(id))
+    return(ROUTER.url('api', 'marketdata/options/historicals/{0}/'.format(id)))
 
 
 def option_instruments_url(id=None):
     if id:
-        return('https://api.robinhood.com/options/instruments/{0}/'.format(id))
+        return(ROUTER.url('api', 'options/instruments/{0}/'.format(id)))
     else:
-        return('https://api.robinhood.com/options/instruments/')
+        return(ROUTER.url('api', 'options/instruments/'))
 
 
 def option_orders_url(orderID=None, account_number=None, start_date=None):
-    url = 'https://api.robinhood.com/options/orders/'
+    url = ROUTER.url('api', 'options/orders/')
     if orderID:
         url += '{0}/'.format(orderID)
     query_build = []
@@ -245,74 +329,74 @@ def option_orders_url(orderID=None, account_number=None, start_date=None):
 
 def option_positions_url(account_number):
     if account_number:
-        return('https://api.robinhood.com/options/positions/?account_numbers='+account_number)
+        return(ROUTER.url('api', 'options/positions/?account_numbers='+account_number))
     else:
-        return('https://api.robinhood.com/options/positions/')
+        return(ROUTER.url('api', 'options/positions/'))
 
 
 def marketdata_options_url():
-    return('https://api.robinhood.com/marketdata/options/')
+    return(ROUTER.url('api', 'marketdata/options/'))
 
 # pricebook
 
 
 def marketdata_quotes_url(id):
-    return ('https://api.robinhood.com/marketdata/quotes/{0}/'.format(id))
+    return (ROUTER.url('api', 'marketdata/quotes/{0}/'.format(id)))
 
 
 def marketdata_pricebook_url(id):
-    return ('https://api.robinhood.com/marketdata/pricebook/snapshots/{0}/'.format(id))
+    return (ROUTER.url('api', 'marketdata/pricebook/snapshots/{0}/'.format(id)))
 
 # crypto
 
 
 def order_crypto_url():
-    return('https://nummus.robinhood.com/orders/')
+    return(ROUTER.url('nummus', 'orders/'))
 
 
 def crypto_account_url():
-    return('https://nummus.robinhood.com/accounts/')
+    return(ROUTER.url('nummus', 'accounts/'))
 
 
 def crypto_currency_pairs_url():
-    return('https://nummus.robinhood.com/currency_pairs/')
+    return(ROUTER.url('nummus', 'currency_pairs/'))
 
 
 def crypto_quote_url(id):
-    return('https://api.robinhood.com/marketdata/forex/quotes/{0}/'.format(id))
+    return(ROUTER.url('api', 'marketdata/forex/quotes/{0}/'.format(id)))
 
 
 def crypto_holdings_url():
-    return('https://nummus.robinhood.com/holdings/')
+    return(ROUTER.url('nummus', 'holdings/'))
 
 
 def crypto_historical_url(id):
-    return('https://api.robinhood.com/marketdata/forex/historicals/{0}/'.format(id))
+    return(ROUTER.url('api', 'marketdata/forex/historicals/{0}/'.format(id)))
 
 
 def crypto_orders_url(orderID=None):
     if orderID:
-        return('https://nummus.robinhood.com/orders/{0}/'.format(orderID))
+        return(ROUTER.url('nummus', 'orders/{0}/'.format(orderID)))
     else:
-        return('https://nummus.robinhood.com/orders/')
+        return(ROUTER.url('nummus', 'orders/'))
 
 
 def crypto_cancel_url(id):
-    return('https://nummus.robinhood.com/orders/{0}/cancel/'.format(id))
+    return(ROUTER.url('nummus', 'orders/{0}/cancel/'.format(id)))
 
 # orders
 
 
 def cancel_url(url):
-    return('https://api.robinhood.com/orders/{0}/cancel/'.format(url))
+    return(ROUTER.url('api', 'orders/{0}/cancel/'.format(url)))
 
 
 def option_cancel_url(id):
-    return('https://api.robinhood.com/options/orders/{0}/cancel/'.format(id))
+    return(ROUTER.url('api', 'options/orders/{0}/cancel/'.format(id)))
 
 
 def orders_url(orderID=None, account_number=None, start_date=None):
-    url = 'https://api.robinhood.com/orders/'
+    url = ROUTER.url('api', 'orders/')
     if orderID:
         url += '{0}/'.format(orderID)
 
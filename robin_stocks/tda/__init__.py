@@ -1,12 +1,41 @@
-from .accounts import (get_account, get_accounts, get_transaction,
-                       get_transactions)
-from .authentication import (generate_encryption_passcode, login,
-                             login_first_time)
-from .helper import (get_login_state, get_order_number, request_data,
-                     request_delete, request_get, request_headers,
-                     request_post)
-from .markets import get_hours_for_market, get_hours_for_markets, get_movers
-from .orders import (cancel_order, get_order, get_orders_for_account,
-                     place_order)
-from .stocks import (get_instrument, get_option_chains, get_price_history,
-                     get_quote, get_quotes, search_instruments)
+"""Functions for the TD Ameritrade api. Submodules are imported the first time one of their functions is used,
+so cryptography is only loaded once authentication is needed."""
+
+from robin_stocks._lazy import lazy_module
+
+# The submodule that defines each function and class exported by this package.
+SUBMODULE_ATTRIBUTES = {
+    'accounts': [
+        'get_account', 'get_accounts', 'get_transaction', 'get_transactions'
+    ],
+    'authentication': [
+        'TokenManager', 'generate_encryption_passcode', 'login', 'login_first_time'
+    ],
+    'chains': [
+        'OptionChainTable', 'normalize_option_chain'
+    ],
+    'helper': [
+        'get_login_state', 'get_order_number', 'get_output', 'request_data', 'request_delete', 'request_get',
+        'request_headers', 'request_post', 'set_output', 'set_unauthorized_handler'
+    ],
+    'history': [
+        'RateLimiter', 'download_price_histories', 'download_price_history', 'load_price_history',
+        'split_date_range'
+    ],
+    'markets': [
+        'get_hours_for_market', 'get_hours_for_markets', 'get_movers'
+    ],
+    'orders': [
+        'cancel_order', 'get_order', 'get_orders_for_account', 'place_order'
+    ],
+    'stocks': [
+        'get_instrument', 'get_option_chains', 'get_price_history', 'get_quote', 'get_quote_vectors', 'get_quotes',
+        'search_instruments'
+    ],
+    'sync': [
+        'SyncStore', 'sync_orders', 'sync_transactions'
+    ]
+}
+SUBMODULES = {'accounts', 'authentication', 'chains', 'globals', 'helper', 'history', 'markets', 'orders', 'stocks', 'sync', 'urls'}
+__all__ = [name for names in SUBMODULE_ATTRIBUTES.values() for name in names]
+__getattr__, __dir__ = lazy_module(__name__, SUBMODULE_ATTRIBUTES, SUBMODULES)
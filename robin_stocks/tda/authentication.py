@@ -1,13 +1,21 @@
+import os
 import pickle
+import threading
 from datetime import datetime, timedelta
 from pathlib import Path
 
 from cryptography.fernet import Fernet
 from robin_stocks.tda.globals import DATA_DIR_NAME, PICKLE_NAME
-from robin_stocks.tda.helper import (request_data, set_login_state,
+from robin_stocks.tda.helper import (get_output, request_data,
+                                     set_login_state, set_unauthorized_handler,
                                      update_session)
 from robin_stocks.tda.urls import URLS
 
+# Authorization tokens expire after 30 mins. Refresh tokens expire after 90 days,
+# but you need to request a fresh authorization and refresh token before it expires.
+AUTHORIZATION_DELTA = timedelta(seconds=1800)
+REFRESH_DELTA = timedelta(days=60)
+
 
 def login_first_time(encryption_passcode, client_id, authorization_token, refresh_token):
     """ Stores log in information in a pickle file on the computer. After being used once,
@@ -32,101 +40,186 @@ def login_first_time(encryption_passcode, client_id, authorization_token, refres
     if not data_dir.exists():
         data_dir.mkdir(parents=True)
     pickle_path = data_dir.joinpath(PICKLE_NAME)
-    if not pickle_path.exists():
-        Path.touch(pickle_path)
     # Write information to the file.
-    with pickle_path.open("wb") as pickle_file:
-        pickle.dump(
-            {
-                'authorization_token': cipher_suite.encrypt(authorization_token.encode()),
-                'refresh_token': cipher_suite.encrypt(refresh_token.encode()),
-                'client_id': cipher_suite.encrypt(client_id.encode()),
-                'authorization_timestamp': datetime.now(),
-                'refresh_timestamp': datetime.now()
-            }, pickle_file)
+    write_token_file(pickle_path, {
+        'authorization_token': cipher_suite.encrypt(authorization_token.encode()),
+        'refresh_token': cipher_suite.encrypt(refresh_token.encode()),
+        'client_id': cipher_suite.encrypt(client_id.encode()),
+        'authorization_timestamp': datetime.now(),
+        'refresh_timestamp': datetime.now()
+    })
+
+
+def write_token_file(pickle_path, pickle_data):
+    """ Writes the token information to a temporary file and then moves it over the pickle file, \
+    so the pickle file is never left half written.
+    """
+    temp_path = Path(str(pickle_path) + ".tmp")
+    with temp_path.open("wb") as pickle_file:
+        pickle.dump(pickle_data, pickle_file)
+        pickle_file.flush()
+        os.fsync(pickle_file.fileno())
+    os.replace(str(temp_path), str(pickle_path))
+
+
+class TokenManager:
+    """ Keeps the decrypted tokens in memory and gets a new authorization token before the old one expires. \
+    The pickle file is only read when the manager is created and only written after a refresh. \
+    While a manager is running, a request that is rejected with a 401 status gets a new token and is sent once more.
+
+    :param encryption_passcode: Encryption key created by generate_encryption_passcode().
+    :type encryption_passcode: str
+    :param refresh_margin: How many seconds before the authorization token expires to get a new one.
+    :type refresh_margin: Optional[int]
+    :param pickle_path: The token file written by login_first_time(). Default is the file in the home directory.
+    :type pickle_path: Optional[str]
+
+    """
+
+    def __init__(self, encryption_passcode, refresh_margin=300, pickle_path=None):
+        if type(encryption_passcode) is str:
+            encryption_passcode = encryption_passcode.encode()
+        self.cipher_suite = Fernet(encryption_passcode)
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        if pickle_path is None:
+            pickle_path = Path.home().joinpath(DATA_DIR_NAME).joinpath(PICKLE_NAME)
+        self.pickle_path = Path(pickle_path)
+        self.lock = threading.RLock()
+        self.stopped = threading.Event()
+        self.thread = None
+        # Check that file exists before trying to read from it.
+        if not self.pickle_path.exists():
+            raise FileExistsError(
+                "Please Call login_first_time() to create pickle file.")
+        # Read the information from the pickle file.
+        with self.pickle_path.open("rb") as pickle_file:
+            pickle_data = pickle.load(pickle_file)
+        self.access_token = self.cipher_suite.decrypt(pickle_data['authorization_token']).decode()
+        self.refresh_token = self.cipher_suite.decrypt(pickle_data['refresh_token']).decode()
+        self.client_id = self.cipher_suite.decrypt(pickle_data['client_id']).decode()
+        self.authorization_timestamp = pickle_data['authorization_timestamp']
+        self.refresh_timestamp = pickle_data['refresh_timestamp']
+
+    def refresh(self, force=False):
+        """ Gets a new authorization token if the current one is about to expire, and a new refresh token every 60 days. \
+        The new tokens are written to the pickle file and to the session headers.
+
+        :param force: If set to True, gets a new authorization token even if the current one has not expired.
+        :type force: Optional[bool]
+        :returns: The authorization header value.
+
+        """
+        with self.lock:
+            now = datetime.now()
+            url = URLS.oauth()
+            # If it has been longer than 60 days. Get a new refresh and authorization token.
+            # Else if the authorization token is about to expire, get only a new authorization token.
+            if (now - self.refresh_timestamp > REFRESH_DELTA):
+                payload = {
+                    "grant_type": "refresh_token",
+                    "access_type": "offline",
+                    "refresh_token": self.refresh_token,
+                    "client_id": self.client_id
+                }
+                data, _ = request_data(url, payload, True)
+                if "access_token" not in data and "refresh_token" not in data:
+                    raise ValueError(
+                        "Refresh token is no longer valid. Call login_first_time() to get a new refresh token.")
+                self.access_token = data["access_token"]
+                self.refresh_token = data["refresh_token"]
+                self.authorization_timestamp = now
+                self.refresh_timestamp = now
+                self.save()
+            elif force or (now - self.authorization_timestamp > AUTHORIZATION_DELTA - self.refresh_margin):
+                payload = {
+                    "grant_type": "refresh_token",
+                    "refresh_token": self.refresh_token,
+                    "client_id": self.client_id
+                }
+                data, _ = request_data(url, payload, True)
+                if "access_token" not in data:
+                    raise ValueError(
+                        "Refresh token is no longer valid. Call login_first_time() to get a new refresh token.")
+                self.access_token = data["access_token"]
+                self.authorization_timestamp = now
+                # Do not replace the refresh timestamp.
+                self.save()
+            # Store authorization token in session information to be used with API calls.
+            auth_token = "Bearer {0}".format(self.access_token)
+            update_session("Authorization", auth_token)
+            update_session("apikey", self.client_id)
+            set_login_state(True)
+            return auth_token
+
+    def save(self):
+        """ Encrypts the tokens and writes them to the pickle file.
+        """
+        write_token_file(self.pickle_path, {
+            'authorization_token': self.cipher_suite.encrypt(self.access_token.encode()),
+            'refresh_token': self.cipher_suite.encrypt(self.refresh_token.encode()),
+            'client_id': self.cipher_suite.encrypt(self.client_id.encode()),
+            'authorization_timestamp': self.authorization_timestamp,
+            'refresh_timestamp': self.refresh_timestamp
+        })
+
+    def seconds_until_refresh(self):
+        """ Returns how many seconds are left until the authorization token should be refreshed.
+        """
+        refresh_at = self.authorization_timestamp + AUTHORIZATION_DELTA - self.refresh_margin
+        return max(0.0, (refresh_at - datetime.now()).total_seconds())
+
+    def start(self):
+        """ Logs in and starts a background thread that refreshes the authorization token before it expires.
+
+        :returns: The authorization header value.
+
+        """
+        auth_token = self.refresh()
+        set_unauthorized_handler(self.handle_unauthorized)
+        if self.thread is None:
+            self.stopped.clear()
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        return auth_token
+
+    def stop(self):
+        """ Stops the background thread.
+        """
+        self.stopped.set()
+        set_unauthorized_handler(None)
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        while not self.stopped.wait(self.seconds_until_refresh()):
+            try:
+                self.refresh()
+            except Exception as message:
+                print("Could not refresh TD Ameritrade token: {0}".format(message), file=get_output())
+                # Try again in a minute instead of spinning.
+                if self.stopped.wait(60):
+                    return
+
+    def handle_unauthorized(self):
+        """ Called by the session when a request is rejected with a 401 status. Gets a new authorization token.
+
+        :returns: The new authorization header value.
+
+        """
+        return self.refresh(force=True)
 
 
 def login(encryption_passcode):
     """ Set the authorization token so the API can be used. Gets a new authorization token
     every 30 minutes using the refresh token. Gets a new refresh token every 60 days.
+    For long running programs, use TokenManager.start() instead, which keeps the token fresh in the background.
 
     :param encryption_passcode: Encryption key created by generate_encryption_passcode().
     :type encryption_passcode: str
     
     """
-    if type(encryption_passcode) is str:
-        encryption_passcode = encryption_passcode.encode()
-    cipher_suite = Fernet(encryption_passcode)
-    # Check that file exists before trying to read from it.
-    data_dir = Path.home().joinpath(DATA_DIR_NAME)
-    pickle_path = data_dir.joinpath(PICKLE_NAME)
-    if not pickle_path.exists():
-        raise FileExistsError(
-            "Please Call login_first_time() to create pickle file.")
-    # Read the information from the pickle file.
-    with pickle_path.open("rb") as pickle_file:
-        pickle_data = pickle.load(pickle_file)
-        access_token = cipher_suite.decrypt(pickle_data['authorization_token']).decode()
-        refresh_token = cipher_suite.decrypt(pickle_data['refresh_token']).decode()
-        client_id = cipher_suite.decrypt(pickle_data['client_id']).decode()
-        authorization_timestamp = pickle_data['authorization_timestamp']
-        refresh_timestamp = pickle_data['refresh_timestamp']
-    # Authorization tokens expire after 30 mins. Refresh tokens expire after 90 days,
-    # but you need to request a fresh authorization and refresh token before it expires.
-    authorization_delta = timedelta(seconds=1800)
-    refresh_delta = timedelta(days=60)
-    url = URLS.oauth()
-    # If it has been longer than 60 days. Get a new refresh and authorization token.
-    # Else if it has been longer than 30 minutes, get only a new authorization token.
-    if (datetime.now() - refresh_timestamp > refresh_delta):
-        payload = {
-            "grant_type": "refresh_token",
-            "access_type": "offline",
-            "refresh_token": refresh_token,
-            "client_id": client_id
-        }
-        data, _ = request_data(url, payload, True)
-        if "access_token" not in data and "refresh_token" not in data:
-            raise ValueError(
-                "Refresh token is no longer valid. Call login_first_time() to get a new refresh token.")
-        access_token = data["access_token"]
-        refresh_token = data["refresh_token"]
-        with pickle_path.open("wb") as pickle_file:
-            pickle.dump(
-                {
-                    'authorization_token': cipher_suite.encrypt(access_token.encode()),
-                    'refresh_token': cipher_suite.encrypt(refresh_token.encode()),
-                    'client_id': cipher_suite.encrypt(client_id.encode()),
-                    'authorization_timestamp': datetime.now(),
-                    'refresh_timestamp': datetime.now()
-                }, pickle_file)
-    elif (datetime.now() - authorization_timestamp > authorization_delta):
-        payload = {
-            "grant_type": "refresh_token",
-            "refresh_token": refresh_token,
-            "client_id": client_id
-        }
-        data, _ = request_data(url, payload, True)
-        if "access_token" not in data:
-            raise ValueError(
-                "Refresh token is no longer valid. Call login_first_time() to get a new refresh token.")
-        access_token = data["access_token"]
-        # Write new data to file. Do not replace the refresh timestamp.
-        with pickle_path.open("wb") as pickle_file:
-            pickle.dump(
-                {
-                    'authorization_token': cipher_suite.encrypt(access_token.encode()),
-                    'refresh_token': cipher_suite.encrypt(refresh_token.encode()),
-                    'client_id': cipher_suite.encrypt(client_id.encode()),
-                    'authorization_timestamp': datetime.now(),
-                    'refresh_timestamp': refresh_timestamp
-                }, pickle_file)
-    # Store authorization token in session information to be used with API calls.
-    auth_token = "Bearer {0}".format(access_token)
-    update_session("Authorization", auth_token)
-    update_session("apikey", client_id)
-    set_login_state(True)
-    return auth_token
+    return TokenManager(encryption_passcode, refresh_margin=0).refresh()
 
 
 def generate_encryption_passcode():
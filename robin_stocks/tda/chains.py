@@ -0,0 +1,150 @@
+"""Contains a table that flattens the nested option chain returned by get_option_chains into columns."""
+from array import array
+from bisect import bisect_left, bisect_right
+
+# Each column of the table, the key of the contract it is read from, and the array typecode used to store it.
+# Columns without a typecode are stored as lists.
+COLUMNS = [
+    ("symbol", "symbol", None),
+    ("type", "putCall", None),
+    ("expiration", None, None),
+    ("days_to_expiration", "daysToExpiration", "q"),
+    ("strike", "strikePrice", "d"),
+    ("bid", "bid", "d"),
+    ("ask", "ask", "d"),
+    ("last", "last", "d"),
+    ("mark", "mark", "d"),
+    ("bid_size", "bidSize", "q"),
+    ("ask_size", "askSize", "q"),
+    ("volume", "totalVolume", "q"),
+    ("open_interest", "openInterest", "q"),
+    ("volatility", "volatility", "d"),
+    ("delta", "delta", "d"),
+    ("gamma", "gamma", "d"),
+    ("theta", "theta", "d"),
+    ("vega", "vega", "d"),
+    ("rho", "rho", "d"),
+    ("in_the_money", "inTheMoney", None),
+]
+NAN = float("nan")
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return NAN
+
+
+def to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+class OptionChainTable:
+    """ Holds every contract of an option chain as one row of a set of columns. Rows are sorted by expiration,
+        then type, then strike, and the start and end row of each expiration and type is indexed, so selecting
+        an expiration and a range of strikes is a dictionary lookup and two binary searches.
+
+    :param chain: The parsed response of get_option_chains.
+    :type chain: dict
+
+    """
+
+    def __init__(self, chain):
+        self.symbol = chain.get("symbol")
+        self.underlying_price = chain.get("underlyingPrice")
+        self.columns = {name: array(typecode) if typecode else [] for name, _, typecode in COLUMNS}
+        self.index = {}
+        converters = [(self.columns[name].append, key, to_float if typecode == "d" else to_int if typecode else None)
+                      for name, key, typecode in COLUMNS if key is not None]
+        append_expiration = self.columns["expiration"].append
+
+        maps = [(chain.get("callExpDateMap") or {}, "CALL"), (chain.get("putExpDateMap") or {}, "PUT")]
+        expirations = sorted(set(key for date_map, _ in maps for key in date_map))
+        for expiration_key in expirations:
+            expiration = expiration_key.split(":")[0]
+            for date_map, contract_type in maps:
+                strikes = date_map.get(expiration_key)
+                if not strikes:
+                    continue
+                start = len(self)
+                for strike in sorted(strikes, key=float):
+                    for contract in strikes[strike]:
+                        for append, key, convert in converters:
+                            value = contract.get(key)
+                            append(convert(value) if convert else value)
+                        append_expiration(expiration)
+                self.index[(expiration, contract_type)] = (start, len(self))
+
+    def __len__(self):
+        return len(self.columns["symbol"])
+
+    def expirations(self):
+        """ Returns the sorted expiration dates in the chain as yyyy-MM-dd strings.
+        """
+        return sorted(set(expiration for expiration, _ in self.index))
+
+    def strikes(self, expiration, contract_type="CALL"):
+        """ Returns the sorted strikes of one expiration and contract type.
+        """
+        start, stop = self.index.get((expiration, contract_type.upper()), (0, 0))
+        return sorted(set(self.columns["strike"][start:stop]))
+
+    def rows(self, expiration=None, contract_type=None, min_strike=None, max_strike=None):
+        """ Returns the row numbers of the contracts that match every filter that is given.
+
+        :param expiration: The expiration date as yyyy-MM-dd.
+        :type expiration: Optional[str]
+        :param contract_type: Either CALL or PUT.
+        :type contract_type: Optional[str]
+        :param min_strike: The lowest strike to include.
+        :type min_strike: Optional[float]
+        :param max_strike: The highest strike to include.
+        :type max_strike: Optional[float]
+        :returns: A list of row numbers in table order.
+
+        """
+        strikes = self.columns["strike"]
+        rows = []
+        for (row_expiration, row_type), (start, stop) in sorted(self.index.items(), key=lambda item: item[1]):
+            if expiration is not None and row_expiration != expiration:
+                continue
+            if contract_type is not None and row_type != contract_type.upper():
+                continue
+            if min_strike is not None:
+                start = bisect_left(strikes, min_strike, start, stop)
+            if max_strike is not None:
+                stop = bisect_right(strikes, max_strike, start, stop)
+            rows.extend(range(start, stop))
+        return rows
+
+    def select(self, expiration=None, contract_type=None, min_strike=None, max_strike=None, columns=None):
+        """ Returns the columns of the contracts that match every filter that is given. The filters are the same as for rows().
+
+        :param columns: The names of the columns to return. Default is every column.
+        :type columns: Optional[list]
+        :returns: A dictionary of lists, one for each column.
+
+        """
+        rows = self.rows(expiration, contract_type, min_strike, max_strike)
+        names = columns if columns is not None else [name for name, _, _ in COLUMNS]
+        return {name: [self.columns[name][row] for row in rows] for name in names}
+
+    def row(self, number):
+        """ Returns one contract as a dictionary of column names and values.
+        """
+        return {name: self.columns[name][number] for name, _, _ in COLUMNS}
+
+
+def normalize_option_chain(chain):
+    """ Flattens the parsed response of get_option_chains into an OptionChainTable in one pass over the contracts.
+
+    :param chain: The parsed response of get_option_chains.
+    :type chain: dict
+    :returns: An OptionChainTable.
+
+    """
+    return OptionChainTable(chain)
@@ -1,10 +1,14 @@
 """Holds the session header and other global variables."""
+import sys
+
 from requests import Session
 
 DATA_DIR_NAME = ".tokens"
 PICKLE_NAME = "tda.pickle"
 RETURN_PARSED_JSON_RESPONSE = False # Flag on whether to automatically parse request responses.
 LOGGED_IN = False  # Flag on whether or not the user is logged in.
+UNAUTHORIZED_HANDLER = None # Called to get a new token when a request is rejected with a 401 status.
+OUTPUT = sys.stdout # All print() statements direct their output to this stream.
 
 # The session object for making get and post requests.
 SESSION = Session()
@@ -2,10 +2,18 @@ from functools import wraps
 from inspect import signature
 from json import dumps
 from re import IGNORECASE, split
+from threading import Lock
 
 import requests
-from robin_stocks.tda.globals import (LOGGED_IN, RETURN_PARSED_JSON_RESPONSE,
-                                      SESSION)
+from requests.exceptions import HTTPError
+from robin_stocks.cache import get_response_cache
+from robin_stocks.decoding import decode_response
+from robin_stocks.tda.globals import (LOGGED_IN, OUTPUT,
+                                      RETURN_PARSED_JSON_RESPONSE, SESSION,
+                                      UNAUTHORIZED_HANDLER)
+
+# Held while the unauthorized handler gets a new token, so requests rejected at the same time share one refresh.
+UNAUTHORIZED_LOCK = Lock()
 
 
 def get_order_number(data):
@@ -30,13 +38,24 @@ def format_inputs(func):
         the value of jsonify=None will be replaced with the global value stored at 
         RETURN_PARSED_JSON_RESPONSE.
     """
+    # The signature is only inspected once, when the function is decorated.
+    parameters = list(signature(func).parameters.values())
+    names = [parameter.name for parameter in parameters]
+    if 'jsonify' not in names:
+        return(func)
+    position = names.index('jsonify')
+    default_is_none = parameters[position].default is None
+
     @wraps(func)
     def format_wrapper(*args, **kwargs):
-        bound_args = signature(func).bind(*args, **kwargs)
-        bound_args.apply_defaults()
-        target_args = dict(bound_args.arguments)
-        if target_args['jsonify'] is None:
-            kwargs["jsonify"] = get_default_json_flag()
+        if 'jsonify' in kwargs:
+            if kwargs['jsonify'] is None:
+                kwargs['jsonify'] = get_default_json_flag()
+        elif len(args) > position:
+            if args[position] is None:
+                args = args[:position] + (get_default_json_flag(),) + args[position + 1:]
+        elif default_is_none:
+            kwargs['jsonify'] = get_default_json_flag()
         return(func(*args, **kwargs))
     return(format_wrapper)
 
@@ -85,6 +104,60 @@ def get_login_state():
     return LOGGED_IN
 
 
+def set_output(output):
+    """ Sets the stream that messages are printed to.
+
+    :param output: Any stream that print() accepts, such as sys.stderr or io.StringIO().
+    :type output: file
+    """
+    global OUTPUT
+    OUTPUT = output
+
+
+def get_output():
+    """ Gets the stream that messages are printed to.
+    """
+    return OUTPUT
+
+
+def set_unauthorized_handler(handler):
+    """ Sets the function that is called to get a new token when a request is rejected with a 401 status.
+
+    :param handler: A function that updates the Authorization session header, or None to stop retrying.
+    :type handler: function or None
+    """
+    global UNAUTHORIZED_HANDLER
+    UNAUTHORIZED_HANDLER = handler
+
+
+def retry_unauthorized(response, *args, **kwargs):
+    """ A session response hook. When a request is rejected with a 401 status and an unauthorized handler is set, \
+    gets a new token and sends the request once more with the new Authorization header. The Authorization header \
+    is the token generation: if it changed since the request was sent, another request already got a new token \
+    and the handler is not called again. If no new token can be had, the 401 response is returned as it is.
+    """
+    handler = UNAUTHORIZED_HANDLER
+    if response.status_code != 401 or handler is None or getattr(response.request, "retried", False):
+        return response
+    with UNAUTHORIZED_LOCK:
+        if SESSION.headers.get("Authorization") == response.request.headers.get("Authorization"):
+            try:
+                handler()
+            except Exception:
+                return response
+    if "Authorization" not in SESSION.headers:
+        return response
+    request = response.request.copy()
+    request.headers["Authorization"] = SESSION.headers["Authorization"]
+    request.retried = True
+    retried = SESSION.send(request, **kwargs)
+    retried.history.insert(0, response)
+    return retried
+
+
+SESSION.hooks["response"].append(retry_unauthorized)
+
+
 def login_required(func):
     """ A decorator for indicating which methods require the user to be logged in.
     """
@@ -110,18 +183,35 @@ def request_get(url, payload, parse_json):
     :type parse_json: bool
     :returns: Returns a tuple where the first entry is the response and the second entry will be an error message from the \
         get request. If there was no error then the second entry in the tuple will be None. The first entry will either be \
-        the raw request response or the parsed JSON response based on whether parse_json is True or not.
+        the raw request response or the parsed JSON response based on whether parse_json is True or not, or None if the \
+        request could not be sent. Parsed responses are served from the cache set with robin_stocks.cache.set_response_cache() when there is one.
     """
+    cache = get_response_cache()
+    if parse_json and cache is not None:
+        try:
+            return cache.get_json(SESSION, url, payload), None
+        except HTTPError as e:
+            try:
+                return decode_response(e.response), e
+            except ValueError:
+                # The error body is not JSON, such as an html error page.
+                return None, e
+        except Exception as e:
+            return None, e
+    response = None
     response_error = None
     try:
         response = SESSION.get(url, params=payload)
         response.raise_for_status()
     except Exception as e:
         response_error = e
+    if response is None:
+        # The request was never answered, such as after a connection error.
+        return None, response_error
     # Return either the raw request object so you can call response.text, response.status_code, response.headers, or response.json()
     # or return the JSON parsed information if you don't care to check the status codes.
     if parse_json:
-        return response.json(), response_error
+        return decode_response(response), response_error
     else:
         return response, response_error
 
@@ -138,18 +228,23 @@ def request_post(url, payload, parse_json):
     :type parse_json: bool
     :returns: Returns a tuple where the first entry is the response and the second entry will be an error message from the \
         get request. If there was no error then the second entry in the tuple will be None. The first entry will either be \
-        the raw request response or the parsed JSON response based on whether parse_json is True or not.
+        the raw request response or the parsed JSON response based on whether parse_json is True or not, or None if the \
+        request could not be sent.
     """
+    response = None
     response_error = None
     try:
         response = SESSION.post(url, params=payload)
         response.raise_for_status()
     except Exception as e:
         response_error = e
+    if response is None:
+        # The request was never answered, such as after a connection error.
+        return None, response_error
     # Return either the raw request object so you can call response.text, response.status_code, response.headers, or response.json()
     # or return the JSON parsed information if you don't care to check the status codes.
     if parse_json:
-        return response.json(), response_error
+        return decode_response(response), response_error
     else:
         return response, response_error
 
@@ -166,18 +261,23 @@ def request_data(url, payload, parse_json):
     :type parse_json: bool
     :returns: Returns a tuple where the first entry is the response and the second entry will be an error message from the \
         get request. If there was no error then the second entry in the tuple will be None. The first entry will either be \
-        the raw request response or the parsed JSON response based on whether parse_json is True or not.
+        the raw request response or the parsed JSON response based on whether parse_json is True or not, or None if the \
+        request could not be sent.
     """
+    response = None
     response_error = None
     try:
         response = requests.post(url, data=payload)
         response.raise_for_status()
     except Exception as e:
         response_error = e
+    if response is None:
+        # The request was never answered, such as after a connection error.
+        return None, response_error
     # Return either the raw request object so you can call response.text, response.status_code, response.headers, or response.json()
     # or return the JSON parsed information if you don't care to check the status codes.
     if parse_json:
-        return response.json(), response_error
+        return decode_response(response), response_error
     else:
         return response, response_error
 
@@ -194,14 +294,19 @@ def request_headers(url, payload, parse_json):
     :type parse_json: bool
     :returns: Returns a tuple where the first entry is the response and the second entry will be an error message from the \
         get request. If there was no error then the second entry in the tuple will be None. The first entry will either be \
-        the raw request response or the parsed JSON response based on whether parse_json is True or not.
+        the raw request response or the parsed JSON response based on whether parse_json is True or not, or None if the \
+        request could not be sent.
     """
+    response = None
     response_error = None
     try:
         response = SESSION.post(url, data=dumps(payload))
         response.raise_for_status()
     except Exception as e:
         response_error = e
+    if response is None:
+        # The request was never answered, such as after a connection error.
+        return None, response_error
     # Return either the raw request object so you can call response.text, response.status_code, response.headers, or response.json()
     # or return the JSON parsed information if you don't care to check the status codes.
     if parse_json:
@@ -220,14 +325,19 @@ def request_delete(url, parse_json):
     :type parse_json: bool
     :returns: Returns a tuple where the first entry is the response and the second entry will be an error message from the \
         get request. If there was no error then the second entry in the tuple will be None. The first entry will either be \
-        the raw request response or the parsed JSON response based on whether parse_json is True or not.
+        the raw request response or the parsed JSON response based on whether parse_json is True or not, or None if the \
+        request could not be sent.
     """
+    response = None
     response_error = None
     try:
         response = SESSION.delete(url)
         response.raise_for_status()
     except Exception as e:
         response_error = e
+    if response is None:
+        # The request was never answered, such as after a connection error.
+        return None, response_error
     # Return either the raw request object so you can call response.text, response.status_code, response.headers, or response.json()
     # or return the JSON parsed information if you don't care to check the status codes.
     if parse_json:
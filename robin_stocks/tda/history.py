@@ -0,0 +1,208 @@
+"""Contains functions for downloading the price history of many stocks into a local columnar store.
+
+Each ticker and frequency is stored in its own directory with one binary file per column. The datetime column
+holds 64 bit integers and the price and volume columns hold 64 bit floats, so a column can be read with
+``array.array`` or ``numpy.fromfile`` without parsing. New candles are appended to the end of each column.
+"""
+import os
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from robin_stocks.tda.stocks import get_price_history
+
+COLUMNS = [("datetime", "q"), ("open", "d"), ("high", "d"), ("low", "d"), ("close", "d"), ("volume", "d")]
+# The period type to send with start and end dates for each frequency type.
+PERIOD_TYPES = {"minute": "day", "daily": "year", "weekly": "year", "monthly": "year"}
+# The longest range in days that one request returns in full for each frequency type.
+WINDOW_DAYS = {"minute": 10, "daily": 365 * 20, "weekly": 365 * 20, "monthly": 365 * 20}
+# How far back to start when a ticker has not been downloaded before.
+DEFAULT_START_DAYS = {"minute": 45, "daily": 365 * 20, "weekly": 365 * 20, "monthly": 365 * 20}
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+class RateLimiter:
+    """ Spaces out calls from any number of threads so that no more than calls_per_minute are made.
+
+    :param calls_per_minute: The maximum number of calls per minute. TD Ameritrade allows 120.
+    :type calls_per_minute: Optional[int]
+
+    """
+
+    def __init__(self, calls_per_minute=120):
+        self.interval = 60.0 / calls_per_minute
+        self.next_call = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        """ Blocks until the next call is allowed.
+        """
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_call)
+            self.next_call = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def split_date_range(start_date, end_date, frequency_type):
+    """ Splits a range of dates into windows that the price history endpoint returns in full.
+
+    :param start_date: The start of the range as milliseconds since epoch.
+    :type start_date: int
+    :param end_date: The end of the range as milliseconds since epoch.
+    :type end_date: int
+    :param frequency_type: Can be minute, daily, weekly, or monthly.
+    :type frequency_type: str
+    :returns: A list of (start_date, end_date) tuples in milliseconds since epoch.
+
+    """
+    window = WINDOW_DAYS[frequency_type] * DAY_MS
+    windows = []
+    while start_date <= end_date:
+        windows.append((start_date, min(start_date + window - 1, end_date)))
+        start_date += window
+    return windows
+
+
+def get_store_path(directory, ticker, frequency_type, frequency):
+    return os.path.join(directory, ticker.upper(), "{0}{1}".format(frequency, frequency_type))
+
+
+def load_price_history(ticker, directory, frequency_type="daily", frequency=1):
+    """ Reads the stored price history of a stock.
+
+    :param ticker: The stock ticker.
+    :type ticker: str
+    :param directory: The directory that download_price_history wrote to.
+    :type directory: str
+    :param frequency_type: Can be minute, daily, weekly, or monthly.
+    :type frequency_type: Optional[str]
+    :param frequency: The number of the frequency_type in each candle.
+    :type frequency: Optional[int]
+    :returns: A dictionary with an array for each of the datetime, open, high, low, close, and volume columns. \
+        Only rows that were written to every column are returned.
+
+    """
+    path = get_store_path(directory, ticker, frequency_type, frequency)
+    columns = {}
+    for name, typecode in COLUMNS:
+        column = array(typecode)
+        filename = os.path.join(path, name + ".bin")
+        if os.path.exists(filename):
+            with open(filename, "rb") as f:
+                column.frombytes(f.read())
+        columns[name] = column
+    rows = min(len(column) for column in columns.values())
+    return {name: column[:rows] for name, column in columns.items()}
+
+
+def append_candles(path, candles):
+    """ Appends candles to the column files. Columns that are longer than the others because an earlier \
+        write was interrupted are cut back first.
+    """
+    os.makedirs(path, exist_ok=True)
+    filenames = {name: os.path.join(path, name + ".bin") for name, _ in COLUMNS}
+    sizes = {name: os.path.getsize(filename) if os.path.exists(filename) else 0 for name, filename in filenames.items()}
+    rows = min(sizes[name] // array(typecode).itemsize for name, typecode in COLUMNS)
+    for name, typecode in COLUMNS:
+        column = array(typecode, [candle[name] for candle in candles])
+        with open(filenames[name], "ab") as f:
+            f.truncate(rows * column.itemsize)
+            f.write(column.tobytes())
+
+
+def download_price_history(ticker, directory, frequency_type="daily", frequency=1, start_date=None, end_date=None,
+                           needExtendedHoursData=True, rate_limiter=None):
+    """ Downloads the price history of a stock into the store, starting after the last stored candle. \
+        Long ranges are split into windows that the endpoint returns in full.
+
+    :param ticker: The stock ticker.
+    :type ticker: str
+    :param directory: The directory of the store.
+    :type directory: str
+    :param frequency_type: Can be minute, daily, weekly, or monthly.
+    :type frequency_type: Optional[str]
+    :param frequency: The number of the frequency_type in each candle.
+    :type frequency: Optional[int]
+    :param start_date: Start date as milliseconds since epoch. Only used when nothing is stored for the ticker yet.
+    :type start_date: Optional[int]
+    :param end_date: End date as milliseconds since epoch. Default is now.
+    :type end_date: Optional[int]
+    :param needExtendedHoursData: true to return extended hours data, false for regular market hours only.
+    :type needExtendedHoursData: Optional[bool]
+    :param rate_limiter: Shared with other downloads to stay under the rate limit.
+    :type rate_limiter: Optional[RateLimiter]
+    :returns: The number of candles that were added.
+    :raises: The error returned by get_price_history if a window could not be loaded. \
+        Candles from the windows before it are kept.
+
+    """
+    path = get_store_path(directory, ticker, frequency_type, frequency)
+    stored = load_price_history(ticker, directory, frequency_type, frequency)["datetime"]
+    if end_date is None:
+        end_date = int(time.time() * 1000)
+    if stored:
+        start_date = stored[-1] + 1
+    elif start_date is None:
+        start_date = end_date - DEFAULT_START_DAYS[frequency_type] * DAY_MS
+    last_datetime = stored[-1] if stored else None
+    added = 0
+    for window_start, window_end in split_date_range(start_date, end_date, frequency_type):
+        if rate_limiter:
+            rate_limiter.wait()
+        data, error = get_price_history(ticker, PERIOD_TYPES[frequency_type], frequency_type, frequency,
+                                        start_date=window_start, end_date=window_end,
+                                        needExtendedHoursData=needExtendedHoursData, jsonify=True)
+        if error:
+            raise error
+        candles = [candle for candle in data.get("candles", [])
+                   if last_datetime is None or candle["datetime"] > last_datetime]
+        if candles:
+            append_candles(path, candles)
+            last_datetime = candles[-1]["datetime"]
+            added += len(candles)
+    return added
+
+
+def download_price_histories(tickers, directory, frequency_type="daily", frequency=1, start_date=None, end_date=None,
+                             needExtendedHoursData=True, max_workers=4, calls_per_minute=120):
+    """ Downloads the price history of many stocks at the same time while staying under the rate limit.
+
+    :param tickers: The stock tickers.
+    :type tickers: list
+    :param directory: The directory of the store.
+    :type directory: str
+    :param frequency_type: Can be minute, daily, weekly, or monthly.
+    :type frequency_type: Optional[str]
+    :param frequency: The number of the frequency_type in each candle.
+    :type frequency: Optional[int]
+    :param start_date: Start date as milliseconds since epoch for tickers that have nothing stored yet.
+    :type start_date: Optional[int]
+    :param end_date: End date as milliseconds since epoch. Default is now.
+    :type end_date: Optional[int]
+    :param needExtendedHoursData: true to return extended hours data, false for regular market hours only.
+    :type needExtendedHoursData: Optional[bool]
+    :param max_workers: The number of tickers to download at the same time.
+    :type max_workers: Optional[int]
+    :param calls_per_minute: The maximum number of requests per minute across all workers.
+    :type calls_per_minute: Optional[int]
+    :returns: A tuple where the first entry is a dictionary of the number of candles added for each ticker \
+        and the second entry is a dictionary of the error for each ticker that failed.
+
+    """
+    rate_limiter = RateLimiter(calls_per_minute)
+    added = {}
+    errors = {}
+
+    def download(ticker):
+        try:
+            added[ticker] = download_price_history(ticker, directory, frequency_type, frequency, start_date, end_date,
+                                                   needExtendedHoursData, rate_limiter)
+        except Exception as e:
+            errors[ticker] = e
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(download, tickers))
+    return added, errors
@@ -1,6 +1,18 @@
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
 from robin_stocks.tda.helper import format_inputs, login_required, request_get
 from robin_stocks.tda.urls import URLS
 
+# Quotes loaded by get_quote_vectors, keyed by symbol, with the time they were loaded.
+QUOTE_CACHE = {}
+QUOTE_CACHE_LOCK = threading.Lock()
+# The name of each column returned by get_quote_vectors and the quote key it is read from.
+QUOTE_VECTOR_KEYS = [("bid", "bidPrice"), ("ask", "askPrice"), ("last", "lastPrice"), ("mark", "mark"),
+                     ("volume", "totalVolume")]
+
 
 @login_required
 @format_inputs
@@ -45,6 +57,63 @@ def get_quotes(tickers, jsonify=None):
     return data, error
 
 
+@login_required
+def get_quote_vectors(tickers, chunk_size=300, max_workers=4, max_age=None):
+    """ Gets quote information for any number of stocks. The tickers are split into chunks that are requested \
+    at the same time, and the quotes are returned as one list per field in the same order as tickers.
+
+    :param tickers: The stock tickers.
+    :type tickers: list
+    :param chunk_size: The number of tickers to send in each request.
+    :type chunk_size: Optional[int]
+    :param max_workers: The number of requests to send at the same time.
+    :type max_workers: Optional[int]
+    :param max_age: If set, quotes loaded less than this many seconds ago are reused instead of requested again, \
+        and the quotes that are loaded are kept for later calls. Without it the cache is neither read nor written.
+    :type max_age: Optional[float]
+    :returns: Returns a tuple where the first entry is a dictionary with a symbol list and bid, ask, last, mark, \
+        and volume arrays, and the second entry is a list of the errors from any chunk that failed. \
+        Values are NaN for tickers that were not returned.
+
+    """
+    tickers = [ticker.upper().strip() for ticker in tickers]
+    now = time.monotonic()
+    quotes = {}
+    if max_age is not None:
+        with QUOTE_CACHE_LOCK:
+            for ticker in tickers:
+                cached = QUOTE_CACHE.get(ticker)
+                if cached and now - cached[0] < max_age:
+                    quotes[ticker] = cached[1]
+    missing = list(dict.fromkeys(ticker for ticker in tickers if ticker not in quotes))
+    chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+    errors = []
+    if chunks:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+            results = list(executor.map(lambda chunk: get_quotes(",".join(chunk), jsonify=True), chunks))
+        for data, error in results:
+            if error:
+                errors.append(error)
+            else:
+                quotes.update(data)
+        # Only callers that read from the cache write to it, so it does not grow for the ones that never do.
+        if max_age is not None:
+            loaded_at = time.monotonic()
+            with QUOTE_CACHE_LOCK:
+                for data, error in results:
+                    if not error:
+                        QUOTE_CACHE.update((symbol, (loaded_at, quote)) for symbol, quote in data.items())
+
+    def value(ticker, key):
+        number = quotes.get(ticker, {}).get(key)
+        return float(number) if number is not None else float("nan")
+
+    vectors = {"symbol": tickers}
+    for name, key in QUOTE_VECTOR_KEYS:
+        vectors[name] = array("d", (value(ticker, key) for ticker in tickers))
+    return vectors, errors
+
+
 @login_required
 @format_inputs
 def get_price_history(ticker, period_type, frequency_type, frequency,
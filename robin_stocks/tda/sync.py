@@ -0,0 +1,260 @@
+"""Contains an incremental sync of account transactions and orders into a local sqlite database.
+
+Each sync splits the date range into windows, requests the windows at the same time, and upserts the results by
+transaction or order id. The end date of the last sync is kept as a high water mark, so the next sync only requests
+the days after it, plus a few days of overlap to pick up orders whose status changed. Only records that are new or
+changed are written and counted. Orders entered before the overlap that are still open in the store, such as good
+till cancelled orders, are requested one at a time so that a later fill or cancel is picked up.
+"""
+import json
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from robin_stocks.tda.accounts import get_transactions
+from robin_stocks.tda.orders import get_order, get_orders_for_account
+
+# The api only returns orders entered in the last 60 days.
+ORDER_HISTORY_DAYS = 60
+# Orders with these statuses do not change any more. Orders with any other status are requested again on each sync.
+FINAL_ORDER_STATUSES = {"REJECTED", "CANCELED", "REPLACED", "FILLED", "EXPIRED"}
+
+# The columns stored for each kind of record, and how each column is read from the api dictionary.
+TABLES = {
+    "transactions": {
+        "id": lambda item: str(item["transactionId"]),
+        "date": lambda item: item.get("transactionDate"),
+        "type": lambda item: item.get("type"),
+        "symbol": lambda item: item.get("transactionItem", {}).get("instrument", {}).get("symbol"),
+    },
+    "orders": {
+        "id": lambda item: str(item["orderId"]),
+        "date": lambda item: item.get("enteredTime"),
+        "type": lambda item: item.get("status"),
+        "symbol": lambda item: (item.get("orderLegCollection") or [{}])[0].get("instrument", {}).get("symbol"),
+    },
+}
+
+
+class SyncStore:
+    """ A sqlite database of transactions and orders for any number of accounts. Each record is stored as JSON
+        along with indexed id, date, type, and symbol columns. For orders the type column holds the status.
+
+    :param path: The path of the database file. Use ':memory:' for a database that is not saved.
+    :type path: str
+
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.connection:
+            for table in TABLES:
+                self.connection.execute(
+                    "CREATE TABLE IF NOT EXISTS {0} (account_id TEXT, id TEXT, date TEXT, type TEXT, symbol TEXT, "
+                    "data TEXT, PRIMARY KEY (account_id, id))".format(table))
+                self.connection.execute(
+                    "CREATE INDEX IF NOT EXISTS {0}_date ON {0} (account_id, date)".format(table))
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS sync_state (account_id TEXT, kind TEXT, high_water_mark TEXT, "
+                "PRIMARY KEY (account_id, kind))")
+
+    def upsert(self, table, account_id, items):
+        """ Inserts records, or replaces the stored records that have the same id. Records that are stored \
+            unchanged are not written again.
+
+        :returns: The number of records that were new or changed.
+        """
+        columns = TABLES[table]
+        items = {columns["id"](item): item for item in items}
+        ids = list(items)
+        with self.lock, self.connection:
+            stored = {}
+            # Stay below the sqlite limit on the number of parameters in one statement.
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                stored.update(self.connection.execute(
+                    "SELECT id, data FROM {0} WHERE account_id = ? AND id IN ({1})".format(
+                        table, ", ".join("?" * len(chunk))), [account_id] + chunk).fetchall())
+            rows = [(account_id, id_value, columns["date"](item), columns["type"](item), columns["symbol"](item),
+                     json.dumps(item)) for id_value, item in items.items()
+                    if id_value not in stored or json.loads(stored[id_value]) != item]
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO {0} VALUES (?, ?, ?, ?, ?, ?)".format(table), rows)
+        return len(rows)
+
+    def query(self, table, account_id, start_date=None, end_date=None, symbol=None, type_value=None):
+        """ Returns the stored records of an account, oldest first.
+
+        :param table: Either transactions or orders.
+        :type table: str
+        :param account_id: The account id.
+        :type account_id: str
+        :param start_date: Only return records on or after this date as yyyy-MM-dd.
+        :type start_date: Optional[str]
+        :param end_date: Only return records on or before this date as yyyy-MM-dd.
+        :type end_date: Optional[str]
+        :param symbol: Only return records for this symbol.
+        :type symbol: Optional[str]
+        :param type_value: Only return transactions of this type, or orders with this status.
+        :type type_value: Optional[str]
+        :returns: A list of dictionaries.
+
+        """
+        if table not in TABLES:
+            raise ValueError("The table must be transactions or orders.")
+        sql = "SELECT data FROM {0} WHERE account_id = ?".format(table)
+        parameters = [account_id]
+        for condition, value in [("date >= ?", start_date), ("date < ?", next_day(end_date) if end_date else None),
+                                 ("symbol = ?", symbol), ("type = ?", type_value)]:
+            if value is not None:
+                sql += " AND " + condition
+                parameters.append(value)
+        with self.lock:
+            rows = self.connection.execute(sql + " ORDER BY date, id", parameters).fetchall()
+        return [json.loads(data) for data, in rows]
+
+    def get_high_water_mark(self, account_id, kind):
+        """ Returns the end date of the last sync as yyyy-MM-dd, or None if the account has not been synced.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT high_water_mark FROM sync_state WHERE account_id = ? AND kind = ?", (account_id, kind)).fetchone()
+        return row[0] if row else None
+
+    def set_high_water_mark(self, account_id, kind, value):
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)", (account_id, kind, value))
+
+    def close(self):
+        self.connection.close()
+
+
+def next_day(value):
+    return (datetime.strptime(value, "%Y-%m-%d").date() + timedelta(days=1)).isoformat()
+
+
+def split_dates(start_date, end_date, window_days):
+    """ Splits the days from start_date to end_date into windows of at most window_days days.
+
+    :param start_date: The first day.
+    :type start_date: datetime.date
+    :param end_date: The last day.
+    :type end_date: datetime.date
+    :param window_days: The number of days in each window.
+    :type window_days: int
+    :returns: A list of (first day, last day) tuples as yyyy-MM-dd strings.
+
+    """
+    windows = []
+    while start_date <= end_date:
+        window_end = min(start_date + timedelta(days=window_days - 1), end_date)
+        windows.append((start_date.isoformat(), window_end.isoformat()))
+        start_date = window_end + timedelta(days=1)
+    return windows
+
+
+def sync_records(kind, fetch, account_id, store, start_date, end_date, window_days, max_workers, overlap_days,
+                 earliest_date=None, refresh=None):
+    end_date = end_date or date.today()
+    high_water_mark = store.get_high_water_mark(account_id, kind)
+    if high_water_mark:
+        start_date = datetime.strptime(high_water_mark, "%Y-%m-%d").date() - timedelta(days=overlap_days)
+    if earliest_date is not None:
+        start_date = max(start_date, earliest_date)
+    tasks = [lambda window=window: fetch(*window) for window in split_dates(start_date, end_date, window_days)]
+    if refresh is not None:
+        # Records stored before the first requested day that can still change.
+        tasks.extend(refresh(start_date))
+    if not tasks:
+        return 0
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(tasks))) as executor:
+        results = list(executor.map(lambda task: task(), tasks))
+    for _, error in results:
+        if error:
+            # Keep the high water mark where it was so the failed window is requested again next time.
+            raise error
+    count = 0
+    for data, _ in results:
+        count += store.upsert(kind, account_id, data or [])
+    store.set_high_water_mark(account_id, kind, end_date.isoformat())
+    return count
+
+
+def sync_transactions(account_id, store, start_date=None, end_date=None, window_days=90, max_workers=4,
+                      overlap_days=1):
+    """ Downloads the transactions of an account into the store. After the first sync, only the days since the \
+        last sync are requested.
+
+    :param account_id: The account id.
+    :type account_id: str
+    :param store: The store to write to.
+    :type store: SyncStore
+    :param start_date: The first day to sync when the account has not been synced before. Default is one year ago.
+    :type start_date: Optional[datetime.date]
+    :param end_date: The last day to sync. Default is today.
+    :type end_date: Optional[datetime.date]
+    :param window_days: The number of days requested at once. The api allows at most one year.
+    :type window_days: Optional[int]
+    :param max_workers: The number of windows to request at the same time.
+    :type max_workers: Optional[int]
+    :param overlap_days: The number of days before the high water mark to request again.
+    :type overlap_days: Optional[int]
+    :returns: The number of transactions that were new or changed.
+    :raises: The error returned by get_transactions if a window could not be loaded. Nothing is written in that case.
+
+    """
+    if start_date is None:
+        start_date = date.today() - timedelta(days=365)
+
+    def fetch(window_start, window_end):
+        return get_transactions(account_id, "ALL", start_date=window_start, end_date=window_end, jsonify=True)
+
+    return sync_records("transactions", fetch, account_id, store, start_date, end_date, window_days, max_workers,
+                        overlap_days)
+
+
+def sync_orders(account_id, store, start_date=None, end_date=None, window_days=15, max_workers=4, overlap_days=7):
+    """ Downloads the orders of an account into the store. After the first sync, only the days since the last sync \
+        are requested, along with overlap_days before it so that orders which were filled or cancelled since are updated.
+
+    :param account_id: The account id.
+    :type account_id: str
+    :param store: The store to write to.
+    :type store: SyncStore
+    :param start_date: The first day to sync when the account has not been synced before. Default is 60 days ago, \
+        which is as far back as the api returns orders. Earlier days, including the overlap, are never requested.
+    :type start_date: Optional[datetime.date]
+    :param end_date: The last day to sync. Default is today.
+    :type end_date: Optional[datetime.date]
+    :param window_days: The number of days requested at once.
+    :type window_days: Optional[int]
+    :param max_workers: The number of windows to request at the same time.
+    :type max_workers: Optional[int]
+    :param overlap_days: The number of days before the high water mark to request again.
+    :type overlap_days: Optional[int]
+    :returns: The number of orders that were new or changed. Open orders in the store that were entered before the \
+        requested days are requested again by id and counted when their status changed.
+    :raises: The error returned by get_orders_for_account if a window could not be loaded. Nothing is written in that case.
+
+    """
+    earliest_date = date.today() - timedelta(days=ORDER_HISTORY_DAYS)
+    if start_date is None:
+        start_date = earliest_date
+
+    def fetch(window_start, window_end):
+        return get_orders_for_account(account_id, from_time=window_start, to_time=window_end, jsonify=True)
+
+    def fetch_order(order_id):
+        data, error = get_order(account_id, order_id, jsonify=True)
+        return [data] if data and not error else [], error
+
+    def refresh(first_day):
+        open_orders = [order for order in store.query("orders", account_id,
+                                                      end_date=(first_day - timedelta(days=1)).isoformat())
+                       if order.get("status") not in FINAL_ORDER_STATUSES]
+        return [lambda order_id=str(order["orderId"]): fetch_order(order_id) for order in open_orders]
+
+    return sync_records("orders", fetch, account_id, store, start_date, end_date, window_days, max_workers,
+                        overlap_days, earliest_date, refresh)
@@ -0,0 +1,247 @@
+# Runs without credentials or a connection to the brokers. Robinhood responses are recorded from a local
+# MockRobinhoodServer and tda responses from a stub adapter into one cassette file, and the library functions
+# are timed while the cassette is replayed. The dividend index is timed on a synthetic history, without requests.
+import datetime
+import json
+import os
+import statistics
+import sys
+import time
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+import robin_stocks.gemini as g
+import robin_stocks.robinhood as r
+import robin_stocks.tda as t
+from robin_stocks.replay import Cassette, ReplayAdapter, use_cassette
+from robin_stocks.robinhood.mockserver import (INTERVAL_SECONDS, SPAN_SECONDS,
+                                               MockData, MockRobinhoodServer)
+
+SYMBOLS = ['SYM{0}'.format(i) for i in range(25)]
+ORDER_PAGES = 20
+ORDERS_PER_PAGE = 100
+HISTORICAL_DAYS = SPAN_SECONDS['5year'] // INTERVAL_SECONDS['day']
+
+
+def synthetic_dividends(count, instruments):
+    """Builds a dividend history newest first, the order the api returns it in, spread over the instruments."""
+    dividends = []
+    for i in range(count):
+        day = datetime.date(2024, 12, 31) - datetime.timedelta(days=i // 100)
+        dividends.append({'id': str(i), 'instrument': instruments[i % len(instruments)],
+                          'amount': '{0:.2f}'.format(1 + i % 7), 'rate': '0.{0:02d}'.format(i % 100),
+                          'state': 'paid' if i % 5 else 'pending', 'payable_date': day.isoformat()})
+    return dividends
+
+
+def tda_routes(path, query):
+    if path == '/v1/marketdata/quotes':
+        return {symbol: {'symbol': symbol, 'bidPrice': 119.9, 'askPrice': 120.1, 'lastPrice': 120.0, 'mark': 120.0,
+                         'totalVolume': 1000000} for symbol in query['symbol'].split(',')}
+    if path == '/v1/marketdata/chains':
+        def contract(expiration, contract_type, strike):
+            return {'symbol': '{0}_{1}{2}{3}'.format(query['symbol'], expiration, contract_type[0], strike),
+                    'putCall': contract_type, 'bid': 1.0, 'ask': 1.1, 'last': 1.05, 'mark': 1.05, 'bidSize': 10,
+                    'askSize': 12, 'totalVolume': 100, 'openInterest': 1000, 'volatility': 30.5, 'delta': 0.5,
+                    'gamma': 0.01, 'theta': -0.05, 'vega': 0.1, 'rho': 0.01, 'strikePrice': strike,
+                    'daysToExpiration': 7, 'inTheMoney': False}
+        expirations = ['2021-{0:02d}-15:{1}'.format(month, month * 30) for month in range(1, 13)]
+        strikes = [50.0 + 2.5 * i for i in range(80)]
+        return {'symbol': query['symbol'], 'underlyingPrice': 120.0,
+                'callExpDateMap': {expiration: {str(strike): [contract(expiration, 'CALL', strike)]
+                                                for strike in strikes} for expiration in expirations},
+                'putExpDateMap': {expiration: {str(strike): [contract(expiration, 'PUT', strike)]
+                                               for strike in strikes} for expiration in expirations}}
+    return None
+
+
+class StubAdapter(BaseAdapter):
+    """Answers tda requests with generated payloads the way the api would. MockRobinhoodServer only imitates
+    Robinhood, so tda is stubbed here."""
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        data = tda_routes(parts.path, dict(parse_qsl(parts.query)))
+        response = requests.Response()
+        response.status_code = 200 if data is not None else 404
+        response.headers['Content-Type'] = 'application/json'
+        response._content = json.dumps(data).encode()
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def run_benchmark(name, cassette, function, rounds=3):
+    """Calls function a few times and prints its latency and the number of responses replayed per second.
+    Pass None as the cassette to time a function that sends no requests."""
+    timings = []
+    result = None
+    for _ in range(rounds):
+        if cassette is not None:
+            cassette.rewind()
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    median = statistics.median(timings)
+    if cassette is None:
+        print('{0}: median {1:.1f} ms, min {2:.1f} ms'.format(name, median * 1000, min(timings) * 1000))
+        return result, median
+    requests_per_call = sum(cassette.positions.values())
+    print('{0}: median {1:.1f} ms, min {2:.1f} ms, {3} requests, {4:.0f} requests/s'.format(
+        name, median * 1000, min(timings) * 1000, requests_per_call, requests_per_call / median))
+    return result
+
+
+@pytest.fixture(scope='module')
+def mock_server():
+    data = MockData(SYMBOLS, orders=ORDER_PAGES * ORDERS_PER_PAGE)
+    with MockRobinhoodServer(data=data, page_size=ORDERS_PER_PAGE, seed=0) as server:
+        yield server
+
+
+@pytest.fixture(scope='module')
+def cassette_path(tmp_path_factory, mock_server):
+    path = str(tmp_path_factory.mktemp('cassettes') / 'brokers.json')
+    output = open(os.devnull, 'w')
+    r.set_output(output)
+    r.set_base_url(mock_server.url)
+    r.helper.set_login_state(True)
+    t.helper.set_login_state(True)
+    recording = Cassette(path)
+    with use_cassette(recording, mode='record', sessions=[r.helper.SESSION]):
+        r.get_all_stock_orders()
+        r.build_holdings()
+        r.get_stock_historicals(SYMBOLS[:10], 'day', '5year')
+        for item in mock_server.data.instruments.values():
+            r.get_symbol_by_url('{0}/instruments/{1}/'.format(mock_server.url, item['id']))
+    with use_cassette(recording, mode='record', sessions=[t.helper.SESSION], adapter=StubAdapter()):
+        t.get_option_chains('SYM0', strike_count='', jsonify=True)
+        t.get_quote_vectors(['T{0}'.format(i) for i in range(1500)])
+    yield path
+    r.helper.set_login_state(False)
+    t.helper.set_login_state(False)
+    r.set_base_url(None)
+    r.set_output(sys.stdout)
+    output.close()
+
+
+@pytest.fixture()
+def cassette(cassette_path, mock_server):
+    # The requests were recorded on the mock server's url, so they are sent there to be matched.
+    r.set_base_url(mock_server.url)
+    with use_cassette(cassette_path) as cassette:
+        yield cassette
+
+
+class TestReplay:
+
+    def test_recorded_cassette_round_trips(self, cassette, mock_server):
+        assert len(cassette) > ORDER_PAGES
+        assert cassette.next_response('GET', mock_server.url + '/portfolios/')['status_code'] == 200
+        reloaded = Cassette.load(cassette.path)
+        assert len(reloaded) == len(cassette)
+
+    def test_unrecorded_request_raises(self, cassette):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            r.helper.SESSION.get('https://api.robinhood.com/markets/')
+
+    def test_query_order_and_repeats(self):
+        cassette = Cassette()
+        cassette.add_json('GET', 'https://api.robinhood.com/quotes/', {'n': 1}, params={'b': '2', 'a': '1'})
+        cassette.add_json('GET', 'https://api.robinhood.com/quotes/', {'n': 2}, params={'a': '1', 'b': '2'})
+        session = requests.Session()
+        with use_cassette(cassette, sessions=[session]):
+            responses = [session.get('https://api.robinhood.com/quotes/?a=1&b=2').json() for _ in range(3)]
+        assert responses == [{'n': 1}, {'n': 2}, {'n': 2}]
+        assert isinstance(session.get_adapter('https://api.robinhood.com/'), requests.adapters.HTTPAdapter)
+
+    def test_signed_gemini_request_replays(self, monkeypatch):
+        import base64
+        url = 'https://api.gemini.com/v1/balances'
+        cassette = Cassette()
+        cassette.add_json('POST', url, [{'currency': 'BTC', 'amount': '1'}],
+                          params={'request': '/v1/balances', 'nonce': '1600000000000'})
+        monkeypatch.setattr(g.helper, 'SIGNER', g.authentication.RequestSigner('key', base64.b64encode(b'secret')))
+        with use_cassette(cassette):
+            for _ in range(2):
+                payload = {'request': '/v1/balances'}
+                headers = g.authentication.generate_signature(payload)
+                data, error = g.helper.request_post(url, payload, True, headers=headers)
+                assert (data, error) == ([{'currency': 'BTC', 'amount': '1'}], None)
+                assert payload['nonce'] != '1600000000000'
+
+    def test_set_base_url_does_not_bypass_the_cassette(self):
+        cassette = Cassette()
+        cassette.add_json('GET', 'http://127.0.0.1:9/markets/', {'results': [{'mic': 'XNYS'}], 'next': None})
+        r.set_base_url('http://127.0.0.1:9')
+        try:
+            with use_cassette(cassette, sessions=[r.helper.SESSION]):
+                assert r.helper.SESSION.get('https://api.robinhood.com/markets/').json()['results'] == [{'mic': 'XNYS'}]
+                assert r.helper.SESSION.get('http://127.0.0.1:9/markets/').json()['results'] == [{'mic': 'XNYS'}]
+        finally:
+            r.set_base_url(None)
+
+    def test_adapter_mode(self):
+        with pytest.raises(ValueError):
+            ReplayAdapter(Cassette(), mode='live')
+
+
+class TestBenchmarks:
+
+    def test_pagination(self, cassette):
+        orders = run_benchmark('get_all_stock_orders', cassette, r.get_all_stock_orders)
+        assert len(orders) == ORDER_PAGES * ORDERS_PER_PAGE
+
+    def test_holdings(self, cassette):
+        holdings = run_benchmark('build_holdings', cassette, r.build_holdings)
+        assert sorted(holdings) == sorted(SYMBOLS)
+        assert holdings['SYM3']['pe_ratio'] == '25.000000'
+
+    def test_historicals(self, cassette):
+        data = run_benchmark('get_stock_historicals 5year', cassette,
+                             lambda: r.get_stock_historicals(SYMBOLS[:10], 'day', '5year'))
+        assert len(data) == 10 * HISTORICAL_DAYS
+
+    def test_export(self, cassette, tmp_path, mock_server):
+        run_benchmark('export_completed_stock_orders', cassette,
+                      lambda: r.export_completed_stock_orders(str(tmp_path)))
+        with open(next(tmp_path.glob('stock_orders_*.csv'))) as f:
+            rows = f.read().splitlines()
+        assert len(rows) == 1 + sum(order['state'] == 'filled' for order in mock_server.data.orders)
+
+    def test_option_chain(self, cassette):
+        def load_chain():
+            data, error = t.get_option_chains('SYM0', strike_count='', jsonify=True)
+            return t.normalize_option_chain(data)
+        table = run_benchmark('get_option_chains and normalize_option_chain', cassette, load_chain)
+        assert len(table) == 12 * 80 * 2
+
+    def test_dividend_index(self, monkeypatch):
+        monkeypatch.setattr(r.helper, 'LOGGED_IN', True)
+        instruments = ['https://api.robinhood.com/instruments/{0}/'.format(i) for i in range(500)]
+        dividends = synthetic_dividends(50000, instruments)
+
+        def lookup_in_list():
+            return [r.get_dividends_by_instrument(url, dividends) for url in instruments]
+        scanned, scan_time = run_benchmark('get_dividends_by_instrument on the list, 50k rows', None, lookup_in_list,
+                                           rounds=1)
+
+        def lookup_with_index():
+            index = r.build_dividend_index(dividends)
+            return [r.get_dividends_by_instrument(url, index) for url in instruments]
+        indexed, index_time = run_benchmark('build_dividend_index and get_dividends_by_instrument, 50k rows', None,
+                                            lookup_with_index)
+        assert indexed == scanned
+        assert index_time < scan_time
+
+    def test_quote_scanner(self, cassette):
+        tickers = ['T{0}'.format(i) for i in range(1500)]
+        vectors, errors = run_benchmark('get_quote_vectors', cassette, lambda: t.get_quote_vectors(tickers))
+        assert errors == []
+        assert len(vectors['last']) == 1500 and vectors['last'][1499] == 120.0
@@ -1,3 +1,4 @@
+import json
 import os
 
 import robin_stocks.gemini as g
@@ -83,3 +84,258 @@ class TestAccount:
         response, err = g.get_account_detail()
         assert err == None
         assert response.status_code == 200
+
+
+class TestBatchMarketData:
+
+    class FakeResponse:
+        def __init__(self, data):
+            self.data = data
+            self.encoding = None
+            self.content = json.dumps(data).encode()
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return self.data
+
+    def test_pubtickers_are_fetched_concurrently(self, monkeypatch):
+        import math
+        import threading
+        import time
+        import requests
+        tickers = ['PAIR{0}USD'.format(i) for i in range(32)]
+        lock = threading.Lock()
+        in_flight = [0, 0]
+
+        def fake_get(url, params=None, **kwargs):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+            ticker = url.rsplit('/', 1)[-1]
+            if ticker == 'PAIR3USD':
+                raise requests.exceptions.ConnectionError('connection refused')
+            return self.FakeResponse({'bid': '1.5', 'ask': ticker[4:-3] + '.25'})
+
+        monkeypatch.setattr(g.helper.SESSION, 'get', fake_get)
+        prices = g.get_prices(tickers, 'buy')
+        assert in_flight[1] > 1
+        assert prices.typecode == 'd' and len(prices) == len(tickers)
+        assert prices[0] == 0.25 and prices[31] == 31.25
+        assert math.isnan(prices[3])
+        data, errors = g.get_pubtickers(tickers[:5], jsonify=True)
+        assert data[3] is None and isinstance(errors[3], requests.exceptions.ConnectionError)
+        assert errors[:3] == [None, None, None] and data[4] == {'bid': '1.5', 'ask': '4.25'}
+
+    def test_symbol_details_are_cached(self, monkeypatch):
+        requested = []
+
+        def fake_get(url, params=None, **kwargs):
+            requested.append(url)
+            return self.FakeResponse({'symbol': url.rsplit('/', 1)[-1].upper()})
+
+        monkeypatch.setattr(g.helper.SESSION, 'get', fake_get)
+        monkeypatch.setattr(g.crypto, 'SYMBOL_DETAILS', {})
+        first = g.load_symbol_details(['btcusd', 'ethusd'])
+        second = g.load_symbol_details(['btcusd', 'ethusd', 'ltcusd'])
+        assert first == {'btcusd': {'symbol': 'BTCUSD'}, 'ethusd': {'symbol': 'ETHUSD'}}
+        assert second['ltcusd'] == {'symbol': 'LTCUSD'}
+        assert len(requested) == 3
+
+
+class TestTradeHistory:
+
+    @staticmethod
+    def fake_exchange(monkeypatch, trades):
+        requests = []
+
+        def fake_post(url, payload, parse_json, headers=None):
+            # Like Gemini, the newest trades are returned when there is no timestamp, newest first.
+            requests.append(payload.get('timestamp'))
+            if 'timestamp' in payload:
+                page = [trade for trade in trades if trade['timestampms'] >= payload['timestamp']]
+                page = page[:payload['limit_trades']]
+            else:
+                page = trades[-payload['limit_trades']:]
+            return list(reversed(page)), None
+
+        monkeypatch.setattr(g.helper, 'LOGGED_IN', True)
+        monkeypatch.setattr(g.orders, 'generate_signature', lambda payload: {})
+        monkeypatch.setattr(g.orders, 'request_post', fake_post)
+        return requests
+
+    def test_pages_skip_boundary_duplicates(self, monkeypatch):
+        # Three trades share each millisecond, so every page boundary repeats trades.
+        trades = [{'tid': tid, 'timestampms': 1000 + tid // 3} for tid in range(1, 101)]
+        requests = self.fake_exchange(monkeypatch, trades)
+        result = list(g.iterate_trades_for_crypto('btcusd', limit_trades=10))
+        assert [trade['tid'] for trade in result] == list(range(1, 101))
+        assert requests[0] == 0 and len(requests) > 10
+
+    def test_timestamp_zero_is_sent(self, monkeypatch):
+        trades = [{'tid': tid, 'timestampms': 1000 + tid} for tid in range(1, 21)]
+        requests = self.fake_exchange(monkeypatch, trades)
+        data, err = g.get_trades_for_crypto('btcusd', 5, jsonify=True)
+        assert [trade['tid'] for trade in data] == [20, 19, 18, 17, 16]
+        data, err = g.get_trades_for_crypto('btcusd', 5, 0, jsonify=True)
+        assert [trade['tid'] for trade in data] == [5, 4, 3, 2, 1]
+        assert requests == [None, 0]
+
+    def test_download_resumes_after_last_tid(self, monkeypatch, tmp_path):
+        trades = [{'tid': tid, 'timestampms': 1000 + tid} for tid in range(1, 51)]
+        self.fake_exchange(monkeypatch, trades[:30])
+        filename = str(tmp_path / 'trades.jsonl')
+        assert g.download_trades_for_crypto('btcusd', filename, limit_trades=7) == 30
+        with open(filename, 'a') as f:
+            f.write('{"tid": 3')
+        self.fake_exchange(monkeypatch, trades)
+        assert g.download_trades_for_crypto('btcusd', filename, limit_trades=7) == 20
+        with open(filename) as f:
+            assert [json.loads(line)['tid'] for line in f] == list(range(1, 51))
+
+
+class TestRequestSigner:
+
+    def test_signature_and_nonce(self):
+        import base64
+        import hashlib
+        import hmac
+        signer = g.RequestSigner('account-key', b'secret')
+        nonces = []
+        for _ in range(1000):
+            payload = {'request': '/v1/mytrades', 'symbol': 'btcusd'}
+            headers = signer.sign(payload)
+            nonces.append(int(payload['nonce']))
+        assert all(later > earlier for earlier, later in zip(nonces, nonces[1:]))
+        assert json.loads(base64.b64decode(headers['X-GEMINI-PAYLOAD'])) == payload
+        expected = hmac.new(b'secret', headers['X-GEMINI-PAYLOAD'], hashlib.sha384).hexdigest()
+        assert headers['X-GEMINI-SIGNATURE'] == expected
+        assert headers['X-GEMINI-APIKEY'] == 'account-key'
+
+    def test_signatures_per_second(self):
+        import base64
+        import hashlib
+        import hmac
+        import time
+        import zlib
+        stored_secret = base64.urlsafe_b64encode(zlib.compress(b'secret' * 8, 9))
+
+        def sign_with_stored_secret(payload):
+            secret = zlib.decompress(base64.urlsafe_b64decode(stored_secret))
+            payload['nonce'] = str(time.time_ns() // 1000000)
+            b64 = base64.b64encode(json.dumps(payload).encode())
+            return hmac.new(secret, b64, hashlib.sha384).hexdigest()
+
+        signer = g.RequestSigner('account-key', b'secret' * 8)
+        rates = []
+        for sign in (sign_with_stored_secret, signer.sign):
+            start = time.perf_counter()
+            for _ in range(20000):
+                sign({'request': '/v1/order/new', 'symbol': 'btcusd', 'amount': '1', 'price': '100'})
+            rates.append(20000 / (time.perf_counter() - start))
+        assert rates[1] > rates[0]
+
+
+class TestOrderBook:
+
+    # Messages recorded from the v2 market data websocket, trimmed to a few price levels.
+    recorded_messages = [
+        '{"type":"l2_updates","symbol":"BTCUSD","changes":[["buy","9122.04","0.00121425"],["buy","9122.00","0.5"],'
+        '["buy","9121.50","2.1"],["sell","9122.07","0.98942292"],["sell","9122.10","1.2"],["sell","9123.00","3"]],'
+        '"trades":[{"type":"trade","symbol":"BTCUSD","event_id":169841458,"timestamp":1560976400428,'
+        '"price":"9122.04","quantity":"0.0073173","side":"sell"}],"auction_events":[]}',
+        '{"type":"heartbeat","timestamp":1560976401000}',
+        '{"type":"l2_updates","symbol":"BTCUSD","changes":[["buy","9122.04","0"],["sell","9122.05","0.25"]]}',
+        '{"type":"trade","symbol":"BTCUSD","event_id":169841460,"timestamp":1560976402112,"price":"9122.05",'
+        '"quantity":"0.1","side":"buy"}',
+        '{"type":"trade","symbol":"BTCUSD","event_id":169841460,"timestamp":1560976402112,"price":"9122.05",'
+        '"quantity":"0.1","side":"buy"}',
+        '{"type":"l2_updates","symbol":"BTCUSD","changes":[["sell","9122.05","0.15"],["buy","9121.50","0"]]}',
+        ''
+    ]
+
+    def test_replay_recorded_messages(self):
+        from decimal import Decimal
+        book = g.OrderBook('btcusd').replay(self.recorded_messages)
+        assert book.best_bid() == (Decimal('9122.00'), Decimal('0.5'))
+        assert book.best_ask() == (Decimal('9122.05'), Decimal('0.15'))
+        assert book.spread() == Decimal('0.05')
+        assert [price for price, _ in book.depth(3)['asks']] == [Decimal('9122.05'), Decimal('9122.07'), Decimal('9122.10')]
+        assert len(book.bids) == 1
+        assert [trade['event_id'] for trade in book.trades] == [169841458, 169841460]
+
+    def test_snapshot_replaces_book(self):
+        from decimal import Decimal
+        book = g.OrderBook('btcusd').replay(self.recorded_messages)
+        book.load_snapshot({'bids': [{'price': '100', 'amount': '1', 'timestamp': '1'}],
+                            'asks': [{'price': '101', 'amount': '2', 'timestamp': '1'}]})
+        assert book.depth() == {'bids': [(Decimal('100'), Decimal('1'))], 'asks': [(Decimal('101'), Decimal('2'))]}
+
+    def test_first_l2_message_is_a_snapshot(self):
+        from decimal import Decimal
+        book = g.OrderBook('btcusd')
+        book.load_snapshot({'bids': [{'price': '100', 'amount': '1'}], 'asks': [{'price': '99999', 'amount': '2'}]})
+        book.replay(self.recorded_messages[:1])
+        assert book.best_bid() == (Decimal('9122.04'), Decimal('0.00121425'))
+        assert book.best_ask() == (Decimal('9122.07'), Decimal('0.98942292'))
+        assert len(book.bids) == 3 and len(book.asks) == 3
+        book.apply_message(self.recorded_messages[2])
+        assert len(book.bids) == 2 and len(book.asks) == 4
+        book.reset_stream()
+        book.apply_message(self.recorded_messages[2])
+        assert book.depth() == {'bids': [], 'asks': [(Decimal('9122.05'), Decimal('0.25'))]}
+
+    def test_other_symbols_are_ignored(self):
+        from decimal import Decimal
+        book = g.OrderBook('btcusd').replay(self.recorded_messages[:1])
+        book.apply_message('{"type":"l2_updates","symbol":"ETHUSD","changes":[["buy","9500","1"],["sell","200","1"]],'
+                           '"trades":[{"type":"trade","symbol":"ETHUSD","event_id":1,"price":"200","quantity":"1"}]}')
+        book.apply_message('{"type":"trade","symbol":"ETHUSD","event_id":2,"price":"200","quantity":"1"}')
+        assert book.best_bid() == (Decimal('9122.04'), Decimal('0.00121425'))
+        assert book.best_ask() == (Decimal('9122.07'), Decimal('0.98942292'))
+        assert [trade['event_id'] for trade in book.trades] == [169841458]
+
+    def test_v1_initial_update_replaces_book(self):
+        from decimal import Decimal
+        book = g.OrderBook('btcusd')
+        book.load_snapshot({'bids': [{'price': '100', 'amount': '1'}], 'asks': [{'price': '99999', 'amount': '2'}]})
+        book.apply_message({'type': 'update', 'eventId': 5585929, 'socket_sequence': 0, 'events': [
+            {'type': 'change', 'reason': 'initial', 'side': 'bid', 'price': '9122.04', 'remaining': '0.5'},
+            {'type': 'change', 'reason': 'initial', 'side': 'ask', 'price': '9122.07', 'remaining': '1'}]})
+        assert book.depth() == {'bids': [(Decimal('9122.04'), Decimal('0.5'))],
+                                'asks': [(Decimal('9122.07'), Decimal('1'))]}
+        book.apply_message({'type': 'update', 'eventId': 5585930, 'socket_sequence': 1, 'events': [
+            {'type': 'change', 'reason': 'place', 'side': 'bid', 'price': '9122.00', 'remaining': '2'}]})
+        assert len(book.bids) == 2 and len(book.asks) == 1
+
+    def test_rest_and_websocket_trades_are_deduplicated_separately(self):
+        book = g.OrderBook('btcusd')
+        for trade in [{'tid': 9000000000}, {'tid': 9000000000}, {'event_id': 169841458}, {'event_id': 169841458},
+                      {'tid': 9000000001}, {'event_id': 169841460}]:
+            book.add_trade(trade)
+        assert list(book.trades) == [{'tid': 9000000000}, {'event_id': 169841458}, {'tid': 9000000001},
+                                     {'event_id': 169841460}]
+
+    def test_levels_match_sorted_order(self):
+        import random
+        from decimal import Decimal
+        generator = random.Random(7)
+        book = g.OrderBook('btcusd')
+        expected = {}
+        for _ in range(5000):
+            price = Decimal(generator.randrange(900, 1100))
+            amount = Decimal(generator.choice([0, 0, 1, 2, 3]))
+            book.update('buy', price, amount)
+            if amount:
+                expected[price] = amount
+            else:
+                expected.pop(price, None)
+            best = max(expected) if expected else None
+            assert book.best_bid() == ((best, expected[best]) if expected else None)
+        assert book.bids.top() == sorted(expected.items(), reverse=True)
+        assert book.bids.top(5) == sorted(expected.items(), reverse=True)[:5]
+        assert len(book.bids.heap) <= 2 * len(expected) + 65
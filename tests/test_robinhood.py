@@ -1,6 +1,10 @@
 # Used by git Actions
 import os
 import datetime
+import io
+import json
+import time
+
 import robin_stocks.robinhood as r
 import pyotp
 import pytest
@@ -874,4 +878,934 @@ class TestAccountInformation:
             assert isFloat(interest['amount']['amount'])
             assert ('direction' in interest)
             assert ('payout_type' in interest)
-            assert ('reason' in interest)
\ No newline at end of file
+            assert ('reason' in interest)
+
+class FakeDocumentResponse:
+
+    def __init__(self, body, status_code=200, fail_after=None):
+        self.body = body
+        self.status_code = status_code
+        self.headers = {'Content-Length': str(len(body))}
+        self.fail_after = fail_after
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.body), 2):
+            if self.fail_after is not None and i >= self.fail_after:
+                raise ConnectionError('connection reset')
+            yield self.body[i:i + 2]
+
+    def close(self):
+        pass
+
+
+class FakeDocumentSession:
+    """Serves documents by url and answers Range requests with 206 responses."""
+
+    def __init__(self, documents, fail_after=None):
+        self.documents = documents
+        self.fail_after = fail_after
+        self.ranges = []
+
+    def get(self, url, params=None, stream=False, headers=None):
+        body = self.documents[url]
+        if headers and 'Range' in headers:
+            self.ranges.append(headers['Range'])
+            start = int(headers['Range'][len('bytes='):-1])
+            return FakeDocumentResponse(body[start:], status_code=206)
+        return FakeDocumentResponse(body, fail_after=self.fail_after)
+
+
+class TestDocuments:
+
+    url = 'https://api.robinhood.com/documents/abc/download/'
+
+    def test_interrupted_stream_resumes_with_range(self, monkeypatch, tmp_path):
+        filename = str(tmp_path / 'statement.pdf')
+        session = FakeDocumentSession({self.url: b'0123456789'}, fail_after=4)
+        monkeypatch.setattr(r.helper, 'SESSION', session)
+        monkeypatch.setattr(r.helper, 'OUTPUT', io.StringIO())
+        assert r.stream_document_to_file(self.url, filename) == ('failed', 4)
+        assert open(filename + '.part', 'rb').read() == b'0123'
+
+        assert r.stream_document_to_file(self.url, filename) == ('downloaded', 6)
+        assert session.ranges == ['bytes=4-']
+        assert open(filename, 'rb').read() == b'0123456789'
+        assert not os.path.exists(filename + '.part')
+
+    def test_existing_file_is_skipped(self, monkeypatch, tmp_path):
+        filename = tmp_path / 'statement.pdf'
+        filename.write_bytes(b'0123456789')
+        monkeypatch.setattr(r.helper, 'SESSION', FakeDocumentSession({self.url: b'9876543210'}))
+        assert r.stream_document_to_file(self.url, str(filename)) == ('skipped', 0)
+        assert filename.read_bytes() == b'0123456789'
+
+    def test_download_all_documents(self, monkeypatch, tmp_path):
+        documents = [{'id': str(i), 'type': 'account_statement' if i % 2 else 'trade_confirm',
+                      'created_at': '2024-01-0{0}T00:00:00Z'.format(i + 1),
+                      'download_url': 'https://api.robinhood.com/documents/{0}/download/'.format(i)}
+                     for i in range(6)]
+        monkeypatch.setattr(r.helper, 'LOGGED_IN', True)
+        monkeypatch.setattr(r.helper, 'OUTPUT', io.StringIO())
+        monkeypatch.setattr(r.helper, 'SESSION', FakeDocumentSession(
+            {item['download_url']: item['id'].encode() * 100 for item in documents}))
+        monkeypatch.setattr(r.account, 'get_documents', lambda: documents)
+        assert r.download_all_documents('account_statement', str(tmp_path), max_workers=3) == documents
+        assert sorted(path.name for path in tmp_path.iterdir()) == [
+            '2024-01-02-account_statement-1.pdf', '2024-01-04-account_statement-3.pdf',
+            '2024-01-06-account_statement-5.pdf']
+        assert (tmp_path / '2024-01-04-account_statement-3.pdf').read_bytes() == b'3' * 100
+
+
+class TestDividendIndex:
+
+    instruments = ['https://api.robinhood.com/instruments/{0}/'.format(i) for i in range(500)]
+
+    @classmethod
+    def setup_class(cls):
+        # Newest payments first, the same order the api returns them in.
+        cls.dividends = []
+        for i in range(50000):
+            day = datetime.date(2024, 12, 31) - datetime.timedelta(days=i // 100)
+            cls.dividends.append({
+                'id': str(i),
+                'instrument': cls.instruments[i % len(cls.instruments)],
+                'amount': '{0:.2f}'.format(1 + (i % 7)),
+                'rate': '0.{0:02d}'.format(i % 100),
+                'state': 'paid' if i % 5 else 'pending',
+                'payable_date': day.isoformat()
+            })
+        r.helper.set_login_state(True)
+
+    @classmethod
+    def teardown_class(cls):
+        r.helper.set_login_state(False)
+
+    def test_matches_list_lookup(self):
+        index = r.build_dividend_index(self.dividends)
+        for instrument in self.instruments[:25]:
+            assert r.get_dividends_by_instrument(instrument, index) == \
+                r.get_dividends_by_instrument(instrument, self.dividends)
+        assert r.get_dividends_by_instrument('missing', index) is None
+
+    def test_time_buckets(self):
+        index = r.build_dividend_index(self.dividends)
+        paid = sum(float(d['amount']) for d in self.dividends if d['state'] == 'paid')
+        assert abs(index['total_paid'] - paid) < 1e-6
+        assert abs(sum(index['yearly'].values()) - paid) < 1e-6
+        assert abs(sum(index['monthly'].values()) - paid) < 1e-6
+
+    def test_incremental_update(self):
+        index = r.build_dividend_index(self.dividends[1000:])
+        r.update_dividend_index(index, self.dividends)
+        full = r.build_dividend_index(self.dividends)
+        assert index['payments'] == full['payments']
+        assert abs(index['total_paid'] - full['total_paid']) < 1e-6
+        for instrument in self.instruments:
+            assert index['instruments'][instrument]['dividend_rate'] == \
+                full['instruments'][instrument]['dividend_rate']
+
+    def test_pending_payment_is_counted_when_paid(self):
+        pending = dict(self.dividends[0], state='pending')
+        index = r.build_dividend_index([pending] + self.dividends[1:])
+        r.update_dividend_index(index, [dict(pending, state='reinvested')] + self.dividends[1:])
+        full = r.build_dividend_index([dict(pending, state='reinvested')] + self.dividends[1:])
+        assert index['payments'] == full['payments']
+        assert abs(index['total_paid'] - full['total_paid']) < 1e-6
+        month = pending['payable_date'][0:7]
+        assert abs(index['monthly'][month] - full['monthly'][month]) < 1e-6
+        assert abs(index['yearly']['2024'] - full['yearly']['2024']) < 1e-6
+        entry = index['instruments'][pending['instrument']]
+        assert entry == full['instruments'][pending['instrument']]
+
+    def test_logout_clears_cached_index(self, monkeypatch):
+        monkeypatch.setattr(r.account, 'get_dividends', lambda: self.dividends[:10])
+        monkeypatch.setattr(r.helper, 'OUTPUT', io.StringIO())
+        assert r.get_dividend_index()['payments']
+        monkeypatch.setattr(r.authentication, 'print', lambda *args, **kwargs: None, raising=False)
+        r.logout()
+        assert r.account.DIVIDEND_INDEX is None
+        r.helper.set_login_state(True)
+
+
+class TestAnalytics:
+
+    positions = [
+        {'symbol': 'AAPL', 'quantity': '10.0000', 'average_buy_price': '100.0000'},
+        {'symbol': 'F', 'quantity': '100.0000', 'average_buy_price': '12.0000'}
+    ]
+    quotes = [
+        {'symbol': 'AAPL', 'last_trade_price': '110.00', 'last_extended_hours_trade_price': None,
+         'previous_close': '105.00', 'adjusted_previous_close': '105.00'},
+        {'symbol': 'F', 'last_trade_price': '11.00', 'last_extended_hours_trade_price': '11.50',
+         'previous_close': '12.00', 'adjusted_previous_close': '12.00'}
+    ]
+    fundamentals = [{'symbol': 'AAPL', 'sector': 'Electronic Technology'},
+                    {'symbol': 'F', 'sector': 'Consumer Durables'}]
+
+    def test_position_pnl(self):
+        pnl = r.calculate_position_pnl(self.positions, self.quotes)
+        assert pnl[0]['unrealized_pnl'] == 100.0
+        assert pnl[0]['daily_pnl'] == 50.0
+        assert pnl[1]['price'] == 11.5
+        total = r.calculate_portfolio_pnl(pnl)
+        assert total['market_value'] == 2250.0
+        assert total['cost_basis'] == 2200.0
+
+    def test_sector_exposure(self):
+        pnl = r.calculate_position_pnl(self.positions, self.quotes)
+        exposure = r.calculate_sector_exposure(pnl, self.fundamentals)
+        assert abs(sum(exposure.values()) - 100.0) < 1e-9
+        assert abs(exposure['Consumer Durables'] - 1150 * 100 / 2250) < 1e-9
+
+    def test_returns(self):
+        assert abs(r.calculate_time_weighted_return([100, 110, 231], [0, 0, 100]) - 0.21) < 1e-9
+        rate = r.calculate_money_weighted_return([1000], ['2023-01-01'], 1100, '2024-01-01')
+        assert abs(rate - 0.1) < 1e-3
+
+    def test_equity_curve(self):
+        orders = [{'symbol': 'AAPL', 'side': 'buy', 'fees': '0.00', 'executions': [
+            {'timestamp': '2024-01-02T15:00:00Z', 'quantity': '10', 'price': '100.00'}]}]
+        historicals = [{'symbol': 'AAPL', 'begins_at': '2024-01-02T{0}:00:00Z'.format(hour), 'close_price': price}
+                       for hour, price in [(14, '99.00'), (15, '101.00'), (16, '103.00')]]
+        curve = r.build_equity_curve(orders, historicals, starting_cash=1000)
+        assert [point['equity'] for point in curve] == [1000.0, 1010.0, 1030.0]
+        curve = r.build_equity_curve(orders, historicals, starting_cash=1000, interval=1800,
+                                     start='2024-01-02T15:00:00Z')
+        assert [point['market_value'] for point in curve] == [1010.0, 1010.0, 1030.0]
+
+    def test_equity_curve_resolves_instruments_once(self, monkeypatch):
+        calls = []
+
+        def fake_symbols(urls):
+            calls.append(list(urls))
+            return {url: 'AAPL' for url in urls}
+        monkeypatch.setattr(r.analytics, 'get_symbols_by_urls', fake_symbols)
+        instrument = 'https://api.robinhood.com/instruments/450dfc6d/'
+        orders = [{'instrument': instrument, 'side': 'buy', 'fees': '0.00', 'executions': [
+            {'timestamp': '2024-01-02T15:00:0{0}Z'.format(i), 'quantity': '1', 'price': '100.00'}]}
+            for i in range(5)]
+        historicals = [{'symbol': 'AAPL', 'begins_at': '2024-01-02T16:00:00Z', 'close_price': '110.00'}]
+        curve = r.build_equity_curve(orders, historicals, starting_cash=1000)
+        assert len(calls) == 1
+        assert curve[-1]['market_value'] == 550.0
+        assert r.build_equity_curve([], [], interval=60) == []
+
+    def test_equity_curve_skips_unknown_instruments(self, monkeypatch):
+        monkeypatch.setattr(r.analytics, 'get_symbols_by_urls', lambda urls: {url: None for url in urls})
+        output = io.StringIO()
+        monkeypatch.setattr(r.helper, 'OUTPUT', output)
+        orders = [{'instrument': 'https://api.robinhood.com/instruments/gone/', 'side': 'buy', 'fees': '0.00',
+                   'executions': [{'timestamp': '2024-01-02T15:00:00Z', 'quantity': '1', 'price': '100.00'}]}]
+        historicals = [{'symbol': 'AAPL', 'begins_at': '2024-01-02T16:00:00Z', 'close_price': '110.00'}]
+        curve = r.build_equity_curve(orders, historicals, starting_cash=1000)
+        assert [(point['cash'], point['market_value']) for point in curve] == [(1000.0, 0.0)]
+        assert 'instruments/gone/' in output.getvalue()
+
+    def test_parse_timestamp(self):
+        import datetime
+        expected = datetime.datetime(2024, 1, 2, 15, 0, 0, 120000, tzinfo=datetime.timezone.utc)
+        for value in ['2024-01-02T15:00:00.12Z', '2024-01-02T15:00:00.12000+00:00', '2024-01-02T15:00:00.1200009Z',
+                      '2024-01-02T15:00:00.12+0000']:
+            assert r.analytics.parse_timestamp(value) == expected, value
+        assert r.analytics.parse_timestamp('2024-01-02T15:00:00Z') == expected.replace(microsecond=0)
+        assert r.analytics.parse_timestamp('2024-01-02T10:00:00-05:00') == expected.replace(microsecond=0)
+
+    def test_symbols_by_urls_are_batched(self, monkeypatch):
+        requests_sent = []
+
+        def fake_request_get(url, dataType='regular', payload=None, jsonify_data=True):
+            ids = payload['ids'].split(',')
+            requests_sent.append(len(ids))
+            return [{'id': id, 'symbol': 'SYM' + id} for id in ids if id != '7']
+        monkeypatch.setattr(r.stocks, 'request_get', fake_request_get)
+        monkeypatch.setattr(r.stocks, 'INSTRUMENT_CACHE', {})
+        urls = ['https://api.robinhood.com/instruments/{0}/'.format(i) for i in range(120)]
+        symbols = r.get_symbols_by_urls(urls + urls[:10])
+        assert requests_sent == [50, 50, 20]
+        assert len(symbols) == 119 and urls[7] not in symbols
+        assert symbols[urls[42]] == 'SYM42'
+        assert r.stocks.INSTRUMENT_CACHE['SYM42']['id'] == '42'
+
+
+class TestQuoteService:
+
+    @pytest.fixture()
+    def requests_sent(self, monkeypatch):
+        requests_sent = []
+
+        def fake_request_get(url, dataType='regular', payload=None, jsonify_data=True):
+            symbols = payload['symbols'].split(',')
+            requests_sent.append(sorted(symbols))
+            return [{'symbol': symbol, 'last_trade_price': '1.00'} for symbol in symbols]
+        monkeypatch.setattr(r.stocks, 'request_get', fake_request_get)
+        return requests_sent
+
+    def test_polling_batches_due_symbols(self, requests_sent):
+        service = r.QuoteService(interval=60, batch_size=2)
+        received = []
+        service.subscribe(['AAPL', 'F', 'MSFT', 'SPY', 'TSLA'], callback=received.append)
+        service.poll()
+        assert service.request_count == 3
+        assert sorted(quote['symbol'] for quote in received) == ['AAPL', 'F', 'MSFT', 'SPY', 'TSLA']
+        service.poll()
+        assert service.request_count == 3
+        assert service.get_quote('f')['symbol'] == 'F'
+
+    def test_fan_out_survives_failing_callback(self, requests_sent, monkeypatch):
+        output = io.StringIO()
+        monkeypatch.setattr(r.helper, 'OUTPUT', output)
+        service = r.QuoteService(interval=60)
+        first, second = [], []
+
+        def fail(quote):
+            raise RuntimeError('subscriber failed')
+        service.subscribe('AAPL', callback=fail)
+        service.subscribe('AAPL', callback=first.append)
+        queued = service.subscribe(['AAPL', 'F'])
+        service.subscribe('F', callback=second.append)
+        service.poll()
+        assert requests_sent == [['AAPL', 'F']]
+        assert [quote['symbol'] for quote in first] == ['AAPL']
+        assert [quote['symbol'] for quote in second] == ['F']
+        assert sorted([queued.get(timeout=1)['symbol'], queued.get(timeout=1)['symbol']]) == ['AAPL', 'F']
+        assert 'subscriber failed' in output.getvalue()
+
+    def test_iteration_ends_on_unsubscribe(self, requests_sent):
+        service = r.QuoteService(interval=60)
+        subscription = service.subscribe(['AAPL', 'F'])
+        service.poll()
+        subscription.unsubscribe()
+        assert sorted(quote['symbol'] for quote in subscription) == ['AAPL', 'F']
+        assert subscription.get(timeout=1) is None
+        service.poll()
+        assert subscription.queue.qsize() == 1
+
+    def test_async_iteration_ends_on_stop(self, requests_sent):
+        import asyncio
+        import threading
+        service = r.QuoteService(interval=0.05)
+        subscription = service.subscribe('AAPL')
+        service.start()
+
+        async def consume():
+            return [quote async for quote in subscription]
+        timer = threading.Timer(0.3, service.stop)
+        timer.start()
+        quotes = asyncio.run(consume())
+        timer.join()
+        assert quotes and all(quote['symbol'] == 'AAPL' for quote in quotes)
+        assert service.subscriptions == [] and service.thread is None
+
+
+class TestRequestCoalescing:
+
+    class SlowResponse:
+        encoding = None
+        content = b'{"results": [{"symbol": "AAPL"}]}'
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return json.loads(self.content)
+
+    def test_identical_requests_share_one_call(self, monkeypatch):
+        import threading
+        import time
+        calls = []
+
+        def slow_get(url, params=None, **kwargs):
+            calls.append(url)
+            time.sleep(0.2)
+            return self.SlowResponse()
+
+        monkeypatch.setattr(r.helper.SESSION, 'get', slow_get)
+        before = r.get_coalescing_stats()
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(
+            r.request_get('https://api.robinhood.com/quotes/', 'results', {'symbols': 'AAPL'})))
+            for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        after = r.get_coalescing_stats()
+
+        assert len(calls) == 1
+        assert results == [[{'symbol': 'AAPL'}]] * 10
+        assert len(set(id(result) for result in results)) == 10
+        assert after['coalesced'] - before['coalesced'] == 9
+
+    def test_failure_is_shared_with_waiting_callers(self, monkeypatch):
+        import threading
+        import requests
+        calls = []
+
+        def failing_get(url, params=None, **kwargs):
+            calls.append(url)
+            # Fail only once the second caller is waiting on this request.
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline and not any(
+                    inflight['waiters'] for inflight in list(r.helper.INFLIGHT_REQUESTS.values())):
+                time.sleep(0.005)
+            raise requests.exceptions.ConnectionError('connection refused')
+
+        monkeypatch.setattr(r.helper.SESSION, 'get', failing_get)
+        errors = []
+
+        def call():
+            try:
+                r.request_get('https://api.robinhood.com/quotes/', 'results', {'symbols': 'MSFT'})
+            except requests.exceptions.ConnectionError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(calls) == 1
+        assert len(errors) == 2 and errors[0] is errors[1]
+        assert r.helper.INFLIGHT_REQUESTS == {}
+
+
+class TestResponseCache:
+
+    class FakeResponse:
+        def __init__(self, status_code, data=None, headers=None):
+            self.status_code = status_code
+            self.data = data
+            self.headers = headers or {}
+            self.encoding = None
+            self.content = json.dumps(data).encode()
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return self.data
+
+    def test_ttl_and_revalidation(self, monkeypatch, tmp_path):
+        from robin_stocks.cache import (DiskCacheBackend, ResponseCache,
+                                        set_response_cache)
+        sent = []
+
+        def fake_get(url, params=None, headers=None, **kwargs):
+            sent.append(headers)
+            if headers and headers.get('If-None-Match') == '"v1"':
+                return self.FakeResponse(304)
+            return self.FakeResponse(200, {'results': [{'mic': 'XNYS'}]}, {'ETag': '"v1"'})
+
+        monkeypatch.setattr(r.helper.SESSION, 'get', fake_get)
+        cache = ResponseCache(DiskCacheBackend(str(tmp_path)))
+        set_response_cache(cache)
+        try:
+            url = 'https://api.robinhood.com/markets/'
+            assert r.request_get(url, 'results') == [{'mic': 'XNYS'}]
+            assert r.request_get(url, 'results') == [{'mic': 'XNYS'}]
+            assert len(sent) == 1
+            cache.policies = [(cache.policies[0][0], 0)]
+            assert r.request_get(url, 'results') == [{'mic': 'XNYS'}]
+            assert sent[-1] == {'If-None-Match': '"v1"'}
+            stats = cache.stats()
+            assert (stats['hits'], stats['misses'], stats['revalidations']) == (1, 1, 1)
+        finally:
+            set_response_cache(None)
+
+    def test_policies_follow_the_base_url(self):
+        from robin_stocks.cache import ResponseCache
+        cache = ResponseCache()
+        r.set_base_url('http://127.0.0.1:9000')
+        try:
+            assert cache.ttl_for('http://127.0.0.1:9000/markets/') == 86400
+            assert cache.ttl_for('http://127.0.0.1:9000/currency_pairs/') == 86400
+            assert cache.ttl_for('http://127.0.0.1:9000/quotes/') is None
+        finally:
+            r.set_base_url(None)
+        assert cache.ttl_for('http://127.0.0.1:9000/markets/') is None
+        assert cache.ttl_for('https://api.robinhood.com/markets/') == 86400
+
+    def test_non_json_error_is_returned(self, monkeypatch):
+        import requests
+        import robin_stocks.gemini as g
+        import robin_stocks.tda as t
+        from robin_stocks.cache import ResponseCache, set_response_cache
+
+        def fake_get(url, params=None, headers=None, **kwargs):
+            response = requests.Response()
+            response.status_code = 502
+            response._content = b'<html>Bad Gateway</html>'
+            response.url = url
+            return response
+
+        for session in (t.helper.SESSION, g.helper.SESSION):
+            monkeypatch.setattr(session, 'get', fake_get)
+        set_response_cache(ResponseCache())
+        try:
+            for request_get in (t.request_get, g.request_get):
+                data, error = request_get('https://api.tdameritrade.com/v1/marketdata/hours', None, True)
+                assert data is None and error.response.status_code == 502
+        finally:
+            set_response_cache(None)
+
+    def test_memory_backend_eviction(self):
+        from robin_stocks.cache import MemoryCacheBackend
+        backend = MemoryCacheBackend(max_entries=2)
+        backend.set('a', 1)
+        backend.set('b', 2)
+        backend.get('a')
+        backend.set('c', 3)
+        assert backend.get('b') is None
+        assert backend.get('a') == 1
+
+
+class TestDecoding:
+
+    @staticmethod
+    def historicals_payload(symbols=20, points=1260):
+        return json.dumps({'results': [{
+            'symbol': 'SYM{0}'.format(i),
+            'interval': 'day',
+            'historicals': [{
+                'begins_at': '2020-01-01T00:00:00Z',
+                'open_price': '{0:.6f}'.format(100 + j / 7),
+                'close_price': '{0:.6f}'.format(100 + j / 9),
+                'high_price': '{0:.6f}'.format(101 + j / 7),
+                'low_price': '{0:.6f}'.format(99 + j / 7),
+                'volume': j * 100,
+                'session': 'reg',
+                'interpolated': False
+            } for j in range(points)]
+        } for i in range(symbols)]}).encode()
+
+    def test_installed_decoders_agree(self):
+        from robin_stocks.decoding import (DECODER_MODULES, decode_json,
+                                           get_json_decoder, load_decoder,
+                                           set_json_decoder)
+        payload = self.historicals_payload()
+        expected = json.loads(payload)
+        selected = get_json_decoder()
+        try:
+            for name in DECODER_MODULES:
+                if load_decoder(name) is None:
+                    continue
+                set_json_decoder(name)
+                assert decode_json(payload) == expected
+        finally:
+            set_json_decoder(selected)
+        with pytest.raises(ValueError):
+            set_json_decoder('yaml')
+
+    def test_nan_is_parsed_by_json_module(self, monkeypatch):
+        import math
+        import requests
+        from robin_stocks import decoding
+        calls = []
+
+        def fast_decoder(content):
+            calls.append(content)
+            return json.loads(content)
+        monkeypatch.setattr(decoding, 'JSON_DECODER_NAME', 'orjson')
+        monkeypatch.setattr(decoding, 'JSON_DECODER', fast_decoder)
+        response = requests.Response()
+        response._content = b'{"delta": NaN, "gamma": -Infinity}'
+        response.encoding = None
+        data = decoding.decode_response(response)
+        assert math.isnan(data['delta']) and data['gamma'] == float('-inf')
+        assert calls == []
+        assert decoding.decode_json('{"delta": 0.5}') == {'delta': 0.5}
+        assert calls == ['{"delta": 0.5}']
+
+    def test_convert_numbers(self):
+        from decimal import Decimal
+        from robin_stocks.decoding import convert_numbers
+        data = {'id': '8f92e76f', 'account_number': '5RY82436',
+                'results': [{'price': '12.3400', 'quantity': '3', 'cost': '-1.50'}]}
+        convert_numbers(data, keys=['price', 'quantity'], number_type=Decimal)
+        assert data['results'][0] == {'price': Decimal('12.3400'), 'quantity': '3', 'cost': '-1.50'}
+        convert_numbers(data)
+        assert data['results'][0]['cost'] == -1.5
+        assert data['id'] == '8f92e76f'
+
+
+class TestRecords:
+
+    @staticmethod
+    def order(i):
+        return {
+            'id': 'order-{0}'.format(i), 'ref_id': 'ref-{0}'.format(i), 'url': 'https://api.robinhood.com/orders/{0}/'.format(i),
+            'account': 'https://api.robinhood.com/accounts/5RY82436/', 'position': None, 'cancel': None,
+            'instrument': 'https://api.robinhood.com/instruments/450dfc6d/', 'instrument_id': '450dfc6d',
+            'cumulative_quantity': '2.00000000', 'average_price': '{0:.8f}'.format(100 + i / 100), 'fees': '0.00',
+            'state': 'filled', 'type': 'market', 'side': 'buy', 'time_in_force': 'gfd', 'trigger': 'immediate',
+            'price': '101.00000000', 'stop_price': None, 'quantity': '2.00000000', 'reject_reason': None,
+            'created_at': '2021-01-04T14:30:00.000000Z', 'updated_at': '2021-01-04T14:30:01.000000Z',
+            'last_transaction_at': '2021-01-04T14:30:01.000000Z', 'extended_hours': False,
+            'executions': [{'id': 'execution-{0}'.format(i), 'price': '100.50000000', 'quantity': '2.00000000',
+                            'settlement_date': '2021-01-06', 'timestamp': '2021-01-04T14:30:01.000000Z'}]
+        }
+
+    def test_lazy_conversion_and_filter_data(self):
+        record = r.to_records(self.order(1), r.OrderRecord)
+        assert record._average_price == '100.01000000'
+        assert record.average_price == 100.01
+        assert record._average_price == 100.01
+        assert record.executions[0].price == 100.5
+        assert record.stop_price is None
+        assert r.filter_data(record, 'state') == 'filled'
+        records = r.to_records([self.order(i) for i in range(3)], r.OrderRecord)
+        assert r.filter_data(records, 'id') == ['order-0', 'order-1', 'order-2']
+        extra = r.to_records(dict(self.order(1), dollar_based_amount=None), r.OrderRecord)
+        assert 'dollar_based_amount' in extra and extra['dollar_based_amount'] is None
+        assert extra.to_dict()['executions'][0]['quantity'] == 2.0
+
+    def test_memory_against_dicts(self):
+        import tracemalloc
+        rows = 20000
+        tracemalloc.start()
+        dicts = [self.order(i) for i in range(rows)]
+        dict_size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        tracemalloc.start()
+        records = [r.OrderRecord(self.order(i)) for i in range(rows)]
+        record_size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        assert len(dicts) == len(records)
+        assert record_size < dict_size * 0.8, (record_size, dict_size)
+
+
+class TestCryptoBatch:
+
+    class FakeResponse:
+        def __init__(self, data):
+            self.data = data
+            self.encoding = None
+            self.content = json.dumps(data).encode()
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return self.data
+
+    symbols = ['BTC', 'ETH', 'DOGE', 'LTC', 'BCH', 'ETC', 'BSV', 'XLM']
+
+    def fake_get(self, calls, delay):
+        import threading
+        lock = threading.Lock()
+        pairs = [{'id': 'pair-' + symbol, 'symbol': symbol + '-USD', 'asset_currency': {'code': symbol}}
+                 for symbol in self.symbols]
+
+        def get(url, params=None, **kwargs):
+            with lock:
+                calls.append(url)
+            if url.endswith('/currency_pairs/'):
+                return self.FakeResponse({'results': pairs, 'next': None})
+            time.sleep(delay)
+            id = url.rstrip('/').split('/')[-1]
+            symbol = id.split('-')[1] + 'USD'
+            if '/historicals/' in url:
+                return self.FakeResponse({'symbol': symbol, 'data_points': [{'begins_at': '2021-01-04T00:00:00Z'}]})
+            return self.FakeResponse({'id': id, 'symbol': symbol, 'mark_price': '1.0'})
+        return get
+
+    def test_quotes_use_cached_pairs_and_run_concurrently(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(r.helper.SESSION, 'get', self.fake_get(calls, 0.1))
+        monkeypatch.setattr(r.helper, 'LOGGED_IN', True)
+        r.load_currency_pair_index(refresh=True)
+        calls.clear()
+
+        start = time.perf_counter()
+        quotes = r.get_crypto_quotes(self.symbols + ['AAPL'])
+        elapsed = time.perf_counter() - start
+        assert [quote['symbol'] for quote in quotes] == [symbol + 'USD' for symbol in self.symbols]
+        assert len(calls) == len(self.symbols)
+        assert not any(url.endswith('/currency_pairs/') for url in calls)
+        assert elapsed < 0.1 * len(self.symbols) / 2
+        assert r.get_crypto_quotes(['BTC', 'ETH'], info='id') == ['pair-BTC', 'pair-ETH']
+        assert r.get_crypto_quote('BTC', info='mark_price') == '1.0'
+        assert r.get_crypto_quote('AAPL') is None
+
+    def test_historicals_for_many_symbols(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(r.helper.SESSION, 'get', self.fake_get(calls, 0.0))
+        monkeypatch.setattr(r.helper, 'LOGGED_IN', True)
+        r.load_currency_pair_index(refresh=True)
+        calls.clear()
+
+        data = r.get_crypto_historicals(['btc', 'ETH', 'DOGE'], 'day', 'week')
+        assert [point['symbol'] for point in data] == ['BTCUSD', 'ETHUSD', 'DOGEUSD']
+        assert len(calls) == 3
+        assert r.get_crypto_historicals('BTC', 'day', 'week', info='symbol') == ['BTCUSD']
+        assert r.get_crypto_ids(['ETH', 'FAKE']) == ['pair-ETH', None]
+
+    def test_pair_index_is_requested_again_when_old(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(r.helper.SESSION, 'get', self.fake_get(calls, 0.0))
+        r.load_currency_pair_index(refresh=True)
+        assert r.get_crypto_info('BTC', info='id') == 'pair-BTC'
+        assert len(calls) == 1
+        monkeypatch.setattr(r.crypto, 'CURRENCY_PAIR_INDEX_LOADED_AT', time.monotonic() - 3601)
+        assert r.get_crypto_info('BTC', info='id') == 'pair-BTC'
+        assert len(calls) == 2
+        r.load_currency_pair_index(max_age=0)
+        assert len(calls) == 3
+
+    def test_refresh_never_hides_pairs_from_readers(self, monkeypatch):
+        import sys
+        import threading
+        pairs = [{'id': 'pair-' + symbol, 'asset_currency': {'code': symbol}} for symbol in self.symbols]
+        monkeypatch.setattr(r.crypto, 'request_get', lambda url, dataType='regular': pairs)
+        r.load_currency_pair_index(refresh=True)
+        done = threading.Event()
+        missing = []
+
+        def read():
+            while not done.is_set():
+                missing.extend(id for id in r.get_crypto_ids(self.symbols) if id is None)
+
+        interval = sys.getswitchinterval()
+        # Switch threads as often as possible so that the reader runs in the middle of a refresh.
+        sys.setswitchinterval(1e-6)
+        reader = threading.Thread(target=read)
+        reader.start()
+        try:
+            for _ in range(2000):
+                r.load_currency_pair_index(refresh=True)
+        finally:
+            done.set()
+            reader.join()
+            sys.setswitchinterval(interval)
+        assert missing == []
+
+
+class TestMarketData:
+
+    def patch_venues(self, monkeypatch):
+        from robin_stocks import marketdata
+        monkeypatch.setattr(marketdata.robinhood_stocks, 'get_quotes', lambda symbols: [
+            {'symbol': 'AAPL', 'bid_price': '130.10', 'ask_price': '130.20', 'last_trade_price': '130.15',
+             'bid_size': 100, 'ask_size': 200, 'updated_at': '2021-01-04T21:00:00Z'}, None])
+        monkeypatch.setattr(marketdata.tda_stocks, 'get_quotes', lambda tickers, jsonify=None: (
+            {'AAPL': {'bidPrice': 130.11, 'askPrice': 130.19, 'lastPrice': 130.16, 'bidSize': 300, 'askSize': 400,
+                      'totalVolume': 1000, 'quoteTimeInLong': 1609794000000}}, None))
+        monkeypatch.setattr(marketdata.gemini_crypto, 'get_pubtickers', lambda tickers, jsonify=None: (
+            [{'bid': '32000.00', 'ask': '32001.00', 'last': '32000.50',
+              'volume': {'BTC': '1500.5', 'USD': '48000000', 'timestamp': 1609794000000}}, None],
+            [None, 'Error 400']))
+        now = int(time.time() * 1000)
+        monkeypatch.setattr(marketdata.robinhood_stocks, 'get_stock_historicals', lambda symbols, interval, span: [
+            {'symbol': 'AAPL', 'begins_at': '2021-01-04T00:00:00Z', 'open_price': '1', 'high_price': '2',
+             'low_price': '0.5', 'close_price': '1.5', 'volume': 10}])
+        monkeypatch.setattr(marketdata.tda_stocks, 'get_price_history', lambda *args, **kwargs: (
+            {'candles': [{'datetime': now - 2 * 86400000, 'open': 1, 'high': 1, 'low': 1, 'close': 1, 'volume': 1},
+                         {'datetime': now - 1000, 'open': 1, 'high': 2, 'low': 0.5, 'close': 1.5, 'volume': 10}]},
+            None))
+        monkeypatch.setattr(marketdata.gemini_crypto, 'get_candles', lambda ticker, time_frame, jsonify=None: (
+            [[now, 3, 4, 2, 3.5, 5], [now - 60000, 1, 2, 0.5, 1.5, 5], [now - 400 * 86400000, 1, 1, 1, 1, 1]], None))
+        return marketdata
+
+    def test_quotes_from_every_venue(self, monkeypatch):
+        marketdata = self.patch_venues(monkeypatch)
+        quotes, errors = marketdata.get_quotes(robinhood=['aapl'], tda=['AAPL'], gemini=['BTCUSD', 'ethusd'])
+        assert [(quote.venue, quote.symbol) for quote in quotes] == [
+            ('robinhood', 'AAPL'), ('tda', 'AAPL'), ('gemini', 'BTCUSD')]
+        assert quotes[0] == marketdata.Quote('robinhood', 'AAPL', 130.10, 130.20, 130.15, 100.0, 200.0,
+                                             quotes[0].volume, 1609794000000)
+        assert quotes[0].volume != quotes[0].volume
+        assert quotes[2].volume == 1500.5
+        assert errors == {'gemini': ['Error 400']}
+
+        columns = marketdata.to_columns(quotes)
+        assert columns['venue'] == ['robinhood', 'tda', 'gemini']
+        assert columns['bid'].typecode == 'd' and columns['timestamp'].typecode == 'q'
+        assert max(columns['bid'][:2]) == 130.11
+        assert list(marketdata.to_columns([], marketdata.Bar)) == list(marketdata.Bar._fields)
+
+    def test_history_and_errors(self, monkeypatch):
+        marketdata = self.patch_venues(monkeypatch)
+        bars, errors = marketdata.get_history(robinhood=['AAPL'], tda=['AAPL'], gemini=['btcusd'], interval='day')
+        assert errors == {}
+        assert [(bar.venue, bar.close) for bar in bars] == [
+            ('robinhood', 1.5), ('tda', 1.0), ('tda', 1.5), ('gemini', 1.5), ('gemini', 3.5)]
+        with pytest.raises(ValueError):
+            marketdata.get_history(tda=['AAPL'], interval='hour')
+        bars, errors = marketdata.get_history(tda=['AAPL'], gemini=['btcusd'], interval='5minute', span='day')
+        assert [(bar.venue, bar.close) for bar in bars] == [('tda', 1.5), ('gemini', 1.5), ('gemini', 3.5)]
+
+        def fail(*args, **kwargs):
+            raise Exception('get_quotes can only be called when logged in')
+        monkeypatch.setattr(marketdata.robinhood_stocks, 'get_quotes', fail)
+        quotes, errors = marketdata.get_quotes(robinhood=['AAPL'], tda=['AAPL'])
+        assert [quote.venue for quote in quotes] == ['tda']
+        assert str(errors['robinhood'][0]) == 'get_quotes can only be called when logged in'
+
+
+class TestMockServer:
+
+    def test_endpoints_through_base_url(self, monkeypatch):
+        from robin_stocks.robinhood.mockserver import MockData, MockRobinhoodServer
+        monkeypatch.setattr(r.helper, 'LOGGED_IN', True)
+        with MockRobinhoodServer(data=MockData(['AAPL', 'MSFT'], orders=250, expirations=2, strikes=5)) as server:
+            r.set_base_url(server.url)
+            try:
+                assert r.get_quotes(['AAPL', 'msft'], 'symbol') == ['AAPL', 'MSFT']
+                orders = r.get_all_stock_orders()
+                assert len(orders) == 250 and orders[0]['url'].startswith(server.url)
+                assert len(r.get_stock_historicals('AAPL', 'day', 'year')) == 365
+                assert r.get_fundamentals('MSFT', 'pe_ratio') == ['25.000000']
+                options = r.find_tradable_options('AAPL', optionType='put')
+                assert len(options) == 2 * 11
+                assert r.get_option_market_data_by_id(options[0]['id'])[0]['instrument_id'] == options[0]['id']
+                placed = r.order_buy_limit('AAPL', 2, 10.0)
+                assert placed['state'] == 'confirmed'
+                r.cancel_stock_order(placed['id'])
+                assert r.get_stock_order_info(placed['id'])['state'] == 'cancelled'
+            finally:
+                r.set_base_url(None)
+        assert r.helper.SESSION.get_adapter('https://api.robinhood.com/') is r.helper.SESSION.adapters['https://']
+
+    def test_latency_and_error_injection(self):
+        import requests
+        from robin_stocks.robinhood.mockserver import MockRobinhoodServer
+        with MockRobinhoodServer(latency=0.05, error_rate=1.0, error_status=503) as server:
+            start = time.perf_counter()
+            response = requests.get(server.url + '/quotes/?symbols=AAPL')
+            assert time.perf_counter() - start >= 0.05
+            assert response.status_code == 503
+            assert server.stats == {'requests': 1, 'errors': 1}
+
+    def test_seeded_errors_repeat(self):
+        import requests
+        from robin_stocks.robinhood.mockserver import MockRobinhoodServer
+
+        def failures(seed):
+            with MockRobinhoodServer(error_rate=0.5, seed=seed) as server:
+                return [requests.get(server.url + '/quotes/AAPL/').status_code for _ in range(20)]
+
+        first = failures(7)
+        assert first == failures(7)
+        assert 200 in first and 503 in first
+
+    def test_linked_urls_are_served(self):
+        import requests
+        from robin_stocks.robinhood.mockserver import MockData, MockRobinhoodServer
+        with MockRobinhoodServer(data=MockData(['AAPL'], orders=1)) as server:
+            instrument = requests.get(server.url + '/instruments/?symbol=AAPL').json()['results'][0]
+            order = requests.get(server.url + '/orders/').json()['results'][0]
+            for url in [instrument['url'], instrument['quote'], instrument['fundamentals'], instrument['splits'],
+                        order['url'], order['instrument'], order['account']]:
+                assert requests.get(url).status_code == 200, url
+            assert requests.get(instrument['fundamentals']).json()['pe_ratio'] == '25.000000'
+            assert requests.get(instrument['splits']).json()['results'] == []
+            assert requests.get(order['account']).json()['account_number'] == '5RY00000'
+            assert requests.get(server.url + '/accounts/0/').status_code == 404
+
+
+class TestEndpointRouter:
+
+    def test_urls_do_not_send_requests(self, monkeypatch):
+        import inspect
+        from robin_stocks.robinhood import urls
+
+        def fail(*args, **kwargs):
+            raise AssertionError('building a url sent a request')
+        monkeypatch.setattr(r.helper.SESSION, 'request', fail)
+        for name, function in inspect.getmembers(urls, inspect.isfunction):
+            arguments = ['x'] * len(inspect.signature(function).parameters)
+            assert function(*arguments).startswith(tuple(urls.DEFAULT_BASE_URLS.values())), name
+        assert urls.chains_url(chain_id='abc') == 'https://api.robinhood.com/options/chains/abc/'
+
+    def test_base_url_override(self):
+        from robin_stocks.robinhood import urls
+        router = urls.EndpointRouter({'nummus': 'http://127.0.0.1:8000'})
+        assert router.url('nummus', 'holdings/') == 'http://127.0.0.1:8000/holdings/'
+        assert router.rewrite('https://nummus.robinhood.com/orders/?cursor=1') == 'http://127.0.0.1:8000/orders/?cursor=1'
+        assert router.rewrite('https://api.robinhood.com/quotes/') == 'https://api.robinhood.com/quotes/'
+        with pytest.raises(ValueError):
+            router.set_base_url('http://127.0.0.1:8000', ['crypto'])
+        r.set_base_url('http://127.0.0.1:9000/', hosts=['api'])
+        try:
+            assert urls.quotes_url() == 'http://127.0.0.1:9000/quotes/'
+            assert urls.crypto_holdings_url() == 'https://nummus.robinhood.com/holdings/'
+            assert 'https://api.robinhood.com/' in r.helper.SESSION.adapters
+        finally:
+            r.set_base_url(None)
+        assert urls.ROUTER.is_default()
+        assert 'https://api.robinhood.com/' not in r.helper.SESSION.adapters
+
+    def test_instrument_ids_are_cached(self, monkeypatch):
+        calls = []
+
+        def fake_request_get(url, dataType='regular', payload=None, jsonify_data=True):
+            calls.append(payload['symbol'])
+            return {'id': 'ins-' + payload['symbol'], 'tradable_chain_id': 'chain-' + payload['symbol']}
+        monkeypatch.setattr(r.helper, 'request_get', fake_request_get)
+        monkeypatch.setattr(r.helper, 'INSTRUMENT_CACHE', {})
+        assert r.helper.id_for_stock('aapl') == 'ins-AAPL'
+        assert r.helper.id_for_stock(' AAPL ') == 'ins-AAPL'
+        assert r.helper.id_for_chain('AAPL') == 'chain-AAPL'
+        assert calls == ['AAPL']
+        r.helper.clear_instrument_cache()
+        r.helper.id_for_chain('AAPL')
+        assert calls == ['AAPL', 'AAPL']
+
+    def test_urls_still_take_a_symbol(self, monkeypatch):
+        from robin_stocks.robinhood import urls
+
+        def fake_request_get(url, dataType='regular', payload=None, jsonify_data=True):
+            return {'id': 'ins-' + payload['symbol'], 'tradable_chain_id': 'chain-' + payload['symbol']}
+        monkeypatch.setattr(r.helper, 'request_get', fake_request_get)
+        monkeypatch.setattr(r.helper, 'INSTRUMENT_CACHE', {})
+        assert urls.ratings_url('aapl') == 'https://api.robinhood.com/midlands/ratings/ins-AAPL/'
+        assert urls.splits_url('AAPL') == 'https://api.robinhood.com/instruments/ins-AAPL/splits/'
+        assert urls.popularity_url('AAPL') == 'https://api.robinhood.com/instruments/ins-AAPL/popularity/'
+        assert urls.chains_url('AAPL') == 'https://api.robinhood.com/options/chains/chain-AAPL/'
+
+    def test_logout_clears_instruments(self, monkeypatch):
+        monkeypatch.setattr(r.helper, 'INSTRUMENT_CACHE', {'AAPL': {'id': 'ins-AAPL'}})
+        monkeypatch.setattr(r.helper, 'LOGGED_IN', True)
+        monkeypatch.setitem(r.helper.SESSION.headers, 'Authorization', None)
+        r.authentication.logout()
+        assert r.helper.INSTRUMENT_CACHE == {}
+
+
+class TestLazyImports:
+
+    def run_python(self, code):
+        import subprocess
+        import sys
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+        return json.loads(result.stdout)
+
+    def test_import_loads_no_submodules(self):
+        loaded = self.run_python(
+            "import json, sys\n"
+            "import robin_stocks.robinhood, robin_stocks.tda, robin_stocks.gemini\n"
+            "print(json.dumps(sorted(m for m in sys.modules if m.startswith(('robin_stocks', 'requests', 'cryptography')))))")
+        assert loaded == ['robin_stocks', 'robin_stocks._lazy', 'robin_stocks.gemini', 'robin_stocks.robinhood',
+                          'robin_stocks.tda']
+
+    def test_functions_load_their_submodule(self):
+        loaded = self.run_python(
+            "import json, sys\n"
+            "import robin_stocks.tda as t\n"
+            "t.get_quote\n"
+            "before = 'cryptography.fernet' in sys.modules\n"
+            "t.login\n"
+            "print(json.dumps([before, 'cryptography.fernet' in sys.modules, 'get_quote' in dir(t)]))")
+        assert loaded == [False, True, True]
+
+    def test_packages_share_one_loader(self):
+        import robin_stocks
+        import robin_stocks.gemini as g
+        import robin_stocks.tda as t
+        assert r.get_quotes is r.stocks.get_quotes
+        assert 'streaming' in dir(r) and 'get_quotes' in dir(t) and 'tda' in dir(robin_stocks)
+        assert g.__getattr__.__module__ == t.__getattr__.__module__ == 'robin_stocks._lazy'
+        with pytest.raises(AttributeError):
+            g.get_nothing
@@ -1,5 +1,9 @@
+import math
 import os
+import threading
+import time
 
+import pytest
 import robin_stocks.tda as t
 from dotenv import load_dotenv
 
@@ -27,3 +31,464 @@ class TestStocks:
         assert err is None
         assert self.ticker in data
 
+
+
+class TestFormatInputs:
+
+    @staticmethod
+    def decorated_functions(package):
+        import inspect
+        for name in package.__all__:
+            func = inspect.unwrap(getattr(package, name))
+            if 'jsonify' in inspect.signature(func).parameters:
+                yield name, func
+
+    @staticmethod
+    def stub(func):
+        import inspect
+
+        def call(*args, **kwargs):
+            bound = inspect.signature(func).bind(*args, **kwargs)
+            bound.apply_defaults()
+            return bound.arguments['jsonify']
+        call.__signature__ = inspect.signature(func)
+        return call
+
+    @pytest.mark.parametrize('package_name', ['robin_stocks.gemini', 'robin_stocks.tda'])
+    def test_jsonify_defaults(self, package_name, monkeypatch):
+        import inspect
+        from importlib import import_module
+        package = import_module(package_name)
+        for name, func in self.decorated_functions(package):
+            wrapped = package.helper.format_inputs(self.stub(func))
+            required = [p for p in inspect.signature(func).parameters.values()
+                        if p.default is inspect.Parameter.empty and p.name != 'jsonify']
+            args = ['x'] * len(required)
+            # The signature is read when the function is decorated, never when it is called.
+            monkeypatch.setattr(package.helper, 'signature', None)
+            assert wrapped(*args) is package.helper.get_default_json_flag(), name
+            assert wrapped(*args, jsonify=False) is False, name
+            position = list(inspect.signature(func).parameters).index('jsonify')
+            if position == len(args):
+                assert wrapped(*args, None) is package.helper.get_default_json_flag(), name
+            monkeypatch.undo()
+
+
+class TestPriceHistoryStore:
+
+    day = 24 * 60 * 60 * 1000
+
+    def fake_history(self, monkeypatch, end):
+        calls = []
+
+        def fake_get_price_history(ticker, period_type, frequency_type, frequency, period=None, start_date=None,
+                                   end_date=None, needExtendedHoursData=True, jsonify=None):
+            calls.append((ticker, start_date, end_date))
+            candles = [{'datetime': ms, 'open': 1.0, 'high': 2.0, 'low': 0.5, 'close': 1.5, 'volume': 100}
+                       for ms in range(start_date - start_date % self.day, min(end_date, end) + 1, self.day)
+                       if ms >= start_date - self.day]
+            return {'candles': candles, 'symbol': ticker, 'empty': not candles}, None
+
+        monkeypatch.setattr(t.history, 'get_price_history', fake_get_price_history)
+        return calls
+
+    def test_split_date_range(self):
+        windows = t.split_date_range(0, 25 * self.day, 'minute')
+        assert windows == [(0, 10 * self.day - 1), (10 * self.day, 20 * self.day - 1), (20 * self.day, 25 * self.day)]
+
+    def test_incremental_download(self, monkeypatch, tmp_path):
+        calls = self.fake_history(monkeypatch, end=30 * self.day)
+        added, errors = t.download_price_histories(['AAPL', 'MSFT'], str(tmp_path), 'minute', 1,
+                                                   start_date=0, end_date=30 * self.day, calls_per_minute=6000)
+        assert errors == {}
+        assert added == {'AAPL': 31, 'MSFT': 31}
+        assert len(calls) == 8
+        calls.clear()
+        self.fake_history(monkeypatch, end=40 * self.day)
+        assert t.download_price_history('AAPL', str(tmp_path), 'minute', 1, end_date=40 * self.day) == 10
+        columns = t.load_price_history('AAPL', str(tmp_path), 'minute', 1)
+        assert list(columns['datetime']) == [i * self.day for i in range(41)]
+        assert columns['close'][0] == 1.5 and columns['volume'][-1] == 100
+        assert columns['volume'].typecode == 'd'
+        assert os.path.getsize(os.path.join(str(tmp_path), 'AAPL', '1minute', 'volume.bin')) == 41 * 8
+
+    def test_interrupted_write_is_cut_back(self, monkeypatch, tmp_path):
+        self.fake_history(monkeypatch, end=5 * self.day)
+        t.download_price_history('AAPL', str(tmp_path), 'daily', 1, start_date=0, end_date=5 * self.day)
+        with open(str(tmp_path / 'AAPL' / '1daily' / 'datetime.bin'), 'ab') as f:
+            f.write(b'\x00' * 8)
+        self.fake_history(monkeypatch, end=7 * self.day)
+        t.download_price_history('AAPL', str(tmp_path), 'daily', 1, end_date=7 * self.day)
+        assert list(t.load_price_history('AAPL', str(tmp_path))['datetime']) == [i * self.day for i in range(8)]
+
+
+class TestOptionChainTable:
+
+    @staticmethod
+    def chain(expirations=8, strikes=40):
+        def contracts(put_call):
+            date_map = {}
+            for e in range(expirations):
+                key = '2021-{0:02d}-15:{1}'.format(e + 1, 30 * e + 3)
+                date_map[key] = {}
+                for s in range(strikes):
+                    strike = 100.0 + 2.5 * s
+                    date_map[key]['{0:.1f}'.format(strike)] = [{
+                        'putCall': put_call, 'symbol': 'AAPL_{0:02d}1521{1}{2:g}'.format(e + 1, put_call[0], strike),
+                        'bid': 1.0 + s, 'ask': 1.1 + s, 'last': 1.05 + s, 'mark': 1.05 + s, 'bidSize': 3, 'askSize': 4,
+                        'totalVolume': s, 'openInterest': 10 * s, 'volatility': 25.0, 'delta': 'NaN', 'gamma': 0.01,
+                        'theta': -0.05, 'vega': 0.1, 'rho': 0.02, 'strikePrice': strike, 'daysToExpiration': 30 * e + 3,
+                        'inTheMoney': strike < 130}]
+            return date_map
+        return {'symbol': 'AAPL', 'underlyingPrice': 130.0,
+                'callExpDateMap': contracts('CALL'), 'putExpDateMap': contracts('PUT')}
+
+    def test_flatten_and_slice(self):
+        # Insert strikes out of order to check that rows are sorted numerically.
+        chain = self.chain(expirations=2, strikes=5)
+        chain['callExpDateMap']['2021-01-15:3'] = dict(reversed(list(chain['callExpDateMap']['2021-01-15:3'].items())))
+        table = t.normalize_option_chain(chain)
+        assert len(table) == 20
+        assert table.expirations() == ['2021-01-15', '2021-02-15']
+        assert table.strikes('2021-01-15') == [100.0, 102.5, 105.0, 107.5, 110.0]
+        selected = table.select('2021-02-15', 'put', min_strike=102.5, max_strike=107.5, columns=['strike', 'type', 'open_interest'])
+        assert selected == {'strike': [102.5, 105.0, 107.5], 'type': ['PUT'] * 3, 'open_interest': [10, 20, 30]}
+        assert math.isnan(table.row(0)['delta'])
+        assert table.row(0)['expiration'] == '2021-01-15'
+        assert len(table.rows(min_strike=110)) == 4
+
+    def test_throughput(self):
+        chain = self.chain()
+        start = time.perf_counter()
+        for _ in range(20):
+            table = t.normalize_option_chain(chain)
+        per_second = 20 / (time.perf_counter() - start)
+        assert len(table) == 640
+        assert per_second > 24, '{0:.0f} chains per second'.format(per_second)
+
+
+class TestTokenManager:
+
+    @staticmethod
+    def write_tokens(path, passcode, authorization_timestamp):
+        from cryptography.fernet import Fernet
+        cipher_suite = Fernet(passcode.encode())
+        t.authentication.write_token_file(path, {
+            'authorization_token': cipher_suite.encrypt(b'old'),
+            'refresh_token': cipher_suite.encrypt(b'refresh'),
+            'client_id': cipher_suite.encrypt(b'client'),
+            'authorization_timestamp': authorization_timestamp,
+            'refresh_timestamp': authorization_timestamp
+        })
+
+    def test_refresh_before_expiry_and_persist(self, monkeypatch, tmp_path):
+        import datetime
+        passcode = t.generate_encryption_passcode()
+        path = tmp_path / 'tda.pickle'
+        self.write_tokens(path, passcode, datetime.datetime.now() - datetime.timedelta(seconds=1600))
+        calls = []
+        monkeypatch.setattr(t.authentication, 'request_data',
+                            lambda url, payload, parse_json: (calls.append(payload) or {'access_token': 'new'}, None))
+        manager = t.TokenManager(passcode, refresh_margin=300, pickle_path=str(path))
+        assert manager.seconds_until_refresh() == 0
+        assert manager.refresh() == 'Bearer new'
+        assert manager.refresh() == 'Bearer new'
+        assert len(calls) == 1
+        assert 1400 < manager.seconds_until_refresh() <= 1500
+        assert t.TokenManager(passcode, pickle_path=str(path)).access_token == 'new'
+        assert not (tmp_path / 'tda.pickle.tmp').exists()
+
+    def test_unauthorized_request_is_retried_once(self, monkeypatch):
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+        seen = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                seen.append(self.headers.get('Authorization'))
+                status = 200 if self.headers.get('Authorization') == 'Bearer new' else 401
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(b'{"ok": true}' if status == 200 else b'{"error": "expired"}')
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+        def handler():
+            t.helper.update_session('Authorization', 'Bearer new')
+
+        monkeypatch.setitem(t.helper.SESSION.headers, 'Authorization', 'Bearer old')
+        monkeypatch.setitem(t.helper.SESSION.headers, 'Host', '127.0.0.1:{0}'.format(server.server_port))
+        url = 'http://127.0.0.1:{0}/v1/marketdata/quotes'.format(server.server_port)
+        try:
+            t.helper.set_unauthorized_handler(handler)
+            data, error = t.request_get(url, None, True)
+            assert (data, error) == ({'ok': True}, None)
+            assert seen == ['Bearer old', 'Bearer new']
+            t.helper.update_session('Authorization', 'Bearer revoked')
+            t.helper.set_unauthorized_handler(lambda: None)
+            data, error = t.request_get(url, None, True)
+            assert error is not None and len(seen) == 4
+        finally:
+            t.helper.set_unauthorized_handler(None)
+            server.shutdown()
+
+    def test_failed_refresh_returns_the_unauthorized_response(self, monkeypatch):
+        import requests
+
+        class Rejecting(requests.adapters.BaseAdapter):
+            def send(self, request, **kwargs):
+                response = requests.Response()
+                response.status_code = 401
+                response._content = b'{"error": "expired"}'
+                response.request = request
+                response.url = request.url
+                return response
+
+            def close(self):
+                pass
+
+        def handler():
+            raise ValueError('Refresh token is no longer valid.')
+
+        url = 'https://api.tdameritrade.com/v1/marketdata/quotes'
+        monkeypatch.setitem(t.helper.SESSION.adapters, 'https://', Rejecting())
+        monkeypatch.setitem(t.helper.SESSION.headers, 'Authorization', 'Bearer old')
+        try:
+            t.helper.set_unauthorized_handler(handler)
+            data, error = t.request_get(url, None, True)
+            assert data == {'error': 'expired'} and error.response.status_code == 401
+            t.helper.set_unauthorized_handler(lambda: t.helper.SESSION.headers.pop('Authorization'))
+            data, error = t.request_post(url, None, True)
+            assert data == {'error': 'expired'} and error.response.status_code == 401
+        finally:
+            t.helper.set_unauthorized_handler(None)
+
+    def test_unsent_request_returns_none(self, monkeypatch):
+        import requests
+
+        def refuse(*args, **kwargs):
+            raise requests.exceptions.ConnectionError('connection refused')
+
+        monkeypatch.setattr(t.helper.SESSION, 'get', refuse)
+        monkeypatch.setattr(t.helper.SESSION, 'post', refuse)
+        for function in (t.request_get, t.request_post):
+            data, error = function('https://api.tdameritrade.com/v1/accounts', None, True)
+            assert data is None and isinstance(error, requests.exceptions.ConnectionError)
+
+    def test_concurrent_unauthorized_requests_share_one_refresh(self, monkeypatch):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        requests_at_once = 6
+        all_rejected = threading.Barrier(requests_at_once)
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                authorized = self.headers.get('Authorization') == 'Bearer new'
+                if not authorized:
+                    # Answer only once every request was sent with the old token.
+                    all_rejected.wait(5)
+                self.send_response(200 if authorized else 401)
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(b'{"ok": true}' if authorized else b'{"error": "expired"}')
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        refreshes = []
+
+        def handler():
+            refreshes.append(1)
+            time.sleep(0.05)
+            t.helper.update_session('Authorization', 'Bearer new')
+
+        monkeypatch.setitem(t.helper.SESSION.headers, 'Authorization', 'Bearer old')
+        monkeypatch.setitem(t.helper.SESSION.headers, 'Host', '127.0.0.1:{0}'.format(server.server_port))
+        url = 'http://127.0.0.1:{0}/v1/marketdata/quotes'.format(server.server_port)
+        results = []
+        try:
+            t.helper.set_unauthorized_handler(handler)
+            threads = [threading.Thread(target=lambda: results.append(t.request_get(url, None, True)))
+                       for _ in range(requests_at_once)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            t.helper.set_unauthorized_handler(None)
+            server.shutdown()
+        assert results == [({'ok': True}, None)] * requests_at_once
+        assert len(refreshes) == 1
+
+    def test_failed_refresh_is_printed_to_output(self, monkeypatch, tmp_path):
+        import datetime
+        import io
+        passcode = t.generate_encryption_passcode()
+        path = tmp_path / 'tda.pickle'
+        self.write_tokens(path, passcode, datetime.datetime.now() - datetime.timedelta(seconds=1600))
+        manager = t.TokenManager(passcode, pickle_path=str(path))
+
+        def request_data(url, payload, parse_json):
+            manager.stopped.set()
+            return {'error': 'invalid_grant'}, None
+
+        output = io.StringIO()
+        monkeypatch.setattr(t.authentication, 'request_data', request_data)
+        monkeypatch.setattr(t.helper, 'OUTPUT', output)
+        manager.run()
+        assert output.getvalue() == 'Could not refresh TD Ameritrade token: Refresh token is no longer valid. ' \
+            'Call login_first_time() to get a new refresh token.\n'
+
+
+class TestQuoteVectors:
+
+    def fake_get_quotes(self, requested):
+        lock = threading.Lock()
+        in_flight = [0]
+
+        def fake_get_quotes(tickers, jsonify=None):
+            symbols = tickers.split(',')
+            with lock:
+                requested.append(symbols)
+                in_flight[0] += 1
+                self.max_in_flight = max(self.max_in_flight, in_flight[0])
+            time.sleep(0.02)
+            with lock:
+                in_flight[0] -= 1
+            return {symbol: {'symbol': symbol, 'bidPrice': 1.0, 'askPrice': 1.5, 'lastPrice': 1.25,
+                             'mark': 1.25, 'totalVolume': 10} for symbol in symbols if symbol != 'GONE'}, None
+        self.max_in_flight = 0
+        return fake_get_quotes
+
+    def test_chunks_cache_and_vectors(self, monkeypatch):
+        requested = []
+        monkeypatch.setattr(t.helper, 'LOGGED_IN', True)
+        monkeypatch.setattr(t.stocks, 'get_quotes', self.fake_get_quotes(requested))
+        monkeypatch.setattr(t.stocks, 'QUOTE_CACHE', {})
+        tickers = ['T{0}'.format(i) for i in range(2000)] + ['GONE']
+        vectors, errors = t.get_quote_vectors(tickers, chunk_size=250, max_workers=9, max_age=5)
+        assert self.max_in_flight > 1
+        assert errors == [] and len(requested) == 9
+        assert vectors['symbol'][0] == 'T0' and vectors['ask'][1999] == 1.5
+        assert math.isnan(vectors['last'][-1])
+        requested.clear()
+        vectors, _ = t.get_quote_vectors(['t1', 'T2', 'NEW'], max_age=5)
+        assert requested == [['NEW']]
+        assert list(vectors['bid']) == [1.0, 1.0, 1.0]
+
+    def test_cache_is_not_written_without_max_age(self, monkeypatch):
+        requested = []
+        monkeypatch.setattr(t.helper, 'LOGGED_IN', True)
+        monkeypatch.setattr(t.stocks, 'get_quotes', self.fake_get_quotes(requested))
+        monkeypatch.setattr(t.stocks, 'QUOTE_CACHE', {})
+        vectors, _ = t.get_quote_vectors(['A', 'B'])
+        assert list(vectors['mark']) == [1.25, 1.25]
+        assert t.stocks.QUOTE_CACHE == {}
+
+
+class TestSyncStore:
+
+    def test_incremental_sync(self, monkeypatch):
+        import datetime
+        requested = []
+        transactions = {
+            '2021-01-05': [{'transactionId': 1, 'transactionDate': '2021-01-05T15:00:00+0000', 'type': 'TRADE',
+                            'transactionItem': {'instrument': {'symbol': 'AAPL'}}}],
+            '2021-03-20': [{'transactionId': 2, 'transactionDate': '2021-03-20T15:00:00+0000', 'type': 'DIVIDEND',
+                            'transactionItem': {'instrument': {'symbol': 'MSFT'}}}],
+            '2021-04-02': [{'transactionId': 3, 'transactionDate': '2021-04-02T15:00:00+0000', 'type': 'TRADE',
+                            'transactionItem': {'instrument': {'symbol': 'AAPL'}}}],
+        }
+
+        def fake_get_transactions(id, type_value=None, symbol=None, start_date=None, end_date=None, jsonify=None):
+            requested.append((start_date, end_date))
+            return [item for day, items in transactions.items() if start_date <= day <= end_date for item in items], None
+
+        monkeypatch.setattr(t.sync, 'get_transactions', fake_get_transactions)
+        store = t.SyncStore(':memory:')
+        count = t.sync_transactions('123', store, start_date=datetime.date(2021, 1, 1),
+                                    end_date=datetime.date(2021, 3, 31), window_days=30)
+        assert count == 2 and len(requested) == 3
+        assert store.get_high_water_mark('123', 'transactions') == '2021-03-31'
+        requested.clear()
+        count = t.sync_transactions('123', store, end_date=datetime.date(2021, 4, 5), window_days=30)
+        assert requested == [('2021-03-30', '2021-04-05')]
+        assert count == 1
+        assert [item['transactionId'] for item in store.query('transactions', '123')] == [1, 2, 3]
+        assert [item['transactionId'] for item in store.query('transactions', '123', symbol='AAPL',
+                                                                start_date='2021-04-02', end_date='2021-04-02')] == [3]
+
+    def test_orders_are_updated_in_place(self):
+        store = t.SyncStore(':memory:')
+        order = {'orderId': 9, 'enteredTime': '2021-04-01T14:00:00+0000', 'status': 'WORKING',
+                 'orderLegCollection': [{'instrument': {'symbol': 'TSLA'}}]}
+        store.upsert('orders', '123', [order])
+        store.upsert('orders', '123', [dict(order, status='FILLED')])
+        assert [item['status'] for item in store.query('orders', '123')] == ['FILLED']
+        assert store.query('orders', '123', type_value='WORKING') == []
+
+    def test_overlap_counts_only_changes(self, monkeypatch):
+        import datetime
+        today = datetime.date.today()
+        requested = []
+        orders = [{'orderId': 1, 'enteredTime': '2021-04-01T14:00:00+0000', 'status': 'FILLED'},
+                  {'orderId': 2, 'enteredTime': '2021-04-02T14:00:00+0000', 'status': 'WORKING'}]
+
+        def fake_get_orders_for_account(id, max_results=None, from_time=None, to_time=None, status=None, jsonify=None):
+            requested.append(from_time)
+            return [dict(order) for order in orders], None
+
+        monkeypatch.setattr(t.sync, 'get_orders_for_account', fake_get_orders_for_account)
+        monkeypatch.setattr(t.sync, 'get_order', lambda id, order_id, jsonify=None: (
+            next(dict(order) for order in orders if str(order['orderId']) == order_id), None))
+        store = t.SyncStore(':memory:')
+        assert t.sync_orders('123', store, start_date=today - datetime.timedelta(days=100), window_days=100) == 2
+        assert requested == [(today - datetime.timedelta(days=60)).isoformat()]
+        orders[1]['status'] = 'FILLED'
+        assert t.sync_orders('123', store) == 1
+        assert t.sync_orders('123', store) == 0
+        assert [item['status'] for item in store.query('orders', '123')] == ['FILLED', 'FILLED']
+
+    def test_stale_open_orders_are_requested_again(self, monkeypatch):
+        import datetime
+        entered = (datetime.date.today() - datetime.timedelta(days=30)).isoformat() + 'T14:00:00+0000'
+        store = t.SyncStore(':memory:')
+        store.upsert('orders', '123', [
+            {'orderId': 1, 'enteredTime': entered, 'status': 'WORKING', 'duration': 'GOOD_TILL_CANCEL'},
+            {'orderId': 2, 'enteredTime': entered, 'status': 'FILLED'}])
+        store.set_high_water_mark('123', 'orders', datetime.date.today().isoformat())
+        requested = []
+
+        def fake_get_order(id, order_id, jsonify=None):
+            requested.append(order_id)
+            return {'orderId': 1, 'enteredTime': entered, 'status': 'FILLED', 'duration': 'GOOD_TILL_CANCEL'}, None
+
+        monkeypatch.setattr(t.sync, 'get_orders_for_account',
+                            lambda id, from_time=None, to_time=None, jsonify=None: ([], None))
+        monkeypatch.setattr(t.sync, 'get_order', fake_get_order)
+        assert t.sync_orders('123', store) == 1
+        assert requested == ['1']
+        assert [item['status'] for item in store.query('orders', '123')] == ['FILLED', 'FILLED']
+        requested.clear()
+        assert t.sync_orders('123', store) == 0
+        assert requested == []
+
+    def test_overlap_is_clamped_to_the_order_window(self, monkeypatch):
+        import datetime
+        today = datetime.date.today()
+        requested = []
+
+        def fake_get_orders_for_account(id, from_time=None, to_time=None, jsonify=None):
+            requested.append(from_time)
+            return [], None
+
+        monkeypatch.setattr(t.sync, 'get_orders_for_account', fake_get_orders_for_account)
+        store = t.SyncStore(':memory:')
+        store.set_high_water_mark('123', 'orders', (today - datetime.timedelta(days=58)).isoformat())
+        t.sync_orders('123', store, window_days=100, overlap_days=7)
+        assert requested == [(today - datetime.timedelta(days=60)).isoformat()]